@@ -2,4 +2,4 @@
 
 from machine.manifest import Module
 
-module = Module()
+module = Module(bootstrap=True)
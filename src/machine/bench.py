@@ -0,0 +1,224 @@
+"""Startup and manifest-loading benchmarks, with JSON results for cross-commit comparison."""
+
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass
+from datetime import UTC, datetime
+from pathlib import Path
+
+from machine.core import console, err_console, settings
+
+_RESULTS_VERSION = 1
+_RESULTS_DIR = settings.app_dir / "bench"
+
+# # MARK: Timings
+
+
+@dataclass(frozen=True, slots=True)
+class Timing:
+    """Wall-clock statistics of one benchmark, in milliseconds."""
+
+    min: float
+    median: float
+    runs: int
+
+
+def _time(
+    fn: Callable[[], object],
+    repeat: int,
+    setup: Callable[[], object] | None = None,
+) -> Timing:
+    """Time *repeat* calls of *fn*, each after an untimed call of *setup*."""
+    samples: list[float] = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter_ns()
+        fn()
+        samples.append((time.perf_counter_ns() - start) / 1e6)
+    return Timing(min=min(samples), median=statistics.median(samples), runs=repeat)
+
+
+# # MARK: Benchmarks
+
+
+def run_benchmarks(
+    root: Path,
+    machine_ids: list[str],
+    repeat: int = 5,
+    startup: bool = True,
+) -> dict[str, Timing]:
+    """Time CLI startup and, per machine, manifest loading, env building, and apply.
+
+    Keys are `import:cold`/`import:warm` (a fresh interpreter importing
+    `machine.cli`, without and with bytecode caches) and, for each of
+    *machine_ids*, `manifest:<id>` (executing manifest and module code),
+    `manifest-cached:<id>` (through the compiled cache), `env:<id>`, and
+    `apply:<id>`. These clear the caches, including the compiled manifest
+    cache, before every run; the `-warm` variants (e.g. `env-warm:<id>`) keep
+    them. The compiled cache lives in a temporary directory for the run, and
+    apply runs in dry-run mode with package managers stubbed, so nothing is
+    installed or written to the app dir.
+    """
+    results: dict[str, Timing] = {}
+    if startup:
+        results["import:cold"] = _time(_import_cli_cold, repeat)
+        results["import:warm"] = _time(_import_cli, repeat)
+    with _manifest_cache():
+        for machine_id in machine_ids:
+            benchmarks: dict[str, Callable[[], None]] = {
+                "manifest": lambda: _load(machine_id, root),
+                "manifest-cached": lambda: _load_cached(machine_id, root),
+                "env": lambda: _build_env(machine_id, root),
+                "apply": lambda: _apply(machine_id, root),
+            }
+            for kind, fn in benchmarks.items():
+                with _dry_run() if kind == "apply" else nullcontext():
+                    results[f"{kind}:{machine_id}"] = _time(fn, repeat, setup=_clear_caches)
+                    results[f"{kind}-warm:{machine_id}"] = _time(fn, repeat)
+    return results
+
+
+def _clear_caches() -> None:
+    """Drop the compiled manifest cache, and the in-process script env and header caches."""
+    from machine import manifest
+    from machine.ops import scripts
+
+    shutil.rmtree(manifest._CACHE_DIR, ignore_errors=True)
+    scripts._env_cache.clear()
+    scripts._read_meta.cache_clear()
+
+
+@contextmanager
+def _manifest_cache() -> Iterator[None]:
+    """Keep the compiled manifest cache in a temporary directory instead of the app dir."""
+    from machine import manifest
+
+    saved = manifest._CACHE_DIR
+    with tempfile.TemporaryDirectory(prefix="mc-bench-") as tmp:
+        manifest._CACHE_DIR = Path(tmp) / "manifests"
+        try:
+            yield
+        finally:
+            manifest._CACHE_DIR = saved
+
+
+def _import_cli(env: dict[str, str] | None = None) -> None:
+    subprocess.run([sys.executable, "-c", "import machine.cli"], env=env, check=True)
+
+
+def _import_cli_cold() -> None:
+    """Import with an empty bytecode cache, so every module is compiled again."""
+    with tempfile.TemporaryDirectory(prefix="mc-bench-") as tmp:
+        _import_cli({**os.environ, "PYTHONPYCACHEPREFIX": tmp})
+
+
+def _load(machine_id: str, root: Path) -> None:
+    from machine.manifest import load_manifest, resolve_modules
+
+    resolve_modules(load_manifest(machine_id, root).modules, root)
+
+
+def _load_cached(machine_id: str, root: Path) -> None:
+    from machine.manifest import load_machine
+
+    load_machine(machine_id, root)
+
+
+def _build_env(machine_id: str, root: Path) -> None:
+    from machine.ops.scripts import build_script_env
+
+    build_script_env(machine_id, root)
+
+
+def _apply(machine_id: str, root: Path) -> None:
+    """Run the apply pipeline for every unit and phase, as `mc apply --full` does."""
+    from machine.manifest import load_machine
+    from machine.ops.files import validate
+    from machine.ops.scripts import build_script_env
+    from machine.plan import apply_units, build_units, fingerprint
+
+    manifest, modules = load_machine(machine_id, root)
+    validate(modules)
+    units = build_units(modules, manifest, machine_id)
+    env = build_script_env(machine_id, root)
+    changed = {u.name: set(fingerprint(u, env)) for u in units}
+    apply_units(units, changed, env, owners={})
+
+
+@contextmanager
+def _dry_run() -> Iterator[None]:
+    """Enable dry-run, silence the console, and stub package managers.
+
+    Every manager counts as installed with nothing installed yet, so each
+    package takes the full install path without running a command.
+    """
+    saved = settings.dry_run, settings.stub_managers, console.quiet, err_console.quiet
+    settings.dry_run = settings.stub_managers = True
+    console.quiet = err_console.quiet = True
+    try:
+        yield
+    finally:
+        settings.dry_run, settings.stub_managers, console.quiet, err_console.quiet = saved
+
+
+# # MARK: Results
+
+
+def save_results(results: dict[str, Timing], root: Path, path: Path | None = None) -> Path:
+    """Write *results* as JSON, by default to `bench/<time>-<commit>.json` in the app dir."""
+    commit = _git_commit(root)
+    created = datetime.now(UTC)
+    if path is None:
+        path = _RESULTS_DIR / f"{created:%Y%m%dT%H%M%S}-{commit or 'unknown'}.json"
+    data = {
+        "version": _RESULTS_VERSION,
+        "commit": commit,
+        "created": created.isoformat(),
+        "python": sys.version.split()[0],
+        "platform": sys.platform,
+        "results": {name: asdict(timing) for name, timing in results.items()},
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, indent=2))
+    return path
+
+
+def load_results(path: Path) -> dict[str, Timing]:
+    """Read benchmark results written by `save_results`."""
+    data = json.loads(path.read_text())
+    if data.get("version") != _RESULTS_VERSION:
+        raise ValueError(f"Unsupported benchmark results version in {path}")
+    return {name: Timing(**timing) for name, timing in data["results"].items()}
+
+
+def regressions(
+    results: dict[str, Timing],
+    baseline: dict[str, Timing],
+    threshold: float,
+) -> dict[str, float]:
+    """Return benchmarks whose median grew by more than *threshold* (0.2 = 20%).
+
+    Values are the relative change. Benchmarks missing from either side are ignored.
+    """
+    changes = {
+        name: timing.median / baseline[name].median - 1
+        for name, timing in results.items()
+        if name in baseline and baseline[name].median > 0
+    }
+    return {name: change for name, change in changes.items() if change > threshold}
+
+
+def _git_commit(root: Path) -> str | None:
+    result = subprocess.run(
+        ["git", "-C", str(root), "rev-parse", "--short", "HEAD"], capture_output=True, text=True
+    )
+    return result.stdout.strip() or None if result.returncode == 0 else None
@@ -3,41 +3,46 @@
 import logging
 import subprocess
 import sys
+from collections.abc import Callable, Sequence
 from pathlib import Path
 from typing import TYPE_CHECKING, Annotated
 
 import click
 import typer
 from rich.prompt import Prompt
+from typer.core import TyperGroup
 
 from machine.core import (
-    PLATFORM,
     console,
     err_console,
     settings,
     setup_console_logging,
     setup_file_logging,
 )
-from machine.ops.files import deploy_files, validate
-from machine.ops.packages import cache_sudo, install_packages
-from machine.ops.scripts import (
-    build_script_env,
-    filter_scripts,
-    matches_platform,
-    run_scripts,
-    write_env_file,
-)
-from machine.persistence import get_current_machine, save_current_machine
+from machine.persistence import get_current_machine, save_current_machine, state_lock
 
+# Manifest models (pydantic) and ops are imported inside the commands that need
+# them, so `mc home`, `mc --version`, and completion start fast.
 if TYPE_CHECKING:
+    from machine.fleet import Target
     from machine.manifest import MachineManifest, Module, Package
+    from machine.plan import Unit
 
 _logger = logging.getLogger(__name__)
 
 # # MARK: App Entry Point
 
+
+class _AppGroup(TyperGroup):
+    """Root group that reads its help text from package metadata only when shown."""
+
+    def format_help(self, ctx, formatter) -> None:
+        self.help = settings.description
+        super().format_help(ctx, formatter)
+
+
 app = typer.Typer(
-    help=settings.description,
+    cls=_AppGroup,
     no_args_is_help=True,
     invoke_without_command=True,
     context_settings={"help_option_names": ["-h", "--help"]},
@@ -65,16 +70,30 @@ def main(prog_name: str | None = None) -> None:
 
 @app.callback()
 def callback(
+    ctx: typer.Context,
     debug: bool = typer.Option(False, "-d", "--debug", help="Enable debug logging."),
     dry_run: bool = typer.Option(
         False, "-n", "--dry-run", help="Preview changes without applying."
     ),
+    jobs: int = typer.Option(
+        settings.jobs, "-j", "--jobs", min=1, help="Maximum parallel workers (1 = serial)."
+    ),
     version: bool = typer.Option(False, "-v", "--version", help="Show version and exit."),
+    profile: bool = typer.Option(
+        False, "--profile", help="Profile the command and write a trace to the app directory."
+    ),
 ) -> None:
     settings.debug = debug
     settings.dry_run = dry_run
+    settings.jobs = jobs
     setup_console_logging()
 
+    if profile:
+        from machine import profiling
+
+        profiling.start()
+        ctx.call_on_close(lambda: _report_profile(ctx.invoked_subcommand or "mc"))
+
     if version:
         console.print(f"{settings.name} {settings.version}")
         sys.exit(0)
@@ -83,21 +102,33 @@ def callback(
         setup_file_logging()
 
 
+def _report_profile(command: str) -> None:
+    from machine import profiling
+
+    prof_path, trace_path, lines = profiling.stop(command)
+    err_console.print("\n[bold]Profile:[/] [dim](spans, then functions by cumulative time)[/]")
+    for line in lines:
+        err_console.print(f"  {line}", markup=False, highlight=False, soft_wrap=True)
+    err_console.print(f"[dim]cProfile: {prof_path}[/]")
+    err_console.print(f"[dim]Trace:    {trace_path} (open in ui.perfetto.dev)[/]", soft_wrap=True)
+
+
 def get_machines() -> list[str]:
-    from machine.manifest import list_machines
+    from machine.completion import machine_names
 
-    return list_machines(settings.home)
+    return machine_names(settings.home)
 
 
 def get_modules() -> list[str]:
-    from machine.manifest import list_modules
+    from machine.completion import module_names
 
-    return list_modules(settings.home)
+    return module_names(settings.home)
 
 
 def _complete_machines(incomplete: str) -> list[tuple[str, str]]:
+    current = get_current_machine()
     return [
-        (n, "Machine (default)" if n == get_current_machine() else "Machine")
+        (n, "Machine (default)" if n == current else "Machine")
         for n in get_machines()
         if n.startswith(incomplete)
     ]
@@ -107,8 +138,37 @@ def _complete_modules(incomplete: str) -> list[tuple[str, str]]:
     return [(n, "Module") for n in get_modules() if n.startswith(incomplete)]
 
 
-machines = click.Choice(get_machines(), case_sensitive=False)
-modules = click.Choice(get_modules(), case_sensitive=False)
+class _LazyChoice(click.Choice):
+    """Case-insensitive choice whose options are scanned on first use."""
+
+    def __init__(self, load: Callable[[], list[str]]) -> None:
+        self._load = load
+        self._loaded: tuple[str, ...] | None = None
+        super().__init__([], case_sensitive=False)
+
+    @property
+    def choices(self) -> Sequence[str]:
+        if self._loaded is None:
+            self._loaded = tuple(self._load())
+        return self._loaded
+
+    @choices.setter
+    def choices(self, value: Sequence[str]) -> None:  # pyright: ignore[reportIncompatibleVariableOverride]
+        self._loaded = tuple(value) or None
+
+    def convert(self, value, param, ctx):
+        # An empty default (no current machine) is left for the command to report
+        if value == "":
+            return value
+        return super().convert(value, param, ctx)
+
+
+def _current_machine_default() -> str:
+    return get_current_machine() or ""
+
+
+machines = _LazyChoice(get_machines)
+modules = _LazyChoice(get_modules)
 
 
 # # MARK: Lifecycle Commands
@@ -116,6 +176,7 @@ modules = click.Choice(get_modules(), case_sensitive=False)
 
 @app.command(rich_help_panel="Lifecycle")
 def apply(
+    ctx: typer.Context,
     machine: Annotated[
         str,
         typer.Option(
@@ -126,8 +187,9 @@ def apply(
             autocompletion=_complete_machines,
             click_type=machines,
             prompt=True,
+            default_factory=_current_machine_default,
         ),
-    ] = get_current_machine() or "",
+    ],
     module_names: Annotated[
         list[str],
         typer.Argument(
@@ -136,11 +198,49 @@ def apply(
             autocompletion=_complete_modules,
         ),
     ] = [],
+    full: Annotated[
+        bool,
+        typer.Option("--full", help="Re-apply every step, ignoring the last applied plan."),
+    ] = False,
+    parallel_scripts: Annotated[
+        bool,
+        typer.Option(
+            "-P",
+            "--parallel-scripts",
+            help="Run post-install scripts of different modules concurrently.",
+        ),
+    ] = False,
+    plan_file: Annotated[
+        Path | None,
+        typer.Option(
+            "--plan",
+            metavar="FILE",
+            help="Apply the steps of a plan saved with `mc plan -o`.",
+            dir_okay=False,
+            exists=True,
+        ),
+    ] = None,
+    summary_json: Annotated[
+        bool,
+        typer.Option("--summary-json", hidden=True, help="End with a machine-readable summary."),
+    ] = False,
 ) -> None:
     """Deploy configs, install packages, and run scripts."""
-    from machine.manifest import load_manifest, resolve_modules
+    from machine import journal
+    from machine.ops.packages import cache_sudo
+    from machine.ops.scripts import build_script_env, write_env_file
+    from machine.plan import (
+        apply_units,
+        changed_phases,
+        fingerprint,
+        load_fingerprints,
+        load_plan,
+        record_fingerprints,
+        stale_units,
+    )
 
     root = settings.home
+    settings.parallel_scripts = parallel_scripts
     if not machine:
         err_console.print("[red]No machine set. Run: mc apply <machine>[/]")
         raise SystemExit(1)
@@ -148,8 +248,64 @@ def apply(
     save_current_machine(machine)
     write_env_file(machine, root)
 
-    manifest = load_manifest(machine, root)
-    all_modules = resolve_modules(manifest.modules, root)
+    manifest, active, units = _load_units(machine, module_names)
+    script_env = build_script_env(machine, root)
+    owners = _build_owners(active, manifest, machine)
+
+    # Held until the command ends, so a concurrent apply plans from what this one records
+    ctx.with_resource(state_lock())
+    recorded = load_fingerprints(machine)
+    digests = {u.name: fingerprint(u, script_env) for u in units}
+    if plan_file is not None:
+        try:
+            saved = load_plan(plan_file, machine)
+        except ValueError as e:
+            err_console.print(f"[red]{e}[/]")
+            raise SystemExit(1) from None
+        stale = stale_units(saved, digests)
+        if stale:
+            err_console.print(
+                f"[red]Plan is out of date ({', '.join(stale)} changed). Re-run: mc plan[/]"
+            )
+            raise SystemExit(1)
+        changed = {name: set(saved.phases.get(name, ())) for name in digests}
+    else:
+        changed = changed_phases(digests, {} if full else recorded)
+
+    mode = "[dim](dry-run)[/] " if settings.dry_run else ""
+    console.print(f"{mode}Applying [bold]{machine}[/]")
+    console.print(f"  Modules: {', '.join(m.name for m in active)}")
+
+    if not any(changed.values()):
+        console.print("\n[bold green]Up to date.[/] [dim](use --full to re-apply everything)[/]")
+        if summary_json:
+            _print_summary_json([])
+        return
+
+    cache_sudo()
+    with journal.run("apply", machine):
+        unit_failures = apply_units(units, changed, script_env, owners)
+    record_fingerprints(machine, units, script_env, changed, recorded, unit_failures)
+
+    failures = [f for u in units for fs in unit_failures.get(u.name, {}).values() for f in fs]
+    _print_summary(failures, settings.app_dir / "mc.log")
+    if summary_json:
+        _print_summary_json(failures)
+
+
+def _load_units(
+    machine_id: str, module_names: list[str]
+) -> tuple["MachineManifest", list["Module"], list["Unit"]]:
+    """Load and validate *machine_id*, returning its manifest, active modules, and units.
+
+    Exits on validation errors, unknown module names, invalid script headers,
+    or cyclic ordering, so none is found after some units have run.
+    """
+    from machine.manifest import load_machine
+    from machine.ops.files import validate
+    from machine.plan import build_units, dependency_graph
+
+    manifest, all_modules = load_machine(machine_id, settings.home)
     module_filter = set(module_names)
 
     errors = validate(all_modules)
@@ -164,43 +320,25 @@ def apply(
             err_console.print(f"[red]Unknown modules: {', '.join(sorted(unknown))}[/]")
             raise SystemExit(1)
         active = [m for m in all_modules if m.name in module_filter]
-        all_files = [f for m in active for f in m.files]
-        all_packages = [p for m in active for p in m.packages]
-        raw_scripts = [s for m in active for s in m.scripts]
     else:
         active = all_modules
-        all_files = [f for m in active for f in m.files] + manifest.files
-        all_packages = [p for m in active for p in m.packages] + manifest.packages
-        raw_scripts = [s for m in active for s in m.scripts] + manifest.scripts
-
-    all_scripts = filter_scripts(raw_scripts)
-    script_env = build_script_env(machine, root)
-    owners = _build_owners(active, manifest, machine)
-
-    mode = "[dim](dry-run)[/] " if settings.dry_run else ""
-    console.print(f"{mode}Applying [bold]{machine}[/]")
-    console.print(f"  Modules: {', '.join(m.name for m in active)}")
-
-    init_scripts = [s for s in all_scripts if Path(s).name.startswith("init_")]
-    post_scripts = [
-        s
-        for s in all_scripts
-        if not Path(s).name.startswith("init_") and not Path(s).name.startswith("up_")
-    ]
+    try:
+        units = build_units(active, None if module_filter else manifest, machine_id)
+        dependency_graph(units)  # reads every script header and checks the order
+    except ValueError as e:
+        err_console.print(f"[red]{e}[/]")
+        raise SystemExit(1) from None
+    return manifest, active, units
 
-    cache_sudo()
-    failures: list[tuple[str, str, str]] = []
 
-    _, file_failures = deploy_files(all_files, owners=owners)
-    failures.extend(file_failures)
-    failures.extend(run_scripts(init_scripts, env=script_env, owners=owners))
-    failures.extend(install_packages(all_packages, owners=owners))
-    failures.extend(run_scripts(post_scripts, env=script_env, owners=owners))
+def _print_summary_json(failures: list[tuple[str, str, str]]) -> None:
+    """Print the line `mc fleet` reads an apply's failures from."""
+    from machine.fleet import summary_line
 
-    _print_summary(failures, settings.app_dir / "mc.log")
+    print(summary_line(failures), flush=True)
 
 
-def _print_summary(failures: list[tuple[str, str, str]], log_file: Path) -> None:
+def _print_summary(failures: list[tuple[str, str, str]], log_file: Path | str) -> None:
     """Print a final status line. If there were failures, list each one."""
     if not failures:
         console.print(f"\n[bold green]Done![/] [dim](log: {log_file})[/]")
@@ -234,8 +372,92 @@ def _build_owners(
     return owners
 
 
+@app.command("plan", rich_help_panel="Lifecycle")
+def plan_cmd(
+    machine_ids: Annotated[
+        list[str],
+        typer.Option(
+            "-m",
+            "--machine",
+            metavar="MACHINE",
+            help="A machine to plan; repeatable (default: the current machine).",
+            autocompletion=_complete_machines,
+            click_type=machines,
+        ),
+    ] = [],
+    module_names: Annotated[
+        list[str],
+        typer.Argument(
+            metavar="modules",
+            help="Limit the plan to the specified modules.",
+            autocompletion=_complete_modules,
+        ),
+    ] = [],
+    full: Annotated[
+        bool,
+        typer.Option("--full", help="Plan every step, ignoring the last applied plan."),
+    ] = False,
+    as_json: Annotated[
+        bool,
+        typer.Option("--json", help="Print the plan as JSON instead of a diff."),
+    ] = False,
+    output: Annotated[
+        Path | None,
+        typer.Option(
+            "-o",
+            "--output",
+            metavar="FILE",
+            help="Save the plan for `mc apply --plan FILE`.",
+            dir_okay=False,
+        ),
+    ] = None,
+) -> None:
+    """Show what apply would change, without changing anything."""
+    from machine.ops.scripts import build_script_env
+    from machine.plan import (
+        build_plan,
+        changed_phases,
+        fingerprint,
+        format_plan,
+        load_fingerprints,
+        plans_to_json,
+    )
+
+    machine_ids = list(dict.fromkeys(machine_ids)) or [_current_machine_default()]
+    if not machine_ids[0]:
+        err_console.print("[red]No machine set. Run: mc plan -m <machine>[/]")
+        raise SystemExit(1)
+
+    plans = []
+    for machine_id in machine_ids:
+        _, _, units = _load_units(machine_id, module_names)
+        script_env = build_script_env(machine_id, settings.home)
+        digests = {u.name: fingerprint(u, script_env) for u in units}
+        changed = changed_phases(digests, {} if full else load_fingerprints(machine_id))
+        plans.append(build_plan(machine_id, units, digests, changed))
+
+    if output is not None:
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(plans_to_json(plans) + "\n")
+    if as_json:
+        print(plans_to_json(plans))
+        return
+
+    for p in plans:
+        console.print(f"Plan for [bold]{p.machine}[/]")
+        if not p.phases:
+            console.print("  [bold green]Up to date.[/]")
+            continue
+        for line in format_plan(p):
+            console.print(line)
+        console.print(f"  [dim]{len(p.changes)} change(s) in {len(p.phases)} unit(s)[/]")
+    if output is not None:
+        console.print(f"\nSaved to {output}. Apply with: mc apply --plan {output}")
+
+
 @app.command(rich_help_panel="Lifecycle")
 def update(
+    ctx: typer.Context,
     module_names: Annotated[
         list[str],
         typer.Argument(
@@ -245,8 +467,18 @@ def update(
         ),
     ] = [],
 ) -> None:
-    """Run up_* maintenance scripts for the current machine."""
-    from machine.manifest import load_manifest, resolve_modules
+    """Run update-phase (up_*) maintenance scripts for the current machine."""
+    from machine import journal
+    from machine.core import PLATFORM
+    from machine.manifest import load_machine
+    from machine.ops.packages import cache_sudo, install_packages
+    from machine.ops.scripts import (
+        build_script_env,
+        filter_scripts,
+        order_scripts,
+        run_scripts,
+        script_meta,
+    )
 
     root = settings.home
     machine_id = get_current_machine()
@@ -254,8 +486,7 @@ def update(
         err_console.print("[red]No machine set. Run: mc apply <machine>[/]")
         raise SystemExit(1)
 
-    manifest = load_manifest(machine_id, root)
-    all_modules = resolve_modules(manifest.modules, root)
+    manifest, all_modules = load_machine(machine_id, root)
 
     if module_names:
         unknown = set(module_names) - {m.name for m in all_modules}
@@ -269,7 +500,9 @@ def update(
         raw_scripts = [s for m in all_modules for s in m.scripts] + manifest.scripts
         all_packages = [p for m in all_modules for p in m.packages] + manifest.packages
 
-    up_scripts = [s for s in filter_scripts(raw_scripts) if Path(s).name.startswith("up_")]
+    up_scripts = order_scripts(
+        [s for s in filter_scripts(raw_scripts) if script_meta(s).phase == "update"]
+    )
     script_packages = [p for p in all_packages if p.script and p.applies_to(PLATFORM)]
     if not up_scripts and not script_packages:
         console.print("[dim]No update actions found.[/]")
@@ -290,18 +523,21 @@ def update(
     mode = "[dim](dry-run)[/] " if settings.dry_run else ""
     console.print(f"{mode}Updating [bold]{machine_id}[/]")
 
+    ctx.with_resource(state_lock())
     cache_sudo()
-    failures = install_packages(
-        script_packages,
-        owners=owners,
-        rerun_script_packages=True,
-    )
-    failures.extend(run_scripts(up_scripts, env=script_env, owners=owners))
+    with journal.run("update", machine_id):
+        failures = install_packages(
+            script_packages,
+            owners=owners,
+            rerun_script_packages=True,
+        )
+        failures.extend(run_scripts(up_scripts, env=script_env, owners=owners))
     _print_summary(failures, settings.app_dir / "mc.log")
 
 
 @app.command(rich_help_panel="Lifecycle")
 def sync(
+    ctx: typer.Context,
     stash: bool = typer.Option(False, "-s", "--stash", help="Stash changes before sync."),
     force: bool = typer.Option(False, "-f", "--force", help="Discard changes before sync."),
     push: bool = typer.Option(False, "-p", "--push", help="Push after pulling."),
@@ -357,11 +593,166 @@ def sync(
         machine_id = get_current_machine()
         if machine_id:
             console.print()
-            apply(machine=machine_id)
+            apply(ctx, machine=machine_id)
         else:
             console.print("[dim]No machine set - skipping apply.[/]")
 
 
+@app.command(rich_help_panel="Lifecycle")
+def fleet(
+    machine_ids: Annotated[
+        list[str],
+        typer.Argument(
+            metavar="machines",
+            help="The machines to apply.",
+            autocompletion=_complete_machines,
+            click_type=machines,
+        ),
+    ],
+    target_specs: Annotated[
+        list[str],
+        typer.Option(
+            "-t",
+            "--target",
+            metavar="MACHINE=TARGET",
+            help="Where to apply a machine (required for each): local, dir:PATH, ssh:HOST,"
+            " or exec:COMMAND.",
+        ),
+    ] = [],
+    full: Annotated[
+        bool,
+        typer.Option("--full", help="Re-apply every step, ignoring the last applied plan."),
+    ] = False,
+    parallel_scripts: Annotated[
+        bool,
+        typer.Option(
+            "-P",
+            "--parallel-scripts",
+            help="Run post-install scripts of different modules concurrently.",
+        ),
+    ] = False,
+) -> None:
+    """Check several machines, then apply them concurrently on their targets."""
+    from machine.fleet import apply_fleet, check_target, fleet_commands, parse_target
+    from machine.manifest import load_machine
+    from machine.ops.files import validate
+
+    root = settings.home
+    machine_ids = list(dict.fromkeys(machine_ids))
+    targets: dict[str, Target] = {}
+    for spec in target_specs:
+        machine_id, sep, target = spec.partition("=")
+        if not sep or machine_id not in machine_ids:
+            err_console.print(f"[red]Target must be MACHINE=TARGET for a listed machine: {spec}[/]")
+            raise SystemExit(1)
+        try:
+            targets[machine_id] = parse_target(target)
+        except ValueError as e:
+            err_console.print(f"[red]{e}[/]")
+            raise SystemExit(1) from None
+    missing = [m for m in machine_ids if m not in targets]
+    if missing:
+        err_console.print(f"[red]No target for {', '.join(missing)}. Add: -t MACHINE=TARGET[/]")
+        raise SystemExit(1)
+    if sum(t.spec == "local" for t in targets.values()) > 1:
+        err_console.print("[red]Only one machine can target this host (local).[/]")
+        raise SystemExit(1)
+
+    # Every machine is checked before any target starts; each target's apply plans for itself
+    errors: list[str] = []
+    console.print(f"Checking [bold]{len(machine_ids)}[/] machine(s)")
+    for machine_id in machine_ids:
+        manifest, modules = load_machine(machine_id, root)
+        errors += [f"{machine_id}: {e}" for e in validate(modules)]
+        files = len(manifest.files) + sum(len(m.files) for m in modules)
+        packages = len(manifest.packages) + sum(len(m.packages) for m in modules)
+        scripts = len(manifest.scripts) + sum(len(m.scripts) for m in modules)
+        if error := check_target(machine_id, targets[machine_id], packages, scripts):
+            errors.append(error)
+        console.print(
+            f"  [cyan]{machine_id:<12}[/] {len(modules)} modules, {files} files,"
+            f" {packages} packages, {scripts} scripts [dim]→ {targets[machine_id].spec}[/]"
+        )
+    if errors:
+        for e in errors:
+            err_console.print(f"[red]  {e}[/]")
+        raise SystemExit(1)
+
+    if settings.dry_run:
+        for cmd in fleet_commands(targets, full, parallel_scripts).values():
+            console.print(f"[dim](dry-run)[/] {cmd}")
+        return
+
+    results = apply_fleet(targets, full=full, parallel_scripts=parallel_scripts)
+    for result in results:
+        console.print(f"\n[bold]{result.machine}[/] [dim]({result.target.spec})[/]")
+        _print_summary(result.failures, result.target.log or result.target.spec)
+    failed = sum(bool(r.failures) for r in results)
+    console.print(f"\n[bold]{len(results) - failed}/{len(results)}[/] machine(s) applied cleanly")
+
+
+@app.command(rich_help_panel="Lifecycle")
+def watch(
+    machine: Annotated[
+        str,
+        typer.Option(
+            "-m",
+            "--machine",
+            metavar="MACHINE",
+            help="The machine whose deployed files to watch.",
+            autocompletion=_complete_machines,
+            click_type=machines,
+            default_factory=_current_machine_default,
+        ),
+    ],
+    module_names: Annotated[
+        list[str],
+        typer.Argument(
+            metavar="modules",
+            help="Limit watching to the specified modules.",
+            autocompletion=_complete_modules,
+        ),
+    ] = [],
+    fix: Annotated[
+        bool,
+        typer.Option("--fix", help="Re-link drifted targets instead of only reporting them."),
+    ] = False,
+    interval: Annotated[
+        float,
+        typer.Option(help="Seconds between checks where inotify is unavailable.", min=0.1),
+    ] = 2.0,
+) -> None:
+    """Report (or re-link) deployed files as applications replace them, until interrupted."""
+    import threading
+
+    from machine.ops.files import deploy_files
+    from machine.watch import Drift, watch_drift
+
+    if not machine:
+        err_console.print("[red]No machine set. Run: mc watch -m <machine>[/]")
+        raise SystemExit(1)
+    manifest, active, units = _load_units(machine, module_names)
+    owners = _build_owners(active, manifest, machine)
+    files = [fm for u in units for fm in u.files]
+
+    def _on_drift(drift: list[Drift]) -> None:
+        for d in drift:
+            module = owners.get(d.mapping.source, "?")
+            console.print(f"  [yellow]~[/] [dim]\\[{module}][/] {d.mapping.target} ({d.kind})")
+        if fix:
+            counts, failures = deploy_files([d.mapping for d in drift if d.fixable], owners)
+            console.print(f"  [green]Re-linked {counts.created + counts.updated}[/]")
+            for module, item, detail in failures:
+                err_console.print(f"  [red]\\[{module}][/] {item} [dim]({detail})[/]")
+
+    mode = "re-linking" if fix else "reporting"
+    console.print(f"Watching [bold]{len(files)}[/] deployed files of {machine}, {mode} drift")
+    try:
+        watch_drift(files, _on_drift, threading.Event(), interval=interval)
+    except KeyboardInterrupt:
+        console.print("\n[dim]Stopped watching.[/]")
+
+
 def _prompt_force(stash: bool, force: bool) -> bool:
     if force:
         choice = "discard"
@@ -397,6 +788,8 @@ def home() -> None:
 @app.command(rich_help_panel="Info")
 def private() -> None:
     """Print the resolved MC_PRIVATE path for the current machine."""
+    from machine.ops.scripts import build_script_env
+
     machine_id = get_current_machine()
     if not machine_id:
         err_console.print("[red]No machine set. Run: mc apply <machine>[/]")
@@ -444,15 +837,16 @@ def show(
             autocompletion=_complete_machines,
             click_type=machines,
             prompt=True,
+            default_factory=_current_machine_default,
         ),
-    ] = get_current_machine() or "",
+    ],
 ) -> None:
     """Show resolved configuration for a machine."""
-    from machine.manifest import load_manifest, resolve_modules
+    from machine.manifest import load_machine
+    from machine.ops.scripts import filter_scripts, script_meta
 
     root = settings.home
-    manifest = load_manifest(machine, root)
-    mods = resolve_modules(manifest.modules, root)
+    manifest, mods = load_machine(machine, root)
     root_prefix = str(root) + "/"
 
     def _short(path: str) -> str:
@@ -482,17 +876,15 @@ def show(
     all_scripts = [(m.name, s) for m in mods for s in m.scripts] + [
         (machine, s) for s in manifest.scripts
     ]
-    for title, prefix_test in [
-        ("Init Scripts", lambda n: n.startswith("init_")),
-        ("Scripts", lambda n: not n.startswith(("init_", "up_", "_"))),
-        ("Update Scripts", lambda n: n.startswith("up_")),
+    for title, phase in [
+        ("Init Scripts", "init"),
+        ("Scripts", "post"),
+        ("Update Scripts", "update"),
     ]:
         group = [
             (mod, s)
             for mod, s in all_scripts
-            if matches_platform(Path(s))
-            and not Path(s).stem.startswith("_")
-            and prefix_test(Path(s).name)
+            if filter_scripts([s]) and script_meta(s).phase == phase
         ]
         if group:
             console.print(f"\n[bold]{title}:[/]")
@@ -500,6 +892,80 @@ def show(
                 console.print(f"  [cyan]{mod:<12}[/] {_short(s)}")
 
 
+@app.command(rich_help_panel="Info")
+def status(
+    machine: Annotated[
+        str,
+        typer.Option(
+            "-m",
+            "--machine",
+            metavar="MACHINE",
+            help="The machine to check (default: the last applied).",
+            autocompletion=_complete_machines,
+            click_type=machines,
+            default_factory=_current_machine_default,
+        ),
+    ],
+    quiet: Annotated[
+        bool,
+        typer.Option("-q", "--quiet", help="Print only the summary line."),
+    ] = False,
+) -> None:
+    """Check whether a machine is converged. Exits 1 if anything is pending."""
+    from machine.manifest import load_machine
+    from machine.ops.packages import plan_installs
+    from machine.ops.scripts import plan_script_runs
+    from machine.plan import build_units
+    from machine.watch import find_drift
+
+    # Never prompts: status runs from shell prompts and cron
+    if not machine:
+        err_console.print("[red]No machine set. Run: mc status -m <machine>[/]")
+        raise SystemExit(1)
+
+    manifest, mods = load_machine(machine, settings.home)
+    units = build_units(mods, manifest, machine)
+    owners = _build_owners(mods, manifest, machine)
+
+    drift = find_drift([fm for u in units for fm in u.files])
+    by_manager: dict[str, list[str]] = {}
+    planned = plan_installs([p for u in units for p in u.packages], refresh=False)
+    for pkg, action, detail in planned:
+        if action != "installed":
+            key = {"install": detail, "missing": "no manager"}.get(action, f"{detail}?")
+            by_manager.setdefault(key, []).append(pkg.name)
+    scripts = [
+        (script, reason)
+        for script, reason in plan_script_runs([s for u in units for s in u.scripts])
+        if reason != "untracked"
+    ]
+
+    packages = sum(len(names) for names in by_manager.values())
+    if not (drift or packages or scripts):
+        console.print(f"[bold]{machine}[/]: [green]converged[/]")
+        return
+    console.print(
+        f"[bold]{machine}[/]: [yellow]{len(drift)} file(s), {packages} package(s),"
+        f" {len(scripts)} script(s) pending[/]"
+    )
+    if not quiet:
+        if drift:
+            console.print("\n[bold]Files:[/]")
+            for d in drift:
+                module = owners.get(d.mapping.source, "?")
+                console.print(f"  [cyan]{module:<12}[/] {d.mapping.target} [dim]({d.kind})[/]")
+        if by_manager:
+            console.print("\n[bold]Packages:[/]")
+            for manager, names in by_manager.items():
+                console.print(f"  [cyan]{manager:<12}[/] {', '.join(names)}")
+        if scripts:
+            console.print("\n[bold]Scripts:[/]")
+            for script, reason in scripts:
+                module = owners.get(script, "?")
+                console.print(f"  [cyan]{module:<12}[/] {Path(script).name} [dim]({reason})[/]")
+    raise SystemExit(1)
+
+
 def _pkg_sources(p: "Package") -> str:
     """Format package install sources as a short string."""
     sources: list[str] = []
@@ -512,3 +978,95 @@ def _pkg_sources(p: "Package") -> str:
     if p.script:
         sources.append("script")
     return ", ".join(sources)
+
+
+@app.command(rich_help_panel="Info")
+def report(
+    runs: Annotated[
+        int, typer.Option("-r", "--runs", min=1, help="Number of recent runs to include.")
+    ] = 10,
+    top: Annotated[int, typer.Option("-t", "--top", min=1, help="Slowest steps to list.")] = 10,
+) -> None:
+    """Show the slowest steps and per-module totals of recent applies and updates."""
+    from machine.journal import load_runs, module_totals
+
+    summaries, steps = load_runs(runs)
+    if not summaries:
+        console.print("[dim]No runs recorded yet.[/]")
+        return
+
+    console.print("[bold]Runs:[/]")
+    for r in summaries:
+        failed = f"  [red]{r['failures']} failed[/]" if r["failures"] else ""
+        console.print(
+            f"  {r['start'][:19]}  {r['command']:<7} {r['machine']:<12} {r['duration']:>8.1f}s"
+            f"{failed}"
+        )
+
+    console.print("\n[bold]Slowest steps:[/]")
+    for s in sorted(steps, key=lambda s: s["duration"], reverse=True)[:top]:
+        status = "" if s["status"] == "ok" else f" [red]({s['status']})[/]"
+        console.print(
+            f"  {s['duration']:>8.2f}s  {s['kind']:<15} [cyan]{s['module']:<12}[/] "
+            f"{s['item']}{status}"
+        )
+
+    console.print("\n[bold]Modules:[/]")
+    for module, count, seconds, failures in module_totals(steps):
+        failed = f"  [red]{failures} failed[/]" if failures else ""
+        console.print(f"  [cyan]{module:<12}[/] {seconds:>8.1f}s  {count:>4} steps{failed}")
+
+
+@app.command(rich_help_panel="Info")
+def bench(
+    machine_ids: Annotated[
+        list[str],
+        typer.Argument(
+            metavar="machines",
+            help="Machines to benchmark (default: all).",
+            autocompletion=_complete_machines,
+            click_type=machines,
+            show_default=False,
+        ),
+    ] = [],
+    repeat: Annotated[int, typer.Option("-r", "--repeat", min=1, help="Runs per benchmark.")] = 5,
+    output: Annotated[
+        Path | None,
+        typer.Option("-o", "--output", help="Results file (default: app dir bench/)."),
+    ] = None,
+    baseline: Annotated[
+        Path | None,
+        typer.Option("-b", "--baseline", exists=True, help="Results to compare against."),
+    ] = None,
+    max_regression: Annotated[
+        float | None,
+        typer.Option(
+            "--max-regression",
+            min=0,
+            help="Fail if a median is slower than the baseline by this fraction (0.2 = 20%).",
+        ),
+    ] = None,
+) -> None:
+    """Time CLI startup, manifest loading, and a dry-run apply."""
+    from machine.bench import load_results, regressions, run_benchmarks, save_results
+
+    root = settings.home
+    results = run_benchmarks(root, machine_ids or get_machines(), repeat=repeat)
+    previous = load_results(baseline) if baseline else {}
+
+    for name, timing in results.items():
+        line = f"  {name:<24} {timing.median:>9.1f} ms [dim](min {timing.min:.1f})[/]"
+        if name in previous and previous[name].median > 0:
+            change = timing.median / previous[name].median - 1
+            color = "red" if change > (max_regression or 0) else "green"
+            line += f"  [{color}]{change:+.0%}[/]"
+        console.print(line)
+
+    path = save_results(results, root, output)
+    console.print(f"\n[dim]Results: {path}[/]")
+
+    if max_regression is not None and previous:
+        slower = regressions(results, previous, max_regression)
+        if slower:
+            err_console.print(f"[red]Regressed beyond {max_regression:.0%}: {', '.join(slower)}[/]")
+            raise SystemExit(1)
@@ -0,0 +1,98 @@
+"""Machine and module name lookup for shell completion, without loading manifests."""
+
+import json
+import logging
+import os
+from pathlib import Path
+
+from machine.core import settings
+
+logger = logging.getLogger(__name__)
+
+_INDEX_FILE = settings.app_dir / "names.json"
+_INDEX_VERSION = 1
+
+# Directory scanned per kind, and the file marking a subdirectory as an entry
+_KINDS = {"machines": ("machines", "manifest.py"), "modules": ("config", "module.py")}
+
+
+def machine_names(root: Path) -> list[str]:
+    """Return machine IDs under *root*, from the name index when it is current."""
+    return _index(root)["machines"]
+
+
+def module_names(root: Path) -> list[str]:
+    """Return module names under *root*, from the name index when it is current."""
+    return _index(root)["modules"]
+
+
+def scan_names(directory: Path, marker: str) -> tuple[list[str], list[str]]:
+    """Return the entries of *directory*: `<name>/<marker>` dirs and `<name>.py` files.
+
+    Also returns the subdirectories lacking *marker*, whose `mtime` changes
+    once one is added.
+    """
+    names: set[str] = set()
+    pending: list[str] = []
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return [], []
+    for entry in entries:
+        if entry.is_dir():
+            if os.path.exists(os.path.join(entry.path, marker)):
+                names.add(entry.name)
+            else:
+                pending.append(entry.path)
+        elif entry.is_file() and entry.name.endswith(".py"):
+            names.add(entry.name.removesuffix(".py"))
+    return sorted(names), pending
+
+
+def _index(root: Path) -> dict[str, list[str]]:
+    """Return the cached name index, rescanning if any directory it was built from changed.
+
+    A hit costs one `stat` per scanned directory and per subdirectory still
+    lacking its marker file.
+    """
+    try:
+        data = json.loads(_INDEX_FILE.read_text())
+        if (
+            data.get("version") == _INDEX_VERSION
+            and data.get("root") == str(root)
+            and all(_mtime(path) == mtime for path, mtime in data["inputs"].items())
+        ):
+            return data["names"]
+    except FileNotFoundError:
+        pass
+    except (ValueError, KeyError, TypeError, AttributeError) as exc:
+        logger.debug("Ignoring name index %s: %s", _INDEX_FILE, exc)
+
+    names: dict[str, list[str]] = {}
+    inputs: dict[str, int | None] = {}
+    for kind, (subdir, marker) in _KINDS.items():
+        directory = root / subdir
+        inputs[str(directory)] = _mtime(directory)  # before scanning, so a racing change rescans
+        names[kind], pending = scan_names(directory, marker)
+        inputs |= {path: _mtime(path) for path in pending}
+    _save_index({"version": _INDEX_VERSION, "root": str(root), "inputs": inputs, "names": names})
+    return names
+
+
+def _save_index(data: dict) -> None:
+    if settings.dry_run:
+        return
+    try:
+        _INDEX_FILE.parent.mkdir(parents=True, exist_ok=True)
+        tmp = _INDEX_FILE.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(data))
+        tmp.replace(_INDEX_FILE)
+    except OSError as exc:
+        logger.debug("Could not write name index: %s", exc)
+
+
+def _mtime(path: str | Path) -> int | None:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
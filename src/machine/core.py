@@ -1,24 +1,33 @@
 """Platform detection, settings, logging, and shell execution."""
 
+import atexit
+import contextlib
+import functools
 import logging
 import os
+import queue
 import re
 import shutil
+import signal
 import subprocess
 import sys
+import threading
+import time
+from collections.abc import Iterator
 from enum import StrEnum
-from importlib.metadata import metadata
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, RotatingFileHandler
 from pathlib import Path
-from typing import ClassVar
+from typing import TYPE_CHECKING, ClassVar, TextIO
 
 import typer
 from rich.console import Console
 from rich.logging import RichHandler
 
+if TYPE_CHECKING:
+    from importlib.metadata import PackageMetadata
+
 # # MARK: Settings
 
-_meta = metadata("machine")
 # __file__ = src/machine/core.py → parents[2] = repo root
 _REPO_ROOT = Path(__file__).resolve().parents[2]
 
@@ -29,14 +38,38 @@ _ANSI_RE = re.compile(r"\x1b(?:\[[0-9;?]*[A-Za-z]|\][^\x07]*\x07|\([A-Z])")
 class Settings:
     """Mutable runtime settings singleton."""
 
-    name: ClassVar[str] = _meta["Name"]
-    version: ClassVar[str] = _meta["Version"]
-    description: ClassVar[str] = _meta["Summary"]
     app_dir: ClassVar[Path] = Path(typer.get_app_dir("mc"))
 
     debug: bool = False
     dry_run: bool = False
+    jobs: int = 4
+    parallel_scripts: bool = False
+    """Let post-install scripts of different units run concurrently, with buffered output."""
+    stub_managers: bool = False
+    """Treat every package manager as present with nothing installed, without probing them."""
     home: Path = _REPO_ROOT
+    capture_limit: int = 256 * 1024
+    """Bytes of each command's output kept in memory (the tail), unless captured in full."""
+
+    @property
+    def name(self) -> str:
+        return _metadata()["Name"]
+
+    @property
+    def version(self) -> str:
+        return _metadata()["Version"]
+
+    @property
+    def description(self) -> str:
+        return _metadata()["Summary"]
+
+
+@functools.cache
+def _metadata() -> "PackageMetadata":
+    """Read installed package metadata on first use; it costs a `sys.path` scan."""
+    from importlib.metadata import metadata
+
+    return metadata("machine")
 
 
 settings = Settings()
@@ -56,6 +89,7 @@ class Platform(StrEnum):
     GHCS = "ghcs"
 
 
+@functools.cache
 def _detect_platform() -> Platform:
     if os.environ.get("CODESPACES"):
         return Platform.GHCS
@@ -73,14 +107,32 @@ def _detect_platform() -> Platform:
             raise RuntimeError(f"Unsupported platform: {sys.platform}")
 
 
-PLATFORM = _detect_platform()
-"""Current platform, detected at import time."""
+# Declared here, bound by `__getattr__` on first access
+PLATFORM: Platform
+"""Current platform, detected on first access."""
+
+is_macos: bool
+is_linux: bool
+is_windows: bool
+is_wsl: bool
+is_unix: bool
+
 
-is_macos = PLATFORM == Platform.MACOS
-is_linux = PLATFORM in {Platform.LINUX, Platform.WSL, Platform.GHCS}
-is_windows = PLATFORM == Platform.WINDOWS
-is_wsl = PLATFORM == Platform.WSL
-is_unix = not is_windows
+def __getattr__(name: str) -> Platform | bool:
+    """Detect the platform when a platform constant is first imported."""
+    if name not in {"PLATFORM", "is_macos", "is_linux", "is_windows", "is_wsl", "is_unix"}:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    platform = _detect_platform()
+    constants = {
+        "PLATFORM": platform,
+        "is_macos": platform == Platform.MACOS,
+        "is_linux": platform in {Platform.LINUX, Platform.WSL, Platform.GHCS},
+        "is_windows": platform == Platform.WINDOWS,
+        "is_wsl": platform == Platform.WSL,
+        "is_unix": platform != Platform.WINDOWS,
+    }
+    globals().update(constants)
+    return constants[name]
 
 
 # # MARK: Console
@@ -121,10 +173,16 @@ def setup_console_logging() -> None:
 
 
 def setup_file_logging() -> None:
-    """Configure rotating file logging."""
+    """Configure rotating file logging, written by a background thread.
+
+    Loggers only enqueue records; `_LogWriter` formats, strips ANSI escapes,
+    and writes them in batches, and is flushed and stopped at exit. Calling
+    it again replaces the previous writer and its handler.
+    """
+    global _log_writer, _queue_handler
     log_file = settings.app_dir / "mc.log"
     log_file.parent.mkdir(parents=True, exist_ok=True)
-    handler = RotatingFileHandler(
+    handler = _BatchFileHandler(
         log_file,
         maxBytes=10 * 1024 * 1024,
         backupCount=3,
@@ -137,8 +195,20 @@ def setup_file_logging() -> None:
         )
     )
     handler.setLevel(logging.DEBUG)
-    logging.root.addHandler(handler)
-    _output_logger.addHandler(handler)  # tee output goes to file only
+    handler.addFilter(_strip_output_ansi)
+
+    if _queue_handler is not None:
+        logging.root.removeHandler(_queue_handler)
+        _output_logger.removeHandler(_queue_handler)
+    if _log_writer is not None:
+        atexit.unregister(_log_writer.stop)
+        _log_writer.stop()
+    _log_writer = _LogWriter(handler)
+    _queue_handler = _EnqueueHandler(_log_writer.queue)
+    _queue_handler.setLevel(logging.DEBUG)
+    logging.root.addHandler(_queue_handler)
+    _output_logger.addHandler(_queue_handler)  # tee output goes to file only
+    atexit.register(_log_writer.stop)
 
     # Separator for new invocations
     _logger.debug("=" * 60)
@@ -146,6 +216,86 @@ def setup_file_logging() -> None:
     _logger.debug("=" * 60)
 
 
+_log_writer: "_LogWriter | None" = None
+_queue_handler: "_EnqueueHandler | None" = None
+_LOG_BATCH = 512
+
+
+class _EnqueueHandler(QueueHandler):
+    """Queue handler that leaves formatting to the writer thread.
+
+    `QueueHandler.prepare` formats each record on the logging thread, for
+    queues crossing process boundaries; this queue stays in-process.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class _BatchFileHandler(RotatingFileHandler):
+    """Rotating file handler that writes a batch of records with a single flush."""
+
+    def emit_batch(self, records: list[logging.LogRecord]) -> None:
+        self.acquire()
+        try:
+            for record in records:
+                if not self.filter(record):
+                    continue
+                try:
+                    if self.shouldRollover(record):
+                        self.doRollover()
+                    if self.stream is None:
+                        self.stream = self._open()
+                    self.stream.write(self.format(record) + self.terminator)
+                except Exception:
+                    self.handleError(record)
+            self.flush()
+        finally:
+            self.release()
+
+
+class _LogWriter:
+    """Drain queued log records on one thread, in order, and write them in batches."""
+
+    _STOP = object()
+
+    def __init__(self, handler: _BatchFileHandler) -> None:
+        self.queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._handler = handler
+        self._thread = threading.Thread(target=self._run, name="mc-log", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Write everything queued so far, then close the log file."""
+        if self._thread.is_alive():
+            self.queue.put(self._STOP)
+            self._thread.join()
+        self._handler.close()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < _LOG_BATCH:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = self._STOP in batch
+            self._handler.emit_batch([r for r in batch if r is not self._STOP])
+            if stop:
+                return
+
+
+def _strip_output_ansi(record: logging.LogRecord) -> bool:
+    """Strip ANSI escapes from tee'd output lines and drop lines left blank."""
+    if record.name != _output_logger.name:
+        return True
+    prefix, sep, line = record.getMessage().partition("| ")
+    line = _ANSI_RE.sub("", line).rstrip()
+    record.msg, record.args = f"{prefix}{sep}{line}", None
+    return bool(line)
+
+
 # # MARK: Shell
 
 
@@ -154,8 +304,27 @@ def run_collect(
     *,
     env: dict[str, str] | None = None,
     label: str = "",
+    prefixed: bool = False,
+    buffered: bool = False,
+    keep: re.Pattern[str] | None = None,
+    full: bool = False,
+    timeout: float | None = None,
 ) -> tuple[int, bytearray]:
-    """Run a shell command, streaming output and returning its exit code and output."""
+    """Run a shell command, streaming output and returning its exit code and output.
+
+    With *prefixed*, terminal output is written as whole lines tagged with
+    *label* so concurrent commands stay attributable. With *buffered*, the
+    tagged lines are held until the command exits and written as one block;
+    the command gets no stdin, since nobody would see its prompts.
+
+    Only the last `settings.capture_limit` bytes of output are returned, so
+    memory stays flat for chatty commands. Lines matching *keep* that scrolled
+    out of that tail are prepended to it. With *full*, all output is returned.
+
+    A command still running after *timeout* seconds is killed along with the
+    children it started, and `subprocess.TimeoutExpired` is raised. Such a
+    command runs in its own session, without a controlling terminal.
+    """
     _logger.debug("$ %s", _short(cmd))
 
     if settings.dry_run:
@@ -164,19 +333,31 @@ def run_collect(
 
     merged_env = {**os.environ, **(env or {})}
 
-    if is_unix:
-        rc, collected = _tee_pty(cmd, merged_env)
+    if buffered:
+        writer: _PlainWriter | _PrefixedWriter = _BufferedWriter(label)
     else:
-        rc, collected = _tee_pipe(cmd, merged_env)
+        writer = _PrefixedWriter(label) if prefixed else _PlainWriter()
+    stdin = subprocess.DEVNULL if buffered else sys.stdin
+    sink = _OutputSink(
+        writer,
+        label,
+        limit=None if full else settings.capture_limit,
+        keep=keep,
+    )
+    try:
+        if _detect_platform() != Platform.WINDOWS:
+            rc = _tee_pty(cmd, merged_env, sink, stdin, timeout)
+        else:
+            rc = _tee_pipe(cmd, merged_env, sink, stdin, timeout)
+    finally:
+        sink.close()
 
-    # Log captured output line by line (strip ANSI escapes for the log file)
-    prefix = f"[{label}] " if label else ""
-    for line in collected.decode(errors="replace").splitlines():
-        stripped = _ANSI_RE.sub("", line).rstrip()
-        if stripped:
-            _output_logger.debug("%s| %s", prefix, stripped)
+    from machine.journal import note_command  # journal imports core
 
-    return rc, collected
+    note_command(rc, sink.total)
+    if sink.dropped:
+        _logger.debug("Kept the last %d of %d output bytes", len(sink.tail), sink.total)
+    return rc, sink.output()
 
 
 def run(
@@ -184,86 +365,343 @@ def run(
     *,
     env: dict[str, str] | None = None,
     label: str = "",
+    prefixed: bool = False,
+    buffered: bool = False,
+    timeout: float | None = None,
 ) -> int:
     """Run a shell command, streaming output to terminal and log file."""
-    rc, _ = run_collect(cmd, env=env, label=label)
+    rc, _ = run_collect(
+        cmd, env=env, label=label, prefixed=prefixed, buffered=buffered, timeout=timeout
+    )
     return rc
 
 
-def _tee_pty(cmd: str, env: dict[str, str]) -> tuple[int, bytearray]:
-    """Run *cmd* inside a pty, teeing output to stdout. Unix only."""
+_stdout_lock = threading.Lock()
+
+
+def _write_stdout(data: bytes) -> None:
+    """Write raw bytes to stdout, serialized across threads."""
+    with _stdout_lock:
+        sys.stdout.buffer.write(data)
+        sys.stdout.buffer.flush()
+
+
+class _PlainWriter:
+    """Stream output chunks to stdout as they arrive."""
+
+    def write(self, chunk: bytes) -> None:
+        _write_stdout(chunk)
+
+    def close(self) -> None:
+        pass
+
+
+class _PrefixedWriter:
+    """Stream complete output lines to stdout, each tagged with a label."""
+
+    def __init__(self, label: str) -> None:
+        self._prefix = f"[{label}] ".encode() if label else b""
+        self._pending = bytearray()
+
+    def write(self, chunk: bytes) -> None:
+        self._pending.extend(chunk)
+        end = self._pending.rfind(b"\n")
+        if end < 0:
+            return
+        lines = self._pending[: end + 1].splitlines(keepends=True)
+        del self._pending[: end + 1]
+        _write_stdout(b"".join(self._prefix + line for line in lines))
+
+    def close(self) -> None:
+        if self._pending:
+            _write_stdout(self._prefix + bytes(self._pending) + b"\n")
+            self._pending.clear()
+
+
+class _BufferedWriter(_PrefixedWriter):
+    """Hold all output until the command exits, then write it as one tagged block."""
+
+    def write(self, chunk: bytes) -> None:
+        self._pending.extend(chunk)
+
+    def close(self) -> None:
+        if self._pending:
+            lines = self._pending.splitlines(keepends=True)
+            if not lines[-1].endswith(b"\n"):
+                lines[-1] += b"\n"
+            _write_stdout(b"".join(self._prefix + line for line in lines))
+            self._pending.clear()
+
+
+class _OutputSink:
+    """Fan subprocess output out to a terminal writer, the log file, and a buffer.
+
+    Log lines are split as chunks arrive, so the output needs no second
+    pass once the command exits. The buffer keeps
+    only the last *limit* bytes (all with None), plus lines matching *keep*.
+    """
+
+    def __init__(
+        self,
+        writer: _PlainWriter | _PrefixedWriter,
+        label: str,
+        limit: int | None = None,
+        keep: re.Pattern[str] | None = None,
+    ) -> None:
+        self.tail = bytearray()
+        self.total = 0
+        self._writer = writer
+        self._prefix = f"[{label}] " if label else ""
+        self._limit = limit
+        self._keep = keep
+        self._kept: list[tuple[int, bytes]] = []  # (offset of the chunk, matched line)
+        self._pending = bytearray()
+        self._log = _output_logger.isEnabledFor(logging.DEBUG) and _output_logger.hasHandlers()
+
+    @property
+    def dropped(self) -> int:
+        """Bytes of output no longer in the tail."""
+        return self.total - len(self.tail)
+
+    def feed(self, chunk: bytes) -> None:
+        self._writer.write(chunk)
+        self.total += len(chunk)
+        self.tail.extend(chunk)
+        if self._limit is not None and len(self.tail) > self._limit:
+            del self.tail[: len(self.tail) - self._limit]
+        if not (self._log or self._keep):
+            return
+        self._pending.extend(chunk)
+        end = self._pending.rfind(b"\n")
+        if end >= 0:
+            self._split_lines(self._pending[:end], self.total - len(self._pending))
+            del self._pending[: end + 1]
+
+    def close(self) -> None:
+        if self._pending:
+            self._split_lines(self._pending, self.total - len(self._pending))
+            self._pending.clear()
+        self._writer.close()
+
+    def output(self) -> bytearray:
+        """Return the tail, preceded by kept lines that scrolled out of it."""
+        kept = [line + b"\n" for offset, line in self._kept if offset < self.dropped]
+        return bytearray().join([*kept, self.tail]) if kept else self.tail
+
+    def _split_lines(self, data: bytes | bytearray, offset: int) -> None:
+        """Log and keep the lines of *data*, which starts at output *offset*."""
+        # ANSI escapes are stripped from log lines by the log writer thread
+        for raw in data.splitlines(keepends=True):
+            start, offset = offset, offset + len(raw)
+            line = raw.rstrip(b"\r\n")
+            if not line.strip():
+                continue
+            text = line.decode(errors="replace")
+            if self._keep is not None and self._keep.search(_ANSI_RE.sub("", text)):
+                self._kept.append((start, bytes(line)))
+            if self._log:
+                _output_logger.debug("%s| %s", self._prefix, text)
+
+
+# The terminal's stdin, or DEVNULL for commands whose output is buffered
+type _StdIn = TextIO | int
+
+# Reads start small for interactive output and grow while the command floods the pipe
+_READ_MIN = 16 * 1024
+_READ_MAX = 256 * 1024
+
+
+def _tee_pty(
+    cmd: str,
+    env: dict[str, str],
+    sink: _OutputSink,
+    stdin: _StdIn,
+    timeout: float | None = None,
+) -> int:
+    """Run *cmd* inside a pty, teeing output to *sink*. Unix only.
+
+    A selector waits on the pty and on process exit together, so output is
+    forwarded as soon as it arrives and the loop ends when the command does,
+    even if a background child keeps the pty open.
+    """
     import pty
-    import select
+    import selectors
 
     primary, replica = pty.openpty()
     proc = subprocess.Popen(
         cmd,
         shell=True,
         env=env,
-        stdin=sys.stdin,
+        stdin=stdin,
         stdout=replica,
         stderr=replica,
+        start_new_session=timeout is not None,  # so a timeout can kill its children too
     )
     os.close(replica)  # parent doesn't write to the replica side
 
-    collected = bytearray()
+    size = _READ_MIN
     try:
-        while True:
-            ready, _, _ = select.select([primary], [], [], 0.1)
-            if ready:
-                try:
-                    chunk = os.read(primary, 4096)
-                except OSError:
-                    break
-                if not chunk:
-                    break
-                sys.stdout.buffer.write(chunk)
-                sys.stdout.buffer.flush()
-                collected.extend(chunk)
-            elif proc.poll() is not None:
-                # Process exited; drain remaining output
-                while True:
-                    try:
-                        chunk = os.read(primary, 4096)
-                    except OSError:
-                        break
+        with (
+            _deadline(proc, timeout) as expired,
+            _exit_signal(proc) as exited,
+            selectors.DefaultSelector() as selector,
+        ):
+            selector.register(primary, selectors.EVENT_READ)
+            selector.register(exited, selectors.EVENT_READ)
+            while True:
+                ready = {key.fd for key, _ in selector.select()}
+                if primary in ready:
+                    chunk = _read(primary, size)
                     if not chunk:
                         break
-                    sys.stdout.buffer.write(chunk)
-                    sys.stdout.buffer.flush()
-                    collected.extend(chunk)
-                break
+                    sink.feed(chunk)
+                    if len(chunk) == size:
+                        size = min(size * 2, _READ_MAX)
+                elif exited in ready:
+                    # Process exited; drain what is already buffered
+                    os.set_blocking(primary, False)
+                    while chunk := _read(primary, _READ_MAX):
+                        sink.feed(chunk)
+                    break
     finally:
         os.close(primary)
 
     proc.wait()
-    return proc.returncode, collected
+    if expired.is_set() and proc.returncode != 0:
+        raise subprocess.TimeoutExpired(cmd, timeout or 0)
+    return proc.returncode
+
+
+def _read(fd: int, size: int) -> bytes:
+    """Read from *fd*, treating a closed pty (EIO) or an empty buffer as the end."""
+    try:
+        return os.read(fd, size)
+    except OSError:
+        return b""
 
 
-def _tee_pipe(cmd: str, env: dict[str, str]) -> tuple[int, bytearray]:
+@contextlib.contextmanager
+def _exit_signal(proc: subprocess.Popen[bytes]) -> Iterator[int]:
+    """Yield a file descriptor that becomes readable once *proc* exits.
+
+    Uses a pidfd where available (Linux). Elsewhere a waiter thread closes a
+    pipe on exit; signal handlers are not an option since commands may run
+    off the main thread.
+    """
+    try:
+        pidfd = os.pidfd_open(proc.pid)
+    except AttributeError, OSError:
+        pass
+    else:
+        try:
+            yield pidfd
+        finally:
+            os.close(pidfd)
+        return
+
+    read_fd, write_fd = os.pipe()
+
+    def _wait() -> None:
+        proc.wait()
+        os.close(write_fd)
+
+    threading.Thread(target=_wait, name="mc-exit-wait", daemon=True).start()
+    try:
+        yield read_fd
+    finally:
+        os.close(read_fd)
+
+
+# Seconds a timed-out command's process group gets to exit after SIGTERM before SIGKILL
+_KILL_GRACE = 5.0
+
+
+@contextlib.contextmanager
+def _deadline(proc: subprocess.Popen[bytes], timeout: float | None) -> Iterator[threading.Event]:
+    """Kill *proc* and its children if it is still running after *timeout* seconds.
+
+    *proc* must lead its own session (see `start_new_session`), so children it
+    backgrounded are signalled too: SIGTERM first, then SIGKILL for whatever
+    is left after `_KILL_GRACE` seconds. Yields an event that is set once the
+    process was killed; leaving the context waits for the kill to finish.
+    """
+    expired = threading.Event()
+    if timeout is None:
+        yield expired
+        return
+
+    def _expire() -> None:
+        expired.set()
+        _signal_group(proc, "SIGTERM")
+        end = time.monotonic() + _KILL_GRACE
+        while time.monotonic() < end:
+            proc.poll()  # reap the leader, so only live members keep the group
+            if not _signal_group(proc, None):
+                return
+            time.sleep(0.05)
+        _signal_group(proc, "SIGKILL")
+
+    timer = threading.Timer(timeout, _expire)
+    timer.daemon = True
+    timer.start()
+    try:
+        yield expired
+    finally:
+        timer.cancel()
+        if expired.is_set():
+            timer.join()
+
+
+def _signal_group(proc: subprocess.Popen[bytes], name: str | None) -> bool:
+    """Send signal *name* to the process group *proc* leads, or probe it with None.
+
+    Returns whether the group still had members. Without process groups
+    (Windows) only *proc* itself is killed.
+    """
+    if not hasattr(os, "killpg"):
+        if name is not None:
+            proc.kill()
+        return proc.poll() is None
+    try:
+        os.killpg(proc.pid, getattr(signal, name) if name else 0)
+    except ProcessLookupError, PermissionError:  # gone, or only setuid members remain
+        return False
+    return True
+
+
+def _tee_pipe(
+    cmd: str,
+    env: dict[str, str],
+    sink: _OutputSink,
+    stdin: _StdIn,
+    timeout: float | None = None,
+) -> int:
     """Fallback tee using pipes (no color preservation). Windows."""
-    exe = shutil.which("powershell.exe") if is_windows else None
+    exe = shutil.which("powershell.exe") if _detect_platform() == Platform.WINDOWS else None
     proc = subprocess.Popen(
         cmd,
         shell=True,
         executable=exe,
         env=env,
+        stdin=stdin,
         stdout=subprocess.PIPE,
         stderr=subprocess.STDOUT,
+        start_new_session=timeout is not None,
     )
     assert proc.stdout is not None
 
-    collected = bytearray()
-    while True:
-        chunk = os.read(proc.stdout.fileno(), 4096)
-        if not chunk:
-            break
-        sys.stdout.buffer.write(chunk)
-        sys.stdout.buffer.flush()
-        collected.extend(chunk)
-
-    proc.wait()
-    return proc.returncode, collected
+    # Windows cannot select on pipes; blocking reads return as soon as data arrives
+    size = _READ_MIN
+    with _deadline(proc, timeout) as expired:
+        while chunk := os.read(proc.stdout.fileno(), size):
+            sink.feed(chunk)
+            if len(chunk) == size:
+                size = min(size * 2, _READ_MAX)
+        proc.wait()
+
+    if expired.is_set() and proc.returncode != 0:
+        raise subprocess.TimeoutExpired(cmd, timeout or 0)
+    return proc.returncode
 
 
 def _short(cmd: str) -> str:
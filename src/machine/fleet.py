@@ -0,0 +1,185 @@
+"""Fleet applies: check several machines locally, then apply each on its own target."""
+
+import json
+import logging
+import re
+import shlex
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from machine.core import run_collect, settings
+
+logger = logging.getLogger(__name__)
+
+# Last line `mc apply --summary-json` prints, carrying its failures back to the fleet
+SUMMARY_PREFIX = "mc-summary: "
+_SUMMARY_RE = re.compile(rf"^{re.escape(SUMMARY_PREFIX)}")
+
+# # MARK: Targets
+
+
+@dataclass(frozen=True, slots=True)
+class Target:
+    """Where a machine is applied, and how `mc` is reached there.
+
+    `transport` is the command prefix (e.g. `ssh host`) the apply command is
+    appended to; it is empty for this host. Remote targets run their own
+    `mc`; local ones run this interpreter, with `env` applied. `files_only`
+    targets redirect only where files are deployed, so a machine applied
+    there must have no packages or scripts.
+    """
+
+    spec: str
+    transport: tuple[str, ...] = ()
+    env: dict[str, str] = field(default_factory=dict)
+    remote: bool = False
+    files_only: bool = False
+    log: str = ""
+
+
+def parse_target(spec: str) -> Target:
+    """Parse `local`, `dir:PATH`, `ssh:HOST`, or `exec:COMMAND`.
+
+    `dir:` targets apply into a directory used as the home (and app dir
+    parent), like a chroot or mounted container root; since commands run by
+    packages and scripts would still run on this host, they are files-only
+    (see `check_target`). `exec:` prefixes any
+    command, e.g. `exec:docker exec -i box` or a local stand-in for SSH.
+    Raises ValueError for anything else.
+    """
+    kind, _, value = spec.partition(":")
+    match kind:
+        case "local" if not value:
+            return Target(spec, log=str(settings.app_dir / "mc.log"))
+        case "dir" if value:
+            home = Path(value).expanduser().resolve()
+            env = {
+                "HOME": str(home),
+                "USERPROFILE": str(home),
+                "APPDATA": str(home / "AppData" / "Roaming"),
+                "XDG_CONFIG_HOME": str(home / ".config"),
+            }
+            return Target(spec, env=env, files_only=True, log=f"mc.log under {home}")
+        case "ssh" if value:
+            return Target(spec, transport=("ssh", value), remote=True, log=f"mc.log on {value}")
+        case "exec" if value:
+            return Target(spec, transport=tuple(shlex.split(value)), remote=True)
+    raise ValueError(
+        f"Invalid target {spec!r}: expected local, dir:PATH, ssh:HOST, or exec:COMMAND"
+    )
+
+
+def check_target(machine_id: str, target: Target, packages: int, scripts: int) -> str | None:
+    """Return why *machine_id* cannot be applied on *target*, or None if it can."""
+    if target.files_only and (packages or scripts):
+        return (
+            f"{machine_id}: {target.spec} only deploys files, but the machine has"
+            f" {packages} packages and {scripts} scripts that would run on this host"
+        )
+    return None
+
+
+# # MARK: Apply
+
+
+@dataclass(frozen=True, slots=True)
+class FleetResult:
+    """Outcome of one machine's apply."""
+
+    machine: str
+    target: Target
+    exit_code: int
+    failures: list[tuple[str, str, str]]
+
+
+def apply_command(
+    machine_id: str,
+    target: Target,
+    full: bool = False,
+    parallel_scripts: bool = False,
+    jobs: int | None = None,
+) -> str:
+    """Return the shell command applying *machine_id* on *target* with *jobs* workers.
+
+    *jobs* defaults to `settings.jobs`.
+    """
+    mc = ["mc"] if target.remote else [sys.executable, "-m", "machine"]
+    argv = [*target.transport, *mc, "-j", str(jobs or settings.jobs)]
+    if settings.debug:
+        argv.append("-d")
+    argv += ["apply", "-m", machine_id, "--summary-json"]
+    if full:
+        argv.append("--full")
+    if parallel_scripts:
+        argv.append("--parallel-scripts")
+    return shlex.join(argv)
+
+
+def fleet_commands(
+    targets: dict[str, Target],
+    full: bool = False,
+    parallel_scripts: bool = False,
+) -> dict[str, str]:
+    """Return the apply command per machine.
+
+    Applies on this host share `settings.jobs` between them, so the fleet
+    never runs more than that many workers here; remote ones keep it.
+    """
+    local = sum(not t.remote for t in targets.values())
+    jobs = max(1, settings.jobs // max(1, local))
+    return {
+        machine_id: apply_command(
+            machine_id, target, full, parallel_scripts, None if target.remote else jobs
+        )
+        for machine_id, target in targets.items()
+    }
+
+
+def apply_fleet(
+    targets: dict[str, Target],
+    full: bool = False,
+    parallel_scripts: bool = False,
+) -> list[FleetResult]:
+    """Apply every machine on its target concurrently, on up to `settings.jobs` workers.
+
+    Commands come from `fleet_commands`. Output is tagged with the machine
+    ID. Failures come from each apply's summary line, or from its exit code
+    when it printed none.
+    """
+    commands = fleet_commands(targets, full, parallel_scripts)
+
+    def _apply(machine_id: str) -> FleetResult:
+        target, cmd = targets[machine_id], commands[machine_id]
+        logger.info("[%s] %s", machine_id, cmd)
+        rc, output = run_collect(
+            cmd, env=target.env, label=machine_id, prefixed=True, keep=_SUMMARY_RE
+        )
+        failures = parse_summary(output)
+        if failures is None:
+            failures = [] if rc == 0 else [(machine_id, "mc apply", f"exit {rc}")]
+        return FleetResult(machine_id, target, rc, failures)
+
+    workers = max(1, min(settings.jobs, len(targets)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mc-fleet") as pool:
+        return list(pool.map(_apply, targets))
+
+
+def summary_line(failures: list[tuple[str, str, str]]) -> str:
+    """Return the machine-readable summary `mc apply --summary-json` prints last."""
+    return SUMMARY_PREFIX + json.dumps({"failures": failures})
+
+
+def parse_summary(output: bytes | bytearray) -> list[tuple[str, str, str]] | None:
+    """Return the failures from the last summary line in *output*, or None."""
+    for line in reversed(output.decode(errors="replace").splitlines()):
+        line = line.strip()
+        if line.startswith(SUMMARY_PREFIX):
+            try:
+                data = json.loads(line.removeprefix(SUMMARY_PREFIX))
+                return [(str(m), str(i), str(d)) for m, i, d in data["failures"]]
+            except (ValueError, KeyError, TypeError) as exc:
+                logger.debug("Unreadable apply summary %r: %s", line, exc)
+                return None
+    return None
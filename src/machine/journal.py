@@ -0,0 +1,179 @@
+"""Structured run journal: one JSON line per apply/update step, read by `mc report`."""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import UTC, datetime, timedelta
+
+from machine.core import settings
+
+logger = logging.getLogger(__name__)
+
+_JOURNAL_FILE = settings.app_dir / "journal.jsonl"
+_JOURNAL_MAX_BYTES = 4 * 1024 * 1024
+
+# # MARK: Recording
+
+
+@dataclass(slots=True)
+class Step:
+    """One timed step of a run. The code performing it fills in the outcome."""
+
+    kind: str
+    module: str
+    item: str
+    status: str = "ok"
+    detail: str = ""
+    exit_code: int | None = None
+    output_bytes: int | None = None
+
+
+@dataclass(slots=True)
+class _Run:
+    id: str
+    command: str
+    machine: str
+    start: datetime
+    records: list[dict] = field(default_factory=list)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+_run: _Run | None = None
+_local = threading.local()
+
+
+@contextmanager
+def run(command: str, machine: str) -> Iterator[None]:
+    """Journal the steps taken by *command*. Nested runs (e.g. `sync`) join the outer one.
+
+    Dry runs are not journaled.
+    """
+    global _run
+    if _run is not None or settings.dry_run:
+        yield
+        return
+
+    start = datetime.now(UTC)
+    current = _run = _Run(f"{start:%Y%m%dT%H%M%S}-{os.getpid()}", command, machine, start)
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        _run = None
+        _write(current, status)
+
+
+@contextmanager
+def step(kind: str, module: str, item: str) -> Iterator[Step]:
+    """Time one step (`file`, `package-check`, `package-install`, `script`).
+
+    Commands run through `run_collect` while the step is open record their
+    exit code and output size on it.
+    """
+    current = _run
+    entry = Step(kind, module, item)
+    if current is None:
+        yield entry
+        return
+
+    outer = getattr(_local, "step", None)
+    _local.step = entry
+    start = datetime.now(UTC)
+    began = time.perf_counter()
+    try:
+        yield entry
+    except BaseException as exc:
+        entry.status, entry.detail = "error", entry.detail or str(exc)
+        raise
+    finally:
+        _local.step = outer
+        duration = time.perf_counter() - began
+        record = {
+            "run": current.id,
+            **asdict(entry),
+            "start": start.isoformat(),
+            "end": (start + timedelta(seconds=duration)).isoformat(),
+            "duration": round(duration, 6),
+        }
+        with current.lock:
+            current.records.append(record)
+
+
+def note_command(exit_code: int, output_bytes: int) -> None:
+    """Attribute a finished command to the step open on this thread, if any."""
+    entry: Step | None = getattr(_local, "step", None)
+    if entry is not None:
+        entry.exit_code = exit_code
+        entry.output_bytes = (entry.output_bytes or 0) + output_bytes
+
+
+def _write(current: _Run, status: str) -> None:
+    end = datetime.now(UTC)
+    summary = {
+        "run": current.id,
+        "kind": "run",
+        "command": current.command,
+        "machine": current.machine,
+        "status": status,
+        "failures": sum(r["status"] != "ok" for r in current.records),
+        "start": current.start.isoformat(),
+        "end": end.isoformat(),
+        "duration": round((end - current.start).total_seconds(), 6),
+    }
+    lines = [json.dumps(r) for r in [*current.records, summary]]
+    try:
+        _JOURNAL_FILE.parent.mkdir(parents=True, exist_ok=True)
+        _trim()
+        with _JOURNAL_FILE.open("a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+    except OSError as exc:
+        logger.debug("Could not write run journal: %s", exc)
+
+
+def _trim() -> None:
+    """Drop the oldest half of the journal once it outgrows its size budget."""
+    if not _JOURNAL_FILE.exists() or _JOURNAL_FILE.stat().st_size <= _JOURNAL_MAX_BYTES:
+        return
+    lines = _JOURNAL_FILE.read_text(encoding="utf-8").splitlines(keepends=True)
+    tmp = _JOURNAL_FILE.with_suffix(".tmp")
+    tmp.write_text("".join(lines[len(lines) // 2 :]), encoding="utf-8")
+    tmp.replace(_JOURNAL_FILE)
+
+
+# # MARK: Reading
+
+
+def load_runs(limit: int) -> tuple[list[dict], list[dict]]:
+    """Return the last *limit* run summaries and the steps of those runs."""
+    if not _JOURNAL_FILE.exists():
+        return [], []
+    records: list[dict] = []
+    for line in _JOURNAL_FILE.read_text(encoding="utf-8").splitlines():
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            continue  # a torn line from an interrupted write
+    runs = [r for r in records if r.get("kind") == "run"][-limit:]
+    ids = {r["run"] for r in runs}
+    steps = [r for r in records if r.get("kind") != "run" and r.get("run") in ids]
+    return runs, steps
+
+
+def module_totals(steps: list[dict]) -> list[tuple[str, int, float, int]]:
+    """Return `(module, steps, seconds, failures)` rows, most time first."""
+    totals: dict[str, list[float]] = {}
+    for s in steps:
+        row = totals.setdefault(s["module"], [0, 0.0, 0])
+        row[0] += 1
+        row[1] += s["duration"]
+        row[2] += s["status"] != "ok"
+    rows = [(m, int(n), seconds, int(failed)) for m, (n, seconds, failed) in totals.items()]
+    return sorted(rows, key=lambda row: row[2], reverse=True)
@@ -1,15 +1,25 @@
 """Machine manifest models and loaders."""
 
 import importlib.util
+import json
+import logging
+import os
 from pathlib import Path
 from typing import Self
 
 from pydantic import BaseModel, model_validator
 
-from machine.core import Platform
+from machine.completion import scan_names
+from machine.core import PLATFORM, Platform, settings
+from machine.profiling import traced
+
+logger = logging.getLogger(__name__)
 
 SCRIPT_SUFFIXES = {".sh", ".py", ".ps1"}
 
+_CACHE_DIR = settings.app_dir / "manifests"
+_CACHE_VERSION = 2
+
 
 # # MARK: Models
 
@@ -61,6 +71,8 @@ class Module(BaseModel):
     files: list[FileMapping] = []
     overrides: list[FileMapping] = []
     packages: list[Package] = []
+    bootstrap: bool = False
+    """Installs package managers: modules with packages or scripts apply after it."""
 
 
 class MachineManifest(BaseModel):
@@ -77,30 +89,12 @@ class MachineManifest(BaseModel):
 
 def list_modules(root: Path) -> list[str]:
     """List available module names by scanning ``config/``."""
-    modules_dir = root / "config"
-    if not modules_dir.exists():
-        return []
-    names: set[str] = set()
-    for entry in modules_dir.iterdir():
-        if entry.is_dir() and (entry / "module.py").exists():
-            names.add(entry.name)
-        elif entry.is_file() and entry.suffix == ".py":
-            names.add(entry.stem)
-    return sorted(names)
+    return scan_names(root / "config", "module.py")[0]
 
 
 def list_machines(root: Path) -> list[str]:
     """List available machine IDs by scanning ``machines/``."""
-    machines_dir = root / "machines"
-    if not machines_dir.exists():
-        return []
-    names: set[str] = set()
-    for entry in machines_dir.iterdir():
-        if entry.is_dir() and (entry / "manifest.py").exists():
-            names.add(entry.name)
-        elif entry.is_file() and entry.suffix == ".py":
-            names.add(entry.stem)
-    return sorted(names)
+    return scan_names(root / "machines", "manifest.py")[0]
 
 
 # # MARK: Loaders
@@ -155,6 +149,7 @@ def load_module(name: str, root: Path) -> Module:
     return result
 
 
+@traced("load_manifest")
 def load_manifest(machine_id: str, root: Path) -> MachineManifest:
     """Load a machine manifest from ``machines/<id>/manifest.py`` or ``machines/<id>.py``."""
     machine_dir = root / "machines" / machine_id
@@ -253,6 +248,109 @@ def _import_py(path: Path, module_name: str) -> object:
     return module
 
 
+@traced("resolve_modules")
 def resolve_modules(modules: list[str], root: Path) -> list[Module]:
     """Load full Module objects from module name strings."""
     return [load_module(name, root) for name in modules]
+
+
+# # MARK: Compiled Cache
+
+
+@traced("load_machine")
+def load_machine(machine_id: str, root: Path) -> tuple[MachineManifest, list[Module]]:
+    """Load a manifest and its resolved modules, reusing the compiled cache when valid.
+
+    The cache holds the resolved models as JSON, keyed by the platform and
+    the stat signatures of every file and directory the loaders consult.
+    On a hit, no manifest or module code is executed.
+    """
+    path = _CACHE_DIR / f"{machine_id}.json"
+    cached = _load_cached_machine(path, root)
+    if cached is not None:
+        return cached
+
+    manifest = load_manifest(machine_id, root)
+    modules = resolve_modules(manifest.modules, root)
+    _save_cached_machine(path, machine_id, root, manifest, modules)
+    return manifest, modules
+
+
+def _load_cached_machine(path: Path, root: Path) -> tuple[MachineManifest, list[Module]] | None:
+    try:
+        data = json.loads(path.read_text())
+        if data.get("key") != _cache_key(data["machine"], root, data["inputs"]):
+            return None
+        return (
+            MachineManifest.model_validate(data["manifest"]),
+            [Module.model_validate(m) for m in data["modules"]],
+        )
+    except FileNotFoundError:
+        return None
+    except (ValueError, KeyError, TypeError, AttributeError) as exc:
+        logger.debug("Ignoring compiled manifest cache %s: %s", path, exc)
+        return None
+
+
+def _save_cached_machine(
+    path: Path,
+    machine_id: str,
+    root: Path,
+    manifest: MachineManifest,
+    modules: list[Module],
+) -> None:
+    if settings.dry_run:
+        return
+    inputs = _cache_inputs(machine_id, root, modules)
+    data = {
+        "machine": machine_id,
+        "inputs": inputs,
+        "key": _cache_key(machine_id, root, inputs),
+        "manifest": manifest.model_dump(mode="json"),
+        "modules": [m.model_dump(mode="json") for m in modules],
+    }
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data))
+        tmp.replace(path)
+    except OSError as exc:
+        logger.debug("Could not write compiled manifest cache: %s", exc)
+
+
+def _cache_inputs(machine_id: str, root: Path, modules: list[Module]) -> list[str]:
+    """Return every path whose presence or content shapes the loaded machine.
+
+    Both manifest/module layouts are included so that adding either form
+    invalidates, as are `scripts/` directories (auto-discovered) and the
+    local override files modules look for in the machine directory.
+    """
+    machine_dir = root / "machines" / machine_id
+    paths = [
+        machine_dir / "manifest.py",
+        root / "machines" / f"{machine_id}.py",
+        machine_dir / "scripts",
+    ]
+    for m in modules:
+        module_dir = root / "config" / m.name
+        paths += [module_dir / "module.py", root / "config" / f"{m.name}.py"]
+        paths.append(module_dir / "scripts")
+        paths += [machine_dir / o.source for o in m.overrides]
+    return [str(p) for p in dict.fromkeys(paths)]
+
+
+def _cache_key(machine_id: str, root: Path, inputs: list[str]) -> list[object]:
+    """Return the validity key: format version, platform, and input signatures.
+
+    This loader module is part of the key, since it decides how inputs resolve.
+    """
+    signatures = {p: _stat_signature(Path(p)) for p in [__file__, *inputs]}
+    return [_CACHE_VERSION, PLATFORM, machine_id, str(root), signatures]
+
+
+def _stat_signature(path: Path) -> list[int] | None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
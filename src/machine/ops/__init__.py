@@ -6,7 +6,9 @@ from .scripts import (
     build_script_env,
     filter_scripts,
     matches_platform,
+    order_scripts,
     run_scripts,
+    script_meta,
     write_env_file,
 )
 
@@ -17,7 +19,9 @@ __all__ = [
     "filter_scripts",
     "install_packages",
     "matches_platform",
+    "order_scripts",
     "run_scripts",
+    "script_meta",
     "validate",
     "write_env_file",
 ]
@@ -1,123 +1,254 @@
 """Validation and file deployment."""
 
+import functools
 import logging
 import os
+import stat
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
 
+from machine import journal
 from machine.core import is_windows, settings
 from machine.manifest import FileMapping, Module
+from machine.profiling import traced
 
 logger = logging.getLogger(__name__)
 
+# Below this many paths, starting threads costs more than the overlapped `stat` calls save
+_PARALLEL_MIN = 32
+
 
 def validate(modules: list[Module]) -> list[str]:
     """Validate resolved modules. Returns a list of errors."""
-    errors: list[str] = []
+    checks = [
+        (f"Module '{mod.name}' file source missing: {fm.source}", fm.source)
+        for mod in modules
+        for fm in mod.files
+    ] + [
+        (f"Module '{mod.name}' script missing: {script}", script)
+        for mod in modules
+        for script in mod.scripts
+    ]
+    exists = _map(os.path.exists, [path for _, path in checks])
+    return [error for (error, _), ok in zip(checks, exists, strict=True) if not ok]
+
 
-    for mod in modules:
-        for fm in mod.files:
-            if not Path(fm.source).exists():
-                errors.append(f"Module '{mod.name}' file source missing: {fm.source}")
-        for script in mod.scripts:
-            if not Path(script).exists():
-                errors.append(f"Module '{mod.name}' script missing: {script}")
+@dataclass(slots=True)
+class DeployCounts:
+    """Outcome of `deploy_files` per link. Replaced links and files count as updated."""
 
-    return errors
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
 
 
+@traced("deploy_files")
 def deploy_files(
     files: list[FileMapping],
     owners: dict[str, str] | None = None,
-) -> tuple[int, list[tuple[str, str, str]]]:
-    """Symlink all file mappings. Returns (count created, failures)."""
-    created = 0
+) -> tuple[DeployCounts, list[tuple[str, str, str]]]:
+    """Symlink all file mappings. Returns link counts and failures.
+
+    Every target is checked first, with one `lstat` each and each parent
+    directory resolved once, on up to `settings.jobs` threads for large sets.
+    Only targets that need a change are then touched, in mapping order.
+    """
+    resolver = _PathResolver()
+    checks = _map(
+        lambda fm: _check(Path(fm.source), target_path(fm), resolver),
+        files,
+    )
+    counts = DeployCounts()
     failures: list[tuple[str, str, str]] = []
-    for fm in files:
-        src = Path(fm.source)
-        tgt = Path(os.path.expandvars(fm.target)).expanduser()
+    for fm, check in zip(files, checks, strict=True):
         module = (owners or {}).get(fm.source, "?")
-        if not src.exists():
-            logger.warning("[%s] source not found: %s", module, src)
-            failures.append((module, str(src), "source not found"))
-            continue
-        try:
-            if _symlink(src, tgt):
-                created += 1
-        except OSError as exc:
-            logger.error("[%s] failed to link %s → %s: %s", module, tgt, src, exc)
-            failures.append((module, str(tgt), str(exc)))
-    return created, failures
-
-
-def _symlink(source: Path, target: Path) -> bool:
-    """Create or update a link. Returns True if changed."""
-
-    def _norm(path: Path) -> str:
+        with journal.step("file", module, fm.target) as step:
+            if check.action == "missing":
+                logger.warning("[%s] source not found: %s", module, check.source)
+                failures.append((module, str(check.source), "source not found"))
+                step.status, step.detail = "failed", "source not found"
+                continue
+            try:
+                changed = _apply(check)
+            except OSError as exc:
+                logger.error(
+                    "[%s] failed to link %s → %s: %s", module, check.target, check.source, exc
+                )
+                failures.append((module, str(check.target), str(exc)))
+                step.status, step.detail = "failed", str(exc)
+                continue
+            if not changed:
+                counts.unchanged += 1
+            elif check.action == "create":
+                counts.created += 1
+                step.detail = "linked"
+            else:
+                counts.updated += 1
+                step.detail = "updated"
+
+    if files:
+        logger.info(
+            "Files: %d created, %d updated, %d unchanged",
+            counts.created,
+            counts.updated,
+            counts.unchanged,
+        )
+    return counts, failures
+
+
+def plan_links(files: list[FileMapping]) -> list[tuple[FileMapping, str]]:
+    """Return what `deploy_files` would do per mapping, without changing anything.
+
+    Actions are `create`, `update` (replace another link), `backup` (move a
+    file aside), `unchanged`, or `missing` (no source).
+    """
+    resolver = _PathResolver()
+    checks = _map(lambda fm: _check(Path(fm.source), target_path(fm), resolver), files)
+    return [(fm, check.action) for fm, check in zip(files, checks, strict=True)]
+
+
+def target_path(fm: FileMapping) -> Path:
+    """Return the expanded target path of a file mapping."""
+    return Path(os.path.expandvars(fm.target)).expanduser()
+
+
+def _map[T, R](fn: Callable[[T], R], items: list[T]) -> list[R]:
+    """Apply *fn* to *items* in order, on a thread pool when there are many."""
+    if settings.jobs <= 1 or len(items) < _PARALLEL_MIN:
+        return [fn(item) for item in items]
+    with ThreadPoolExecutor(max_workers=settings.jobs, thread_name_prefix="mc-fs") as pool:
+        return list(pool.map(fn, items))
+
+
+class _PathResolver:
+    """Normalize paths, resolving each parent directory only once."""
+
+    def __init__(self) -> None:
+        self._resolve_dir = functools.cache(self._resolve)
+
+    @staticmethod
+    def _resolve(path: Path) -> Path:
         try:
-            return os.path.normcase(str(path.resolve(strict=False)))
+            return path.resolve(strict=False)
         except OSError:
-            return os.path.normcase(str(path.absolute()))
+            return path.absolute()
+
+    def norm(self, path: Path) -> str:
+        """Return *path* with its parent resolved and case normalized."""
+        if path.name in {"", ".", ".."}:
+            return os.path.normcase(str(self._resolve(path)))
+        return os.path.normcase(str(self._resolve_dir(path.parent) / path.name))
+
+
+@dataclass(frozen=True, slots=True)
+class _LinkCheck:
+    """What linking *target* to *source* requires.
+
+    `action` is `unchanged`, `create`, `update` (replace another link),
+    `backup` (move an existing file aside first), or `missing` (no source).
+    """
+
+    source: Path
+    target: Path
+    action: str
+    is_dir: bool = False
+
+
+def _check(source: Path, target: Path, resolver: _PathResolver) -> _LinkCheck:
+    try:
+        source_st = os.stat(source)
+    except OSError:
+        return _LinkCheck(source, target, "missing")
+    is_dir = stat.S_ISDIR(source_st.st_mode)
+
+    try:
+        target_st = os.lstat(target)
+    except OSError:
+        return _LinkCheck(source, target, "create", is_dir)
+    if stat.S_ISLNK(target_st.st_mode):
+        same = _points_to(target, source, source_st, resolver)
+        return _LinkCheck(source, target, "unchanged" if same else "update", is_dir)
+    if _same_file(target_st, source_st):  # e.g. a hard link to the source
+        return _LinkCheck(source, target, "unchanged", is_dir)
+    return _LinkCheck(source, target, "backup", is_dir)
+
+
+def _points_to(
+    link: Path,
+    source: Path,
+    source_st: os.stat_result,
+    resolver: _PathResolver,
+) -> bool:
+    """Return True if the symlink *link* leads to *source*."""
+    try:
+        destination = Path(os.readlink(link))
+    except OSError:
+        return False
+    if not destination.is_absolute():
+        destination = link.parent / destination
+    if resolver.norm(destination) == resolver.norm(source):
+        return True
+    try:  # reached through other links, e.g. a linked parent directory
+        return _same_file(os.stat(link), source_st)
+    except OSError:
+        return False
 
-    def _points_to_source(link_path: Path, src_path: Path) -> bool:
-        try:
-            return link_path.exists() and os.path.samefile(link_path, src_path)
-        except OSError:
-            pass
 
-        try:
-            link_target = link_path.readlink()
-        except OSError:
-            return False
+def _same_file(a: os.stat_result, b: os.stat_result) -> bool:
+    return (a.st_dev, a.st_ino) == (b.st_dev, b.st_ino)
 
-        if not link_target.is_absolute():
-            link_target = link_path.parent / link_target
 
-        return _norm(link_target) == _norm(src_path)
+def _symlink(source: Path, target: Path) -> bool:
+    """Create or update a link. Returns True if changed."""
+    check = _check(source, target, _PathResolver())
+    if check.action == "missing":
+        raise FileNotFoundError(f"Source not found: {source}")
+    return _apply(check)
 
-    def _create_link(src_path: Path, dst_path: Path) -> None:
-        try:
-            dst_path.symlink_to(src_path, target_is_directory=src_path.is_dir())
-        except OSError as exc:
-            if is_windows and getattr(exc, "winerror", None) == 1314:
-                raise OSError(
-                    "Symlink creation failed - enable Developer Mode first.\n"
-                    "Settings → System → For developers → Developer Mode"
-                ) from exc
-            raise
-
-    def _backup_path(path: Path) -> Path:
-        backup = path.with_suffix(path.suffix + ".backup")
-        if not backup.exists() and not backup.is_symlink():
-            return backup
-
-        index = 1
-        while True:
-            candidate = path.with_suffix(path.suffix + f".backup.{index}")
-            if not candidate.exists() and not candidate.is_symlink():
-                return candidate
-            index += 1
 
+def _apply(check: _LinkCheck) -> bool:
+    """Carry out a checked link. Returns True if changed."""
+    source, target = check.source, check.target
+    if check.action == "unchanged":
+        logger.debug("OK: %s", target)
+        return False
     if settings.dry_run:
-        if (target.exists() or target.is_symlink()) and _points_to_source(target, source):
-            return False
         logger.info("[dry-run] link %s → %s", target, source)
         return True
 
     target.parent.mkdir(parents=True, exist_ok=True)
-
-    if (target.exists() or target.is_symlink()) and _points_to_source(target, source):
-        logger.debug("OK: %s", target)
-        return False
-
-    if target.is_symlink():
+    if check.action == "update":
         logger.info("Update: %s → %s", target, source)
         target.unlink()
-    elif target.exists():
+    elif check.action == "backup":
         backup = _backup_path(target)
         logger.info("Backup: %s → %s", target, backup)
         target.rename(backup)
     else:
         logger.info("Link: %s → %s", target, source)
 
-    _create_link(source, target)
+    try:
+        target.symlink_to(source, target_is_directory=check.is_dir)
+    except OSError as exc:
+        if is_windows and getattr(exc, "winerror", None) == 1314:
+            raise OSError(
+                "Symlink creation failed - enable Developer Mode first.\n"
+                "Settings → System → For developers → Developer Mode"
+            ) from exc
+        raise
     return True
+
+
+def _backup_path(path: Path) -> Path:
+    backup = path.with_suffix(path.suffix + ".backup")
+    if not backup.exists() and not backup.is_symlink():
+        return backup
+
+    index = 1
+    while True:
+        candidate = path.with_suffix(path.suffix + f".backup.{index}")
+        if not candidate.exists() and not candidate.is_symlink():
+            return candidate
+        index += 1
@@ -1,16 +1,25 @@
 """Package installation and manager detection."""
 
+import json
 import logging
 import os
+import re
 import shutil
 import subprocess
 import sys
+import tempfile
 import threading
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from dataclasses import dataclass
+from pathlib import Path
 from typing import Literal
 
+from machine import journal
 from machine.core import PLATFORM, Platform, is_unix, run, run_collect, settings
 from machine.manifest import Package
+from machine.profiling import traced
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +30,16 @@ type PackageSource = Literal["brew", "cask", "apt", "snap", "winget", "scoop", "
 class ManagerConfig:
     binary: str
     install_cmd: str
+    lock: str | None = None
+    """Lane shared by sources that must not install concurrently; defaults to `binary`."""
+    max_jobs: int = 1
+    """Concurrent installs allowed within the lane."""
+    batch_cmd: str | None = None
+    """Template installing many packages in one invocation; `None` disables batching."""
+
+    @property
+    def lane(self) -> str:
+        return self.lock or self.binary
 
 
 _PLATFORM_SOURCES: dict[Platform, tuple[PackageSource, ...]] = {
@@ -31,20 +50,100 @@ _PLATFORM_SOURCES: dict[Platform, tuple[PackageSource, ...]] = {
     Platform.WINDOWS: ("winget", "scoop"),
 }
 _MANAGER_CONFIGS: dict[PackageSource, ManagerConfig] = {
-    "brew": ManagerConfig(binary="brew", install_cmd="brew install {}"),
-    "cask": ManagerConfig(binary="brew", install_cmd="brew install --cask {}"),
-    "apt": ManagerConfig(binary="apt", install_cmd="sudo apt install -y {}"),
-    "snap": ManagerConfig(binary="snap", install_cmd="sudo snap install {}"),
+    "brew": ManagerConfig(
+        binary="brew",
+        install_cmd="brew install {}",
+        batch_cmd="brew install {}",
+    ),
+    "cask": ManagerConfig(
+        binary="brew",
+        install_cmd="brew install --cask {}",
+        batch_cmd="brew install --cask {}",
+    ),
+    "apt": ManagerConfig(
+        binary="apt",
+        install_cmd="sudo apt install -y -o DPkg::Lock::Timeout=300 {}",
+        lock="dpkg",
+        batch_cmd="sudo apt install -y -o DPkg::Lock::Timeout=300 {}",
+    ),
+    "snap": ManagerConfig(
+        binary="snap",
+        install_cmd="sudo snap install {}",
+        batch_cmd="sudo snap install {}",
+    ),
     "winget": ManagerConfig(
         binary="winget",
         install_cmd="winget install --accept-source-agreements --accept-package-agreements {}",
+        # formatted with the path of a generated `winget import` manifest
+        batch_cmd=(
+            'winget import --import-file "{}" --no-upgrade'
+            " --accept-source-agreements --accept-package-agreements"
+        ),
+    ),
+    "scoop": ManagerConfig(
+        binary="scoop",
+        install_cmd="scoop install {}",
+        batch_cmd="scoop install {}",
     ),
-    "scoop": ManagerConfig(binary="scoop", install_cmd="scoop install {}"),
-    "mas": ManagerConfig(binary="mas", install_cmd="mas install {}"),
+    "mas": ManagerConfig(
+        binary="mas",
+        install_cmd="mas install {}",
+        batch_cmd="mas install {}",
+    ),
+}
+
+# Installed-package snapshots, reused while the manager's database is untouched
+_SNAPSHOT_CACHE = settings.app_dir / "packages.json"
+_SNAPSHOT_CACHE_VERSION = 1
+_snapshot_cache_lock = threading.Lock()
+
+_WINGET_SOURCE = {
+    "Name": "winget",
+    "Argument": "https://cdn.winget.microsoft.com/cache",
+    "Identifier": "Microsoft.Winget.Source_8wekyb3d8bbwe",
+    "Type": "Microsoft.PreIndexed.Package",
 }
 
+# winget exits non-zero when a package is already installed and current
+_WINGET_INSTALLED = "found an existing package already installed"
+_WINGET_NO_UPGRADE = (
+    "no available upgrade found",
+    "no newer package versions are available from the configured sources",
+)
+_WINGET_NOOP_RE = re.compile(
+    "|".join(re.escape(msg) for msg in (_WINGET_INSTALLED, *_WINGET_NO_UPGRADE)), re.IGNORECASE
+)
+
 _sudo_keepalive: threading.Event | None = None
 
+# Process-wide lane slots, so concurrent `install_packages` calls share manager locks
+_lane_slots: dict[str, threading.Semaphore] = {}
+_lane_slots_lock = threading.Lock()
+
+
+@dataclass(frozen=True, slots=True)
+class _Managers:
+    """Installed managers and their snapshots, as seen after a PATH refresh."""
+
+    bins: set[str]
+    sources: set[PackageSource]
+    snapshots: dict[PackageSource, set[str]]
+
+
+# Set inside `shared_managers`: one PATH refresh and snapshot read for every install pass
+_shared: list[_Managers] | None = None
+_shared_lock = threading.Lock()
+
+
+@dataclass(frozen=True, slots=True)
+class _PendingInstall:
+    index: int
+    pkg: Package
+    source: PackageSource | None
+    applicable_sources: list[PackageSource]
+    can_run_script: bool
+    module: str
+
 
 def cache_sudo() -> None:
     """Prompt for sudo once and keep credentials alive in the background."""
@@ -82,23 +181,69 @@ def refresh_path() -> None:
         logger.debug("PATH refresh failed: %s", exc)
 
 
+@contextmanager
+def shared_managers() -> Iterator[Callable[[], None]]:
+    """Share one PATH refresh and one set of manager snapshots across install passes.
+
+    Yields a function that drops the shared state, to call once package
+    managers themselves were installed. Packages installed by an earlier
+    pass are not added to the shared snapshots; a manager treats a repeated
+    install of the same package as a no-op.
+    """
+    global _shared
+    shared: list[_Managers] = []
+    _shared = shared
+    try:
+        yield shared.clear
+    finally:
+        _shared = None
+
+
+def _managers(refresh: bool = True) -> _Managers:
+    """Return available managers and their snapshots, reusing shared ones when set.
+
+    Without *refresh*, managers are looked up on the current `PATH` instead
+    of the login shell's, which saves spawning that shell.
+    """
+    with _shared_lock:
+        if _shared:
+            return _shared[0]
+        if refresh and not settings.stub_managers:
+            refresh_path()
+        bins = _available_manager_bins()
+        sources = _available_sources(bins)
+        with journal.step("package-check", "-", "snapshots") as step:
+            if settings.stub_managers:
+                snapshots: dict[PackageSource, set[str]] = {source: set() for source in sources}
+            else:
+                snapshots = _installed_source_snapshots(sources)
+            step.detail = ", ".join(sorted(snapshots))
+        managers = _Managers(bins, sources, snapshots)
+        if _shared is not None:
+            _shared.append(managers)
+        return managers
+
+
+@traced("install_packages")
 def install_packages(
     packages: list[Package],
     owners: dict[str, str] | None = None,
     rerun_script_packages: bool = False,
+    prefixed: bool = False,
 ) -> list[tuple[str, str, str]]:
-    """Install packages using available managers. Returns list of failures."""
+    """Install packages using available managers. Returns list of failures.
+
+    With *prefixed*, output is line-tagged even when only one lane runs, for
+    callers that install from several threads at once.
+    """
     if not packages:
         return []
 
-    refresh_path()
+    managers = _managers()
+    available_sources, installed_sources = managers.sources, managers.snapshots
+    logger.info("Managers: %s", ", ".join(sorted(managers.bins)) or "none")
 
-    manager_bins = _available_manager_bins()
-    available_sources = _available_sources(manager_bins)
-    installed_sources = _installed_source_snapshots(available_sources)
-    logger.info("Managers: %s", ", ".join(sorted(manager_bins)) or "none")
-
-    failures: list[tuple[str, str, str]] = []
+    pending: list[_PendingInstall] = []
     skipped_installed = 0
     skipped_inapplicable = 0
     for pkg in packages:
@@ -110,26 +255,216 @@ def install_packages(
             skipped_inapplicable += 1
             continue
 
-        if _installed_with_requested_manager(
-            pkg,
-            selected_source,
-            installed_sources,
-            rerun_script_packages=rerun_script_packages,
-        ):
+        module = (owners or {}).get(pkg.name, "?")
+        with journal.step("package-check", module, pkg.name) as step:
+            installed = _installed_with_requested_manager(
+                pkg,
+                selected_source,
+                installed_sources,
+                rerun_script_packages=rerun_script_packages,
+            )
+            step.detail = "installed" if installed else "pending"
+        if installed:
             logger.debug("Skip (installed): %s", pkg.name)
             skipped_installed += 1
             continue
 
-        module = (owners or {}).get(pkg.name, "?")
-        fail = _install(pkg, selected_source, applicable_sources, can_run_script, module)
-        if fail:
-            failures.append(fail)
+        pending.append(
+            _PendingInstall(
+                index=len(pending),
+                pkg=pkg,
+                source=selected_source,
+                applicable_sources=applicable_sources,
+                can_run_script=can_run_script,
+                module=module,
+            )
+        )
 
     if skipped_installed:
         logger.info("Skipped %d already-installed package(s)", skipped_installed)
     if skipped_inapplicable:
         logger.info("Skipped %d package(s) that do not apply on %s", skipped_inapplicable, PLATFORM)
-    return failures
+    return _run_pending(pending, prefixed)
+
+
+def plan_installs(packages: list[Package], refresh: bool = True) -> list[tuple[Package, str, str]]:
+    """Return what `install_packages` would do per package, without installing.
+
+    Decisions come from manager snapshots (cached while the manager's
+    database is unchanged), never from per-package queries. Returns
+    `(package, action, detail)` for packages that apply here: `install` or
+    `installed` with the source (or `script`), `unknown` with the source
+    when its snapshot could not be read, or `missing` when no manager is
+    available. *refresh* is passed to `_managers`.
+    """
+    if not packages:
+        return []
+    managers = _managers(refresh)
+    available_sources, snapshots = managers.sources, managers.snapshots
+    planned: list[tuple[Package, str, str]] = []
+    for pkg in packages:
+        applicable_sources = _applicable_sources(pkg)
+        source = _selected_source(applicable_sources, available_sources)
+        if source is not None:
+            value = _package_source_value(pkg, source)
+            if source not in snapshots or value is None:
+                planned.append((pkg, "unknown", source))
+            else:
+                installed = _snapshot_name(source, value) in snapshots[source]
+                planned.append((pkg, "installed" if installed else "install", source))
+        elif applicable_sources:
+            planned.append((pkg, "missing", "no manager available"))
+        elif pkg.script and pkg.applies_to(PLATFORM):
+            installed = _installed_with_requested_manager(pkg, None, snapshots)
+            planned.append((pkg, "installed" if installed else "install", "script"))
+    return planned
+
+
+def manager_signals() -> dict[PackageSource, str | None]:
+    """Return the database signal of every package manager available here."""
+    available = _available_sources(_available_manager_bins())
+    return {source: _snapshot_signal(source) for source in sorted(available)}
+
+
+def _run_pending(
+    pending: list[_PendingInstall],
+    prefixed: bool = False,
+) -> list[tuple[str, str, str]]:
+    """Install pending packages on per-manager lanes. Returns failures in input order.
+
+    Lanes for independent managers run concurrently (up to `settings.jobs`);
+    packages within a lane run in order, batched per source where the manager
+    supports it. Script and unmanaged packages run afterwards, serially, since
+    installer scripts commonly rely on managers.
+    """
+    lanes: dict[str, list[_PendingInstall]] = {}
+    unmanaged: list[_PendingInstall] = []
+    for item in pending:
+        if item.source is None:
+            unmanaged.append(item)
+        else:
+            lanes.setdefault(_MANAGER_CONFIGS[item.source].lane, []).append(item)
+
+    tasks = [
+        (lane, items[offset :: _lane_jobs(items)])
+        for lane, items in lanes.items()
+        for offset in range(min(_lane_jobs(items), len(items)))
+    ]
+    results: dict[int, tuple[str, str, str] | None] = {}
+    if tasks:
+        workers = max(1, min(settings.jobs, len(tasks)))
+        prefixed = prefixed or workers > 1
+        if workers > 1:
+            logger.info("Installing on %d lane(s): %s", len(lanes), ", ".join(lanes))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mc-pkg") as pool:
+            futures = [pool.submit(_run_lane, lane, items, prefixed) for lane, items in tasks]
+            for future in futures:
+                results.update(future.result())
+
+    for item in unmanaged:
+        results[item.index] = _install_pending(item, prefixed)
+
+    return [fail for _, fail in sorted(results.items()) if fail]
+
+
+def _run_lane(
+    lane: str,
+    items: list[_PendingInstall],
+    prefixed: bool,
+) -> dict[int, tuple[str, str, str] | None]:
+    """Install *items* source by source while holding a slot on *lane*."""
+    results: dict[int, tuple[str, str, str] | None] = {}
+    with _lane_slot(lane, _lane_jobs(items)):
+        for source in _MANAGER_CONFIGS:
+            group = [item for item in items if item.source == source]
+            batch = [item for item in group if _batchable(source, item.pkg)]
+            if len(batch) > 1:
+                results.update(_install_batch(source, batch, prefixed))
+            for item in group:
+                if item.index not in results:
+                    results[item.index] = _install_pending(item, prefixed)
+    return results
+
+
+def _batchable(source: PackageSource, pkg: Package) -> bool:
+    """Return True when *pkg* can share a multi-package invocation.
+
+    Values carrying extra arguments (e.g. `code --classic`) must install alone.
+    """
+    value = _package_source_value(pkg, source)
+    return _MANAGER_CONFIGS[source].batch_cmd is not None and len(str(value).split()) == 1
+
+
+def _install_batch(
+    source: PackageSource,
+    items: list[_PendingInstall],
+    prefixed: bool,
+) -> dict[int, tuple[str, str, str] | None]:
+    """Install *items* in one manager invocation, retrying one by one on failure."""
+    values = [str(_package_source_value(item.pkg, source)) for item in items]
+    label = ", ".join(dict.fromkeys(item.module for item in items))
+    names = ", ".join(item.pkg.name for item in items)
+    logger.info("[%s] %s: %s", label, names, source)
+
+    with (
+        journal.step("package-install", label, names) as step,
+        tempfile.TemporaryDirectory(prefix="mc-") as tmp,
+    ):
+        cmd = _batch_command(source, values, Path(tmp))
+        rc, output = run_collect(cmd, label=label, prefixed=prefixed, keep=_keep_pattern(source))
+        if _install_succeeded(source, rc, output):
+            return {item.index: None for item in items}
+        step.status, step.detail = "failed", f"{source} exit {rc}"
+
+    logger.warning(
+        "[%s] batch install via %s failed (exit %d); retrying individually", label, source, rc
+    )
+    return {item.index: _install_pending(item, prefixed) for item in items}
+
+
+def _batch_command(source: PackageSource, values: list[str], tmp: Path) -> str:
+    """Format the batch install command for *values*."""
+    template = _MANAGER_CONFIGS[source].batch_cmd
+    assert template is not None
+    if source != "winget":
+        return template.format(" ".join(values))
+
+    manifest = tmp / "packages.json"
+    packages = [{"PackageIdentifier": value} for value in values]
+    manifest.write_text(
+        json.dumps({"Sources": [{"SourceDetails": _WINGET_SOURCE, "Packages": packages}]})
+    )
+    return template.format(manifest)
+
+
+def _install_pending(item: _PendingInstall, prefixed: bool = False) -> tuple[str, str, str] | None:
+    """Install a single pending package."""
+    with journal.step("package-install", item.module, item.pkg.name) as step:
+        failure = _install(
+            item.pkg,
+            item.source,
+            item.applicable_sources,
+            item.can_run_script,
+            item.module,
+            prefixed=prefixed,
+        )
+        if failure:
+            step.status, step.detail = "failed", failure[2]
+    return failure
+
+
+def _lane_jobs(items: list[_PendingInstall]) -> int:
+    """Return the concurrency limit for a lane: the strictest of its managers."""
+    return min(_MANAGER_CONFIGS[item.source].max_jobs for item in items if item.source)
+
+
+def _lane_slot(lane: str, max_jobs: int) -> threading.Semaphore:
+    """Return the process-wide semaphore guarding *lane*."""
+    with _lane_slots_lock:
+        slot = _lane_slots.get(lane)
+        if slot is None:
+            slot = _lane_slots[lane] = threading.Semaphore(max(1, max_jobs))
+        return slot
 
 
 def _install(
@@ -138,6 +473,7 @@ def _install(
     applicable_sources: list[PackageSource],
     can_run_script: bool,
     module: str = "?",
+    prefixed: bool = False,
 ) -> tuple[str, str, str] | None:
     """Try to install a package. Returns a Failure on error, else None."""
     if selected_source is not None:
@@ -147,7 +483,9 @@ def _install(
 
         cmd = _MANAGER_CONFIGS[selected_source].install_cmd.format(value)
         logger.info("[%s] %s: %s", module, pkg.name, selected_source)
-        rc, output = run_collect(cmd, label=module)
+        rc, output = run_collect(
+            cmd, label=module, prefixed=prefixed, keep=_keep_pattern(selected_source)
+        )
         if _install_succeeded(selected_source, rc, output):
             if selected_source == "winget" and rc != 0:
                 logger.info("[%s] %s already installed; no upgrade available", module, pkg.name)
@@ -170,7 +508,7 @@ def _install(
 
     if can_run_script and pkg.script:
         logger.info("[%s] %s: script", module, pkg.name)
-        rc = run(pkg.script, label=module)
+        rc = run(pkg.script, label=module, prefixed=prefixed)
         if rc != 0:
             logger.error(
                 "[%s] failed to install %s via script (exit %d): %s",
@@ -193,13 +531,12 @@ def _install_succeeded(manager: PackageSource, rc: int, output: bytes | bytearra
     if manager != "winget":
         return False
     text = output.decode(errors="replace").lower()
-    return "found an existing package already installed" in text and any(
-        msg in text
-        for msg in (
-            "no available upgrade found",
-            "no newer package versions are available from the configured sources",
-        )
-    )
+    return _WINGET_INSTALLED in text and any(msg in text for msg in _WINGET_NO_UPGRADE)
+
+
+def _keep_pattern(manager: PackageSource) -> re.Pattern[str] | None:
+    """Return output lines `_install_succeeded` needs, so they survive truncation."""
+    return _WINGET_NOOP_RE if manager == "winget" else None
 
 
 def _installed_with_requested_manager(
@@ -214,7 +551,7 @@ def _installed_with_requested_manager(
         if value is None:
             return False
         if selected_source in installed_sources:
-            return str(value) in installed_sources[selected_source]
+            return _snapshot_name(selected_source, value) in installed_sources[selected_source]
         return _source_installed(selected_source, value)
 
     if rerun_script_packages or not pkg.script or not pkg.name:
@@ -235,7 +572,9 @@ def _applicable_sources(pkg: Package) -> list[PackageSource]:
 
 
 def _available_manager_bins() -> set[str]:
-    """Return installed package-manager executables."""
+    """Return installed package-manager executables (all of them with `stub_managers`)."""
+    if settings.stub_managers:
+        return {config.binary for config in _MANAGER_CONFIGS.values()}
     return {config.binary for config in _MANAGER_CONFIGS.values() if shutil.which(config.binary)}
 
 
@@ -291,17 +630,192 @@ def _source_installed(source: PackageSource, value: str | int) -> bool:
 def _installed_source_snapshots(
     available_sources: set[PackageSource],
 ) -> dict[PackageSource, set[str]]:
-    """Return bulk-installed package snapshots for managers with cheap list commands."""
+    """Return bulk-installed package snapshots, one list command per manager.
+
+    Snapshots are cached on disk and reused while the manager's database
+    (see `_snapshot_signal`) is unchanged. Stale managers are queried
+    concurrently. A manager whose snapshot cannot be read is omitted, so its
+    packages fall back to per-package checks.
+    """
+    sources: list[PackageSource] = [s for s in _SNAPSHOT_READERS if s in available_sources]
+    if not sources:
+        return {}
+
+    with _snapshot_cache_lock:
+        cache = _load_snapshot_cache()
+    signals = {source: _snapshot_signal(source) for source in sources}
     snapshots: dict[PackageSource, set[str]] = {}
-    if "brew" in available_sources:
-        snapshots["brew"] = _command_output_lines(["brew", "list", "--formula"])
-    if "cask" in available_sources:
-        snapshots["cask"] = _command_output_lines(["brew", "list", "--cask"])
-    if "mas" in available_sources:
-        snapshots["mas"] = _mas_installed_ids()
+    for source in sources:
+        entry = cache.get(source)
+        if signals[source] and entry and entry.get("signal") == signals[source]:
+            snapshots[source] = set(entry.get("installed", []))
+            logger.debug("Snapshot (cached): %s", source)
+
+    stale: list[PackageSource] = [s for s in sources if s not in snapshots]
+    if not stale:
+        return snapshots
+    with ThreadPoolExecutor(max_workers=len(stale), thread_name_prefix="mc-snap") as pool:
+        results = list(pool.map(lambda source: _SNAPSHOT_READERS[source](), stale))
+
+    with _snapshot_cache_lock:
+        cache = _load_snapshot_cache()
+        for source, names in zip(stale, results, strict=True):
+            if names is None:
+                continue
+            snapshots[source] = names
+            if signals[source]:
+                cache[source] = {"signal": signals[source], "installed": sorted(names)}
+        _save_snapshot_cache(cache)
     return snapshots
 
 
+def _snapshot_signal(source: PackageSource) -> str | None:
+    """Return a cheap fingerprint of *source*'s package database, if it has one.
+
+    The mtime of the directory or file a manager rewrites when packages are
+    added or removed. `None` means snapshots for *source* are never cached.
+    """
+    path = _snapshot_signal_path(source)
+    if path is None:
+        return None
+    try:
+        return f"{path}:{path.stat().st_mtime_ns}"
+    except OSError:
+        return None
+
+
+def _snapshot_signal_path(source: PackageSource) -> Path | None:
+    match source:
+        case "brew" | "cask":
+            prefix = os.environ.get("HOMEBREW_PREFIX")
+            if not prefix:
+                brew = shutil.which("brew")
+                if brew is None:
+                    return None
+                prefix = str(Path(brew).parent.parent)
+            return Path(prefix) / ("Cellar" if source == "brew" else "Caskroom")
+        case "apt":
+            return Path("/var/lib/dpkg/status")
+        case "snap":
+            return Path("/var/lib/snapd/state.json")
+        case "scoop":
+            return Path(os.environ.get("SCOOP") or Path.home() / "scoop") / "apps"
+        case "mas":
+            return Path("/Applications")
+        case "winget":
+            return None
+
+    raise AssertionError(f"Unhandled package source: {source}")
+
+
+def _load_snapshot_cache() -> dict:
+    if _SNAPSHOT_CACHE.exists():
+        try:
+            data = json.loads(_SNAPSHOT_CACHE.read_text())
+            if data.get("version") == _SNAPSHOT_CACHE_VERSION:
+                return data.get("sources", {})
+        except ValueError, AttributeError:
+            logger.debug("Corrupted package snapshot cache, ignoring")
+    return {}
+
+
+def _save_snapshot_cache(cache: dict) -> None:
+    if settings.dry_run:
+        return
+    data = json.dumps({"version": _SNAPSHOT_CACHE_VERSION, "sources": cache}, indent=2)
+    try:
+        _SNAPSHOT_CACHE.parent.mkdir(parents=True, exist_ok=True)
+        tmp = _SNAPSHOT_CACHE.with_suffix(".tmp")
+        tmp.write_text(data)
+        tmp.replace(_SNAPSHOT_CACHE)
+    except OSError as exc:
+        logger.debug("Could not write package snapshot cache: %s", exc)
+
+
+def _snapshot_name(source: PackageSource, value: str | int) -> str:
+    """Return the name *value* is listed under in a snapshot (arguments stripped)."""
+    name = str(value).split()[0]
+    return name.lower() if source == "winget" else name
+
+
+def _brew_installed_formulae() -> set[str] | None:
+    return _command_output_lines(["brew", "list", "--formula"])
+
+
+def _brew_installed_casks() -> set[str] | None:
+    return _command_output_lines(["brew", "list", "--cask"])
+
+
+def _apt_installed_packages() -> set[str] | None:
+    """Return installed dpkg package names from a single `dpkg-query -W`."""
+    out = _command_stdout(["dpkg-query", "-W", "-f=${Package}\t${Status}\n"])
+    if out is None:
+        return None
+    return {
+        name
+        for line in out.splitlines()
+        if (name := line.partition("\t")[0]) and line.endswith("install ok installed")
+    }
+
+
+def _snap_installed_packages() -> set[str] | None:
+    """Return installed snap names from `snap list`."""
+    out = _command_stdout(["snap", "list"])
+    if out is None:
+        return None
+    return {parts[0] for line in out.splitlines()[1:] if (parts := line.split())}
+
+
+def _scoop_installed_apps() -> set[str] | None:
+    """Return installed scoop app names from `scoop export`."""
+    out = _command_stdout(["scoop", "export"])
+    if out is None:
+        return None
+    try:
+        apps = json.loads(out).get("apps", [])
+        return {app["Name"] for app in apps}
+    except ValueError, AttributeError, KeyError, TypeError:
+        logger.debug("Unrecognized scoop export output; falling back to per-package checks")
+        return None
+
+
+def _winget_installed_ids() -> set[str] | None:
+    """Return installed winget package ids (lowercase) from `winget export`."""
+    with tempfile.TemporaryDirectory(prefix="mc-") as tmp:
+        export = Path(tmp) / "winget.json"
+        cmd = ["winget", "export", "-o", str(export), "--accept-source-agreements"]
+        if _command_stdout(cmd) is None or not export.exists():
+            return None
+        try:
+            sources = json.loads(export.read_text(encoding="utf-8-sig")).get("Sources", [])
+            return {
+                pkg["PackageIdentifier"].lower()
+                for source in sources
+                for pkg in source.get("Packages", [])
+            }
+        except ValueError, AttributeError, KeyError, TypeError:
+            logger.debug("Unrecognized winget export; falling back to per-package checks")
+            return None
+
+
+def _command_stdout(cmd: list[str], timeout: int = 60) -> str | None:
+    """Return stdout of *cmd*, or None when it cannot run or exits non-zero."""
+    try:
+        proc = subprocess.run(
+            cmd,
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+            check=False,
+        )
+    except OSError, subprocess.SubprocessError:
+        logger.debug("Snapshot command failed: %s", " ".join(cmd), exc_info=True)
+        return None
+    if proc.returncode != 0:
+        return None
+    return proc.stdout
+
+
 def _command_succeeds(cmd: list[str]) -> bool:
     """Return True when *cmd* exits successfully."""
     proc = subprocess.run(
@@ -314,18 +828,12 @@ def _command_succeeds(cmd: list[str]) -> bool:
     return proc.returncode == 0
 
 
-def _command_output_lines(cmd: list[str]) -> set[str]:
-    """Return non-empty output lines from *cmd*, or an empty set on failure."""
-    proc = subprocess.run(
-        cmd,
-        capture_output=True,
-        text=True,
-        timeout=30,
-        check=False,
-    )
-    if proc.returncode != 0:
-        return set()
-    return {line.strip() for line in proc.stdout.splitlines() if line.strip()}
+def _command_output_lines(cmd: list[str]) -> set[str] | None:
+    """Return non-empty output lines from *cmd*, or None on failure."""
+    out = _command_stdout(cmd, timeout=30)
+    if out is None:
+        return None
+    return {line.strip() for line in out.splitlines() if line.strip()}
 
 
 def _winget_installed(package_id: str) -> bool:
@@ -342,18 +850,23 @@ def _winget_installed(package_id: str) -> bool:
 
 def _mas_installed(app_id: int) -> bool:
     """Return True when the Mac App Store app id is already installed."""
-    return str(app_id) in _mas_installed_ids()
+    return str(app_id) in (_mas_installed_ids() or set())
 
 
-def _mas_installed_ids() -> set[str]:
-    """Return installed Mac App Store app ids from `mas list`."""
-    proc = subprocess.run(
-        ["mas", "list"],
-        capture_output=True,
-        text=True,
-        timeout=30,
-        check=False,
-    )
-    if proc.returncode != 0:
-        return set()
-    return {parts[0] for line in proc.stdout.splitlines() if (parts := line.split())}
+def _mas_installed_ids() -> set[str] | None:
+    """Return installed Mac App Store app ids from `mas list`, or None on failure."""
+    out = _command_stdout(["mas", "list"], timeout=30)
+    if out is None:
+        return None
+    return {parts[0] for line in out.splitlines() if (parts := line.split())}
+
+
+_SNAPSHOT_READERS: dict[PackageSource, Callable[[], set[str] | None]] = {
+    "brew": _brew_installed_formulae,
+    "cask": _brew_installed_casks,
+    "apt": _apt_installed_packages,
+    "snap": _snap_installed_packages,
+    "winget": _winget_installed_ids,
+    "scoop": _scoop_installed_apps,
+    "mas": _mas_installed_ids,
+}
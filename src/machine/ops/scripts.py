@@ -1,50 +1,79 @@
-"""Script env building, filtering, execution, and script-run tracking."""
+"""Script env building, metadata, filtering, execution, and script-run tracking."""
 
+import functools
+import graphlib
 import hashlib
-import json
+import heapq
 import logging
 import os
+import re
+import subprocess
 import sys
+from dataclasses import dataclass
 from datetime import UTC, datetime
 from pathlib import Path
 
+from machine import journal
 from machine.core import PLATFORM, Platform, err_console, is_unix, run, settings
 from machine.manifest import SCRIPT_SUFFIXES
+from machine.persistence import load_script_runs, record_script_run
+from machine.profiling import traced
 
 logger = logging.getLogger(__name__)
 
 _ENV_FILE = Path.home() / ".env"
-_STATE_FILE = settings.app_dir / "state.json"
+
+# `$VAR`, `${VAR}`, `${VAR:-default}` (unset or empty), `${VAR-default}` (unset)
+_ENV_REF_RE = re.compile(r"\$(?:([A-Za-z_]\w*)|\{([A-Za-z_]\w*)(?:(:?-)([^}]*))?\})")
+
+SCRIPT_PHASES = ("init", "post", "update")
+
+# `# mc-<key>: <value>` lines in a script's leading comment block
+_META_RE = re.compile(r"#\s*mc-([a-z]+):\s*(.*?)\s*$", re.IGNORECASE)
+_META_KEYS = {"phase", "after", "before", "timeout", "parallel", "inputs"}
+
+# (machine, root) -> (env file signatures, process vars consulted, resolved env)
+_env_cache: dict[
+    tuple[str, Path],
+    tuple[dict[Path, list[int] | None], dict[str, str | None], dict[str, str]],
+] = {}
 
 
 def build_script_env(machine_id: str, root: Path) -> dict[str, str]:
-    """Build the env dict injected into every script subprocess."""
+    """Build the env dict injected into every script subprocess.
+
+    Results are cached per machine until an env file or a process
+    variable they reference changes.
+    """
+    cached = _env_cache.get((machine_id, root))
+    if cached is not None:
+        files, external, env = cached
+        if all(_stat_signature(p) == sig for p, sig in files.items()) and all(
+            os.environ.get(name) == value for name, value in external.items()
+        ):
+            return dict(env)
+
     raw: dict[str, str] = {
         "MC_HOME": str(root),
         "MC_ID": machine_id,
         "MC_PRIVATE": str(settings.app_dir / "private"),
     }
-
-    def _parse_env(path: Path) -> None:
-        if not path.is_file():
-            return
-        for line in path.read_text().splitlines():
-            line = line.strip()
-            if not line or line.startswith("#"):
-                continue
-            key, _, value = line.partition("=")
-            if key and _:
-                raw[key.strip()] = value.strip().strip('"').strip("'")
-
-    _parse_env(root / "machines" / machine_id / "machine.env")
-    env = _resolve_env(raw)
+    external: dict[str, str | None] = {}
+    machine_env = root / "machines" / machine_id / "machine.env"
+    files = {machine_env: _stat_signature(machine_env)}
+    raw |= _parse_env_file(machine_env)
+    env = _resolve_env(raw, external)
 
     mc_private = env.get("MC_PRIVATE", "")
     if mc_private:
-        _parse_env(Path(mc_private) / "env" / f"{machine_id}.env")
-        env = _resolve_env(raw)
+        private_env = Path(mc_private) / "env" / f"{machine_id}.env"
+        files[private_env] = _stat_signature(private_env)
+        overrides = _parse_env_file(private_env)
+        if overrides:
+            env = _resolve_env(raw | overrides, external)
 
-    return env
+    _env_cache[(machine_id, root)] = (files, external, env)
+    return dict(env)
 
 
 def write_env_file(machine_id: str, root: Path) -> None:
@@ -90,67 +119,341 @@ def filter_scripts(scripts: list[str]) -> list[str]:
     ]
 
 
+@dataclass(frozen=True, slots=True)
+class ScriptMeta:
+    """Scheduling metadata a script declares in its header.
+
+    `after`/`before` name other scripts by file name or by the part before
+    the first dot (`docker` for `docker.unix.sh`). `parallel` is None when
+    undeclared, deferring to `settings.parallel_scripts`. `inputs` are files
+    or directories, relative to the script's directory, that a `watch_`
+    script also reruns for.
+    """
+
+    phase: str
+    after: tuple[str, ...] = ()
+    before: tuple[str, ...] = ()
+    timeout: float | None = None
+    parallel: bool | None = None
+    inputs: tuple[str, ...] = ()
+
+
+def script_meta(script: str | Path) -> ScriptMeta:
+    """Return a script's declared metadata, defaulting the phase from its prefix.
+
+    Raises ValueError on unknown keys or invalid values.
+    """
+    path = Path(script)
+    signature = _stat_signature(path)
+    return _read_meta(path, tuple(signature) if signature else None)
+
+
+@functools.cache
+def _read_meta(path: Path, signature: tuple[int, ...] | None) -> ScriptMeta:
+    fields: dict[str, str] = {}
+    if signature is not None:
+        with path.open(encoding="utf-8", errors="replace") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#!"):
+                    continue
+                if not line.startswith("#"):
+                    break
+                if match := _META_RE.match(line):
+                    fields[match[1].lower()] = match[2]
+
+    if unknown := fields.keys() - _META_KEYS:
+        raise ValueError(f"{path}: unknown script metadata: {', '.join(sorted(unknown))}")
+    name = path.name
+    default = "init" if name.startswith("init_") else "update" if name.startswith("up_") else "post"
+    phase = fields.get("phase", default).lower()
+    if phase not in SCRIPT_PHASES:
+        raise ValueError(f"{path}: phase must be one of {', '.join(SCRIPT_PHASES)}, not {phase!r}")
+    timeout = None
+    if "timeout" in fields:
+        try:
+            timeout = float(fields["timeout"].removesuffix("s"))
+        except ValueError:
+            raise ValueError(f"{path}: invalid timeout {fields['timeout']!r}") from None
+    parallel = None
+    if "parallel" in fields:
+        value = fields["parallel"].lower()
+        if value not in {"true", "false", "yes", "no"}:
+            raise ValueError(f"{path}: parallel must be true or false, not {value!r}")
+        parallel = value in {"true", "yes"}
+    return ScriptMeta(
+        phase=phase,
+        after=_meta_names(fields.get("after", "")),
+        before=_meta_names(fields.get("before", "")),
+        timeout=timeout,
+        parallel=parallel,
+        inputs=_meta_names(fields.get("inputs", "")),
+    )
+
+
+def _meta_names(value: str) -> tuple[str, ...]:
+    return tuple(name for name in re.split(r"[,\s]+", value) if name)
+
+
+def refers_to(name: str, script: str | Path) -> bool:
+    """Return True if an `after`/`before` *name* designates *script*."""
+    file_name = Path(script).name
+    return name in {file_name, file_name.partition(".")[0]}
+
+
+def script_inputs(script: str | Path) -> dict[str, list[int]]:
+    """Return `[size, mtime_ns]` of every file under a script's declared inputs."""
+    path = Path(script)
+    files: list[Path] = []
+    for name in script_meta(path).inputs:
+        target = path.parent / Path(name).expanduser()
+        files += (
+            sorted(p for p in target.rglob("*") if p.is_file()) if target.is_dir() else [target]
+        )
+    return {str(f): sig for f in files if (sig := _stat_signature(f)) is not None}
+
+
+def order_scripts(scripts: list[str]) -> list[str]:
+    """Order *scripts* so the `after`/`before` edges declared among them hold.
+
+    Scripts otherwise keep their listed order; edges to scripts not in the
+    list are ignored. Raises ValueError when the edges form a cycle.
+    """
+    metas = [script_meta(s) for s in scripts]
+    graph: dict[int, set[int]] = {i: set() for i in range(len(scripts))}
+    for i, meta in enumerate(metas):
+        for j, other in enumerate(scripts):
+            if i == j:
+                continue
+            if any(refers_to(name, other) for name in meta.after):
+                graph[i].add(j)
+            if any(refers_to(name, other) for name in meta.before):
+                graph[j].add(i)
+
+    sorter = graphlib.TopologicalSorter(graph)
+    try:
+        sorter.prepare()
+    except graphlib.CycleError as exc:
+        cycle = " -> ".join(scripts[i] for i in exc.args[1])
+        raise ValueError(f"Cyclic script dependencies: {cycle}") from None
+    ready = list(sorter.get_ready())
+    heapq.heapify(ready)
+    order: list[str] = []
+    while ready:
+        i = heapq.heappop(ready)  # lowest listed index first keeps the order stable
+        order.append(scripts[i])
+        sorter.done(i)
+        for j in sorter.get_ready():
+            heapq.heappush(ready, j)
+    return order
+
+
+@traced("run_scripts")
 def run_scripts(
     scripts: list[str],
     env: dict[str, str] | None = None,
     owners: dict[str, str] | None = None,
+    buffered: bool = False,
 ) -> list[tuple[str, str, str]]:
-    """Run pre-filtered scripts, respecting `once_`/`watch_` tracking."""
+    """Run pre-filtered scripts in order, respecting `once_`/`watch_` tracking.
+
+    With *buffered*, each script's output is written as one block once it
+    exits, so calls running concurrently stay readable. Scripts declaring a
+    timeout are killed once it elapses.
+    """
     if not scripts:
         return []
 
-    state = _load_state()
+    state = load_script_runs()
     logger.info("Scripts: %d to run", len(scripts))
     failures: list[tuple[str, str, str]] = []
 
     for script in (Path(s) for s in scripts):
         tracked = script.name.startswith(("once_", "watch_"))
         module = (owners or {}).get(str(script), "?")
-
-        if tracked and script.name in state:
-            if script.name.startswith("once_"):
-                logger.debug("Skip (already ran): %s", script.name)
-                continue
-            current_hash = hashlib.sha256(script.read_bytes()).hexdigest()[:16]
-            if state[script.name].get("hash") == current_hash:
-                logger.debug("Skip (unchanged): %s", script.name)
-                continue
-
-        fail = _execute(script, env, module)
-        if fail:
-            failures.append(fail)
+        previous = state.get(script.name) if tracked else None
+
+        reason, record = _run_reason(script, previous) if tracked else ("untracked", {})
+        if reason is None:
+            assert previous is not None
+            if any(previous.get(key) != value for key, value in record.items()):
+                record_script_run(script.name, previous | record)  # only touched: new stats
+            skip = "already ran" if script.name.startswith("once_") else "unchanged"
+            logger.debug("Skip (%s): %s", skip, script.name)
+            continue
+
+        with journal.step("script", module, script.name) as step:
+            fail = _execute(script, env, module, buffered, script_meta(script).timeout)
+            if fail:
+                failures.append(fail)
+                step.status, step.detail = "failed", fail[2]
 
         if tracked:
-            state[script.name] = {
-                "hash": hashlib.sha256(script.read_bytes()).hexdigest()[:16],
-                "ran": datetime.now(UTC).isoformat(),
-            }
+            record_script_run(script.name, record | {"ran": datetime.now(UTC).isoformat()})
 
-    _save_state(state)
     return failures
 
 
-def _resolve_env(raw: dict[str, str]) -> dict[str, str]:
-    """Expand `$VAR` references in env values until stable."""
-    env = {key: os.path.expandvars(value) for key, value in raw.items()}
-    for _ in range(len(env)):
-        changed = False
-        for key, value in env.items():
-            new = value
-            for env_key, env_value in env.items():
-                new = new.replace(f"${env_key}", env_value)
-            if new != value:
-                env[key] = new
-                changed = True
-        if not changed:
-            break
-    return env
+def plan_script_runs(scripts: list[str]) -> list[tuple[str, str]]:
+    """Return the scripts `run_scripts` would run, each with the reason, running none.
+
+    Reasons are `untracked` (runs every time its phase applies), `never ran`,
+    `content changed`, or `inputs changed`.
+    """
+    state = load_script_runs()
+    planned: list[tuple[str, str]] = []
+    for script in (Path(s) for s in scripts):
+        if script.name.startswith(("once_", "watch_")):
+            reason, _ = _run_reason(script, state.get(script.name))
+        else:
+            reason = "untracked"
+        if reason is not None:
+            planned.append((str(script), reason))
+    return planned
+
+
+def _run_reason(script: Path, previous: dict | None) -> tuple[str | None, dict]:
+    """Return why a tracked script must run (None to skip it) and its current record."""
+    if previous is not None and script.name.startswith("once_"):
+        return None, previous
+    record = _watch_record(script, previous)
+    if previous is None:
+        return "never ran", record
+    if record.get("hash") != previous.get("hash"):
+        return "content changed", record
+    if record.get("inputs_hash") != previous.get("inputs_hash"):
+        return "inputs changed", record
+    return None, record
+
+
+def _watch_record(script: Path, previous: dict | None) -> dict:
+    """Describe a tracked script and its inputs for the state store.
+
+    Files whose size and mtime match *previous* reuse its digests, so an
+    unchanged script costs a `stat()` per file instead of a read and hash.
+    """
+    previous = previous or {}
+    stat = _stat_signature(script)
+    if stat is not None and stat == previous.get("stat") and "hash" in previous:
+        digest = previous["hash"]
+    else:
+        digest = _file_hash(script)
+    record: dict = {"hash": digest, "stat": stat}
+
+    inputs = script_inputs(script)
+    if inputs:
+        if inputs == previous.get("inputs"):
+            inputs_hash = previous.get("inputs_hash")
+        else:
+            inputs_hash = _digest_files(inputs)
+        record |= {"inputs": inputs, "inputs_hash": inputs_hash}
+    return record
+
+
+def _file_hash(path: Path) -> str | None:
+    try:
+        return hashlib.sha256(path.read_bytes()).hexdigest()[:16]
+    except OSError:
+        return None
+
+
+def _digest_files(files: dict[str, list[int]]) -> str:
+    digest = hashlib.sha256()
+    for name in sorted(files):
+        digest.update(f"{name}\0{_file_hash(Path(name))}\0".encode())
+    return digest.hexdigest()[:16]
+
+
+def _parse_env_file(path: Path) -> dict[str, str]:
+    """Parse `KEY=value` lines, skipping blanks and comments and unquoting values."""
+    if not path.is_file():
+        return {}
+    raw: dict[str, str] = {}
+    for line in path.read_text().splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        key, _, value = line.partition("=")
+        if key and _:
+            raw[key.strip()] = value.strip().strip('"').strip("'")
+    return raw
+
+
+def _stat_signature(path: Path) -> list[int] | None:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _resolve_env(
+    raw: dict[str, str],
+    external: dict[str, str | None] | None = None,
+) -> dict[str, str]:
+    """Expand variable references in env values, each key exactly once.
+
+    References resolve to other keys of *raw* (expanded in dependency order),
+    then to the process environment. A key referencing itself reads the
+    process value, as in `PATH=$PATH:...`. Unknown references are kept
+    verbatim. Process variables consulted are recorded in *external*.
+    Raises ValueError when keys reference each other in a cycle.
+    """
+    graph = {
+        key: {name for name in _env_refs(value) if name in raw and name != key}
+        for key, value in raw.items()
+    }
+    try:
+        order = list(graphlib.TopologicalSorter(graph).static_order())
+    except graphlib.CycleError as exc:
+        raise ValueError(f"Cyclic env references: {' -> '.join(exc.args[1])}") from None
+
+    env: dict[str, str] = {}
+    for key in order:
+        env[key] = _expand_env_value(raw[key], key, env, external)
+    return {key: env[key] for key in raw}
+
+
+def _env_refs(value: str) -> set[str]:
+    """Return variable names referenced by *value*, including inside defaults."""
+    names: set[str] = set()
+    for match in _ENV_REF_RE.finditer(value):
+        names.add(match[1] or match[2])
+        if match[4]:
+            names |= _env_refs(match[4])
+    return names
+
+
+def _expand_env_value(
+    value: str,
+    key: str,
+    env: dict[str, str],
+    external: dict[str, str | None] | None,
+) -> str:
+    def _substitute(match: re.Match[str]) -> str:
+        name = match[1] or match[2]
+        if name in env and name != key:
+            resolved = env[name]
+        else:
+            resolved = os.environ.get(name)
+            if external is not None:
+                external[name] = resolved
+        operator = match[3]
+        if operator is None:
+            return match[0] if resolved is None else resolved
+        if resolved is None or (operator == ":-" and not resolved):
+            return _expand_env_value(match[4], key, env, external)
+        return resolved
+
+    return _ENV_REF_RE.sub(_substitute, value)
 
 
 def _execute(
     script: Path,
     env: dict[str, str] | None = None,
     module: str = "?",
+    buffered: bool = False,
+    timeout: float | None = None,
 ) -> tuple[str, str, str] | None:
     """Run a script, teeing output to terminal and log. Returns Failure on error."""
     if is_unix and not os.access(script, os.X_OK):
@@ -175,29 +478,18 @@ def _execute(
         case _:
             cmd = str(script)
 
-    rc = run(cmd, env=env, label=module)
-    if rc == 0:
-        return None
+    try:
+        rc = run(cmd, env=env, label=module, buffered=buffered, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        detail = f"timed out after {timeout:g}s"
+    else:
+        if rc == 0:
+            return None
+        detail = f"exit {rc}"
 
     try:
         rel = script.relative_to(settings.home)
     except ValueError:
         rel = script
-    logger.error("[%s] script failed (exit %d): %s", module, rc, rel)
-    return (module, str(rel), f"exit {rc}")
-
-
-def _load_state() -> dict:
-    if _STATE_FILE.exists():
-        try:
-            return json.loads(_STATE_FILE.read_text())
-        except json.JSONDecodeError, KeyError:
-            logger.warning("Corrupted state, resetting")
-    return {}
-
-
-def _save_state(state: dict) -> None:
-    if settings.dry_run:
-        return
-    _STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
-    _STATE_FILE.write_text(json.dumps(state, indent=2))
+    logger.error("[%s] script failed (%s): %s", module, detail, rel)
+    return (module, str(rel), detail)
@@ -1,9 +1,28 @@
-"""Current-machine persistence helpers."""
+"""Current-machine and script-run persistence helpers."""
+
+import json
+import logging
+import sqlite3
+import sys
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import BinaryIO
 
 from machine.core import settings
 
+logger = logging.getLogger(__name__)
+
 _MACHINE_FILE = settings.app_dir / "machine.txt"
 
+_STATE_DB = settings.app_dir / "state.db"
+_LEGACY_STATE_FILE = settings.app_dir / "state.json"  # imported once, then left in place
+_SCHEMA_VERSION = 1
+_BUSY_TIMEOUT = 30.0  # seconds to wait for another process's write to commit
+_LOCK_FILE = settings.app_dir / "state.lock"
+
+# # MARK: Machine
+
 
 def get_current_machine() -> str | None:
     """Return the last-used machine ID, or None if not set."""
@@ -14,3 +33,163 @@ def save_current_machine(machine_id: str) -> None:
     """Persist the current machine ID."""
     _MACHINE_FILE.parent.mkdir(parents=True, exist_ok=True)
     _MACHINE_FILE.write_text(machine_id)
+
+
+# # MARK: Script Runs
+
+
+@contextmanager
+def state_lock() -> Iterator[None]:
+    """Hold the lock serializing applies and updates across processes.
+
+    Script runs are read, executed, and recorded under it, so two concurrent
+    runs cannot both run a `once_` script. Waits for the current holder;
+    the OS releases the lock when a holder dies. A no-op in dry-run mode.
+    """
+    if settings.dry_run:
+        yield
+        return
+    _LOCK_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with open(_LOCK_FILE, "a+b") as lock:
+        if not _lock(lock, blocking=False):
+            logger.warning("Waiting for another mc apply or update to finish")
+            _lock(lock, blocking=True)
+        try:
+            yield
+        finally:
+            _unlock(lock)
+
+
+def _lock(lock: BinaryIO, blocking: bool) -> bool:
+    """Take an exclusive lock on *lock*, returning False if it is held and not *blocking*."""
+    if sys.platform == "win32":
+        import msvcrt
+
+        lock.seek(0)
+        while True:
+            try:
+                msvcrt.locking(lock.fileno(), msvcrt.LK_NBLCK, 1)
+                return True
+            except OSError:
+                if not blocking:
+                    return False
+                time.sleep(0.1)
+    else:
+        import fcntl
+
+        try:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            return False
+        return True
+
+
+def _unlock(lock: BinaryIO) -> None:
+    if sys.platform == "win32":
+        import msvcrt
+
+        lock.seek(0)
+        msvcrt.locking(lock.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        import fcntl
+
+        fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+
+def load_script_runs() -> dict[str, dict]:
+    """Return the recorded run of every tracked script, keyed by file name."""
+    if not _STATE_DB.exists():
+        return _legacy_runs()
+    with _connect() as db:
+        rows = db.execute("SELECT name, data FROM script_runs").fetchall()
+    return {name: json.loads(data) for name, data in rows}
+
+
+def record_script_run(name: str, record: dict) -> None:
+    """Store one script's run atomically, replacing its previous record.
+
+    Each call commits on its own, so runs recorded before an interruption
+    are kept. Concurrent threads and processes only ever replace whole rows.
+    """
+    if settings.dry_run:
+        return
+    with _connect() as db:
+        db.execute(
+            "INSERT INTO script_runs (name, data) VALUES (?, ?)"
+            " ON CONFLICT (name) DO UPDATE SET data = excluded.data",
+            (name, json.dumps(record)),
+        )
+
+
+@contextmanager
+def _connect() -> Iterator[sqlite3.Connection]:
+    """Open the state database in autocommit mode, creating or migrating it first.
+
+    SQLite's file locks serialize writers across processes; a writer waits up
+    to `_BUSY_TIMEOUT` for another one. A database that is not readable as
+    SQLite is moved aside and recreated.
+    """
+    _STATE_DB.parent.mkdir(parents=True, exist_ok=True)
+    db = _open()
+    try:
+        try:
+            _migrate(db)
+        except sqlite3.OperationalError:
+            raise  # locked or busy, not corrupt
+        except sqlite3.DatabaseError:
+            db.close()
+            logger.warning("Corrupted state database, resetting")
+            _STATE_DB.replace(_STATE_DB.with_suffix(".db.corrupt"))
+            db = _open()
+            _migrate(db)
+        yield db
+    finally:
+        db.close()
+
+
+def _open() -> sqlite3.Connection:
+    return sqlite3.connect(_STATE_DB, timeout=_BUSY_TIMEOUT, isolation_level=None)
+
+
+def _migrate(db: sqlite3.Connection) -> None:
+    """Bring the schema to `_SCHEMA_VERSION`, importing `state.json` on creation.
+
+    Raises RuntimeError for a database written by a newer `mc`.
+    """
+    version = db.execute("PRAGMA user_version").fetchone()[0]
+    if version == _SCHEMA_VERSION:
+        return
+    if version > _SCHEMA_VERSION:
+        raise RuntimeError(
+            f"{_STATE_DB} uses schema version {version}, newer than this mc supports"
+            f" ({_SCHEMA_VERSION}); upgrade mc"
+        )
+
+    db.execute("BEGIN IMMEDIATE")  # another process may be migrating too
+    try:
+        version = db.execute("PRAGMA user_version").fetchone()[0]
+        if version == 0:
+            db.execute("CREATE TABLE script_runs (name TEXT PRIMARY KEY, data TEXT NOT NULL)")
+            db.executemany(
+                "INSERT INTO script_runs (name, data) VALUES (?, ?)",
+                [(name, json.dumps(record)) for name, record in _legacy_runs().items()],
+            )
+        db.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+        db.execute("COMMIT")
+    except BaseException:
+        db.execute("ROLLBACK")
+        raise
+    db.execute("PRAGMA journal_mode = WAL")  # readers no longer wait on writers
+
+
+def _legacy_runs() -> dict[str, dict]:
+    """Return the runs recorded in `state.json` by earlier versions of mc."""
+    if _LEGACY_STATE_FILE.exists():
+        try:
+            state = json.loads(_LEGACY_STATE_FILE.read_text())
+            if isinstance(state, dict):
+                return {name: r for name, r in state.items() if isinstance(r, dict)}
+        except ValueError:
+            pass
+        logger.warning("Corrupted legacy state, ignoring %s", _LEGACY_STATE_FILE)
+    return {}
@@ -0,0 +1,568 @@
+"""Apply units, their dependency-ordered execution, incremental-apply fingerprints, and plans."""
+
+import graphlib
+import hashlib
+import itertools
+import json
+import logging
+import os
+import threading
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass, field, fields
+from datetime import UTC, datetime
+from pathlib import Path
+
+from machine.core import PLATFORM, settings
+from machine.manifest import FileMapping, MachineManifest, Module, Package
+from machine.ops.files import deploy_files, plan_links, target_path
+from machine.ops.packages import (
+    install_packages,
+    manager_signals,
+    plan_installs,
+    shared_managers,
+)
+from machine.ops.scripts import (
+    filter_scripts,
+    order_scripts,
+    plan_script_runs,
+    refers_to,
+    run_scripts,
+    script_inputs,
+    script_meta,
+)
+
+logger = logging.getLogger(__name__)
+
+_FINGERPRINT_FILE = settings.app_dir / "applied.json"
+_PLAN_VERSION = 1
+
+# Scripts may prompt, so units run them one at a time; post-install scripts that are
+# parallel-safe (declared, or via `settings.parallel_scripts`) may overlap across units
+_script_lock = threading.Lock()
+
+# # MARK: Units
+
+
+@dataclass(frozen=True, slots=True)
+class Unit:
+    """Files, packages, and apply scripts owned by one module or the machine."""
+
+    name: str
+    files: list[FileMapping] = field(default_factory=list)
+    packages: list[Package] = field(default_factory=list)
+    scripts: list[str] = field(default_factory=list)
+    depends: list[str] = field(default_factory=list)
+    bootstrap: bool = False
+
+
+def build_units(
+    modules: list[Module],
+    manifest: MachineManifest | None,
+    machine_id: str,
+) -> list[Unit]:
+    """Group apply inputs by owner. Machine-level items form a trailing unit.
+
+    The machine unit is named `machine:<id>`, since machine IDs may match
+    module names (e.g. `homelab`).
+    """
+    units = [
+        Unit(
+            name=m.name,
+            files=list(m.files),
+            packages=list(m.packages),
+            scripts=_apply_scripts(m.scripts),
+            depends=list(m.depends),
+            bootstrap=m.bootstrap,
+        )
+        for m in modules
+    ]
+    if manifest is not None:
+        units.append(
+            Unit(
+                name=machine_unit_name(machine_id),
+                files=list(manifest.files),
+                packages=list(manifest.packages),
+                scripts=_apply_scripts(manifest.scripts),
+                depends=[m.name for m in modules],
+            )
+        )
+    return units
+
+
+def machine_unit_name(machine_id: str) -> str:
+    """Return the unit name of a machine's own files, packages, and scripts."""
+    return f"machine:{machine_id}"
+
+
+def _apply_scripts(scripts: list[str]) -> list[str]:
+    """Return the runnable scripts `apply` considers (all but the update phase), in order."""
+    return order_scripts([s for s in filter_scripts(scripts) if script_meta(s).phase != "update"])
+
+
+def dependency_graph(units: list[Unit]) -> dict[str, set[str]]:
+    """Return each unit's prerequisites among *units*.
+
+    Declared `depends` are kept, and every unit with packages or scripts also
+    waits on the units of `bootstrap` modules, which install package managers. A script
+    declaring `after`/`before` another unit's script orders the two units.
+    Raises ValueError when the prerequisites form a cycle, before any unit runs.
+    """
+    names = {u.name for u in units}
+    bootstrap = {u.name for u in units if u.bootstrap}
+    graph: dict[str, set[str]] = {}
+    for u in units:
+        deps = {d for d in u.depends if d in names}
+        if not u.bootstrap and (u.packages or u.scripts):
+            deps |= bootstrap
+        graph[u.name] = deps
+    for u in units:
+        for meta in (script_meta(s) for s in u.scripts):
+            for other in units:
+                if other is u:
+                    continue
+                if any(refers_to(n, s) for n in meta.after for s in other.scripts):
+                    graph[u.name].add(other.name)
+                if any(refers_to(n, s) for n in meta.before for s in other.scripts):
+                    graph[other.name].add(u.name)
+    try:
+        graphlib.TopologicalSorter(graph).prepare()
+    except graphlib.CycleError as exc:
+        raise ValueError(f"Cyclic unit dependencies: {' -> '.join(exc.args[1])}") from None
+    return graph
+
+
+# # MARK: Execution
+
+
+def apply_units(
+    units: list[Unit],
+    changed: dict[str, set[str]],
+    env: dict[str, str],
+    owners: dict[str, str],
+) -> dict[str, dict[str, list[tuple[str, str, str]]]]:
+    """Apply the changed phases of each unit. Returns failures per unit and phase.
+
+    A unit deploys files, runs `init_` scripts, installs packages, then runs
+    its remaining scripts. Units start once their prerequisites finish, and
+    independent units run in parallel on up to `settings.jobs` workers.
+    Scripts run one unit at a time unless `settings.parallel_scripts` is set.
+    Package passes share one PATH refresh and set of manager snapshots,
+    taken again after a bootstrap unit. Units whose packages only wait on
+    bootstrap units install them together (see `_PackageBatch`).
+    """
+    pending = [u for u in units if changed.get(u.name)]
+    if not pending:
+        return {}
+    graph = dependency_graph(pending)
+    workers = max(1, min(settings.jobs, len(pending)))
+    if workers > 1:
+        logger.info("Applying %d unit(s) on %d worker(s)", len(pending), workers)
+    batch = _PackageBatch(_batchable_units(pending, graph, changed), owners, workers > 1)
+
+    with shared_managers() as reset_managers:
+
+        def _work(unit: Unit) -> dict[str, list[tuple[str, str, str]]]:
+            failures = _apply_unit(
+                unit, changed[unit.name], env, owners, prefixed=workers > 1, batch=batch
+            )
+            if unit.bootstrap:
+                reset_managers()
+            return failures
+
+        return run_graph(pending, graph, _work, workers)
+
+
+def run_graph[T](
+    units: list[Unit],
+    graph: dict[str, set[str]],
+    work: Callable[[Unit], T],
+    workers: int,
+) -> dict[str, T]:
+    """Run *work* for every unit once its prerequisites in *graph* are done.
+
+    Ready units are submitted in list order, so a single worker preserves it.
+    """
+    remaining = {u.name: u for u in units}
+    results: dict[str, T] = {}
+    running: dict[Future[T], str] = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mc-unit") as pool:
+        while remaining or running:
+            for name in [n for n in remaining if graph.get(n, set()) <= results.keys()]:
+                running[pool.submit(work, remaining.pop(name))] = name
+            if not running:
+                raise RuntimeError(f"Dependency cycle between: {', '.join(sorted(remaining))}")
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+    return results
+
+
+def _batchable_units(
+    units: list[Unit], graph: dict[str, set[str]], changed: dict[str, set[str]]
+) -> list[Unit]:
+    """Return the units whose package installs can share one pass.
+
+    A unit qualifies when its packages would otherwise install as soon as
+    the bootstrap units finish: it has no `init_` scripts, and every unit it
+    waits on, directly or not, is a bootstrap unit. Its packages may then
+    install before its files are linked.
+    """
+    bootstrap = {u.name for u in units if u.bootstrap}
+
+    def _ancestors(name: str) -> set[str]:
+        seen: set[str] = set()
+        stack = list(graph.get(name, ()))
+        while stack:
+            dep = stack.pop()
+            if dep not in seen:
+                seen.add(dep)
+                stack += graph.get(dep, ())
+        return seen
+
+    batchable = [
+        u
+        for u in units
+        if u.packages
+        and not u.bootstrap
+        and "packages" in changed[u.name]
+        and not any(script_meta(s).phase == "init" for s in u.scripts)
+        and _ancestors(u.name) <= bootstrap
+    ]
+    return batchable if len(batchable) > 1 else []
+
+
+class _PackageBatch:
+    """Install the packages of several units in one pass, once the first of them is ready.
+
+    Packages of every member then share per-manager batches (one `brew
+    install` for all of them, rather than one per unit). Members reaching
+    their package phase later wait for that pass and take their failures.
+    """
+
+    def __init__(self, units: list[Unit], owners: dict[str, str], prefixed: bool) -> None:
+        self._units = {u.name: u for u in units}
+        self._owners = owners
+        self._prefixed = prefixed
+        self._lock = threading.Lock()
+        self._failures: dict[str, list[tuple[str, str, str]]] | None = None
+
+    def __contains__(self, unit: Unit) -> bool:
+        return unit.name in self._units
+
+    def install(self, unit: Unit) -> list[tuple[str, str, str]]:
+        """Return *unit*'s package failures, installing every member's packages first."""
+        with self._lock:
+            if self._failures is None:
+                members = self._units.values()
+                logger.info("Installing packages of %s together", ", ".join(self._units))
+                unit_of = {p.name: u.name for u in members for p in u.packages}
+                self._failures = {name: [] for name in self._units}
+                packages = [p for u in members for p in u.packages]
+                for failure in install_packages(
+                    packages, owners=self._owners, prefixed=self._prefixed
+                ):
+                    self._failures[unit_of.get(failure[1], unit.name)].append(failure)
+            return self._failures[unit.name]
+
+
+def _apply_unit(
+    unit: Unit,
+    phases: set[str],
+    env: dict[str, str],
+    owners: dict[str, str],
+    prefixed: bool,
+    batch: _PackageBatch | None = None,
+) -> dict[str, list[tuple[str, str, str]]]:
+    """Apply one unit's *phases* in order. Returns failures per phase."""
+    logger.debug("Unit %s: %s", unit.name, ", ".join(sorted(phases)))
+    failures: dict[str, list[tuple[str, str, str]]] = {phase: [] for phase in phases}
+    scripts = unit.scripts if "scripts" in phases else []
+    init_scripts = [s for s in scripts if script_meta(s).phase == "init"]
+    post_scripts = [s for s in scripts if script_meta(s).phase != "init"]
+
+    if "files" in phases:
+        _, failures["files"] = deploy_files(unit.files, owners=owners)
+    if init_scripts:
+        with _script_lock:
+            failures["scripts"] += run_scripts(init_scripts, env=env, owners=owners)
+    if "packages" in phases and batch is not None and unit in batch:
+        failures["packages"] = batch.install(unit)
+    elif "packages" in phases:
+        failures["packages"] = install_packages(unit.packages, owners=owners, prefixed=prefixed)
+    for concurrent, group in itertools.groupby(
+        post_scripts, key=lambda s: prefixed and _parallel_safe(s)
+    ):
+        if concurrent:
+            failures["scripts"] += run_scripts(list(group), env=env, owners=owners, buffered=True)
+        else:
+            with _script_lock:
+                failures["scripts"] += run_scripts(list(group), env=env, owners=owners)
+    return failures
+
+
+def _parallel_safe(script: str) -> bool:
+    declared = script_meta(script).parallel
+    return settings.parallel_scripts if declared is None else declared
+
+
+# # MARK: Fingerprints
+
+
+def fingerprint(unit: Unit, env: dict[str, str]) -> dict[str, str]:
+    """Return digests of a unit's inputs, keyed by phase.
+
+    Files cover mappings and the current state of each target; packages cover
+    declarations and package-manager database signals; scripts cover content,
+    the `stat` of their declared inputs, and the script environment.
+    """
+    files = [(fm.source, fm.target, _lstat_signature(target_path(fm))) for fm in unit.files]
+    packages = [p.model_dump(mode="json") for p in unit.packages]
+    scripts = [(s, _file_digest(Path(s)), script_inputs(s)) for s in unit.scripts]
+    return {
+        "files": _digest(files),
+        "packages": _digest([PLATFORM, packages, manager_signals() if packages else {}]),
+        "scripts": _digest([PLATFORM, scripts, sorted(env.items()) if scripts else []]),
+    }
+
+
+def changed_phases(
+    digests: dict[str, dict[str, str]],
+    previous: dict[str, str],
+) -> dict[str, set[str]]:
+    """Return, per unit, the phases whose digest differs from *previous*."""
+    return {
+        name: {
+            phase for phase, digest in phases.items() if previous.get(f"{name}:{phase}") != digest
+        }
+        for name, phases in digests.items()
+    }
+
+
+def record_fingerprints(
+    machine_id: str,
+    units: list[Unit],
+    env: dict[str, str],
+    changed: dict[str, set[str]],
+    recorded: dict[str, str],
+    failures: dict[str, dict[str, list[tuple[str, str, str]]]],
+) -> None:
+    """Save post-apply digests for every unit phase that ran without failures."""
+    digests = dict(recorded)
+    for unit in units:
+        if not changed.get(unit.name):
+            continue
+        after = fingerprint(unit, env)
+        for phase in changed[unit.name]:
+            key = f"{unit.name}:{phase}"
+            if failures.get(unit.name, {}).get(phase):
+                digests.pop(key, None)
+            else:
+                digests[key] = after[phase]
+    save_fingerprints(machine_id, digests)
+
+
+def load_fingerprints(machine_id: str) -> dict[str, str]:
+    """Return the digests recorded by the last successful apply of *machine_id*."""
+    if _FINGERPRINT_FILE.exists():
+        try:
+            return json.loads(_FINGERPRINT_FILE.read_text()).get(machine_id, {})
+        except ValueError, AttributeError:
+            logger.warning("Corrupted apply fingerprints, resetting")
+    return {}
+
+
+def save_fingerprints(machine_id: str, digests: dict[str, str]) -> None:
+    """Persist `<unit>:<phase>` digests for *machine_id*."""
+    if settings.dry_run:
+        return
+    data: dict[str, dict[str, str]] = {}
+    if _FINGERPRINT_FILE.exists():
+        try:
+            data = json.loads(_FINGERPRINT_FILE.read_text())
+        except ValueError:
+            data = {}
+    data[machine_id] = digests
+    _FINGERPRINT_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp = _FINGERPRINT_FILE.with_suffix(".tmp")
+    tmp.write_text(json.dumps(data, indent=2, sort_keys=True))
+    tmp.replace(_FINGERPRINT_FILE)
+
+
+def _digest(value: object) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def _file_digest(path: Path) -> str | None:
+    try:
+        return hashlib.sha256(path.read_bytes()).hexdigest()[:16]
+    except OSError:
+        return None
+
+
+def _lstat_signature(path: Path) -> list[int] | None:
+    """Return identifying `lstat` fields, so replaced or removed targets invalidate."""
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return None
+    return [st.st_mode, st.st_ino, st.st_mtime_ns]
+
+
+# # MARK: Plans
+
+
+@dataclass(frozen=True, slots=True)
+class Change:
+    """One step an apply would take.
+
+    `kind` is `file`, `package`, or `script`. File actions are `create`,
+    `update`, `backup`, or `missing`; package actions are `install`,
+    `unknown`, or `missing`; scripts `run`, with the reason as `detail`.
+    """
+
+    unit: str
+    kind: str
+    item: str
+    action: str
+    detail: str = ""
+
+
+@dataclass(frozen=True, slots=True)
+class Plan:
+    """The phases and steps an apply of *machine* would carry out.
+
+    `digests` are the fingerprints the plan was computed from; applying a
+    saved plan first checks they still hold.
+    """
+
+    machine: str
+    platform: str
+    created: str
+    phases: dict[str, list[str]]
+    digests: dict[str, dict[str, str]]
+    changes: list[Change]
+
+
+def build_plan(
+    machine_id: str,
+    units: list[Unit],
+    digests: dict[str, dict[str, str]],
+    changed: dict[str, set[str]],
+) -> Plan:
+    """Compute the steps applying *changed* phases would take, without side effects.
+
+    Package decisions come from manager snapshots and script decisions from
+    recorded runs, so no command runs per item.
+    """
+    changes: list[Change] = []
+    packages = [p for u in units if "packages" in changed.get(u.name, ()) for p in u.packages]
+    installs = {id(pkg): (action, detail) for pkg, action, detail in plan_installs(packages)}
+    for unit in units:
+        phases = changed.get(unit.name, set())
+        if "files" in phases:
+            changes += [
+                Change(unit.name, "file", fm.target, action, fm.source)
+                for fm, action in plan_links(unit.files)
+                if action != "unchanged"
+            ]
+        if "packages" in phases:
+            changes += [
+                Change(unit.name, "package", pkg.name, *installs[id(pkg)])
+                for pkg in unit.packages
+                if id(pkg) in installs and installs[id(pkg)][0] != "installed"
+            ]
+        if "scripts" in phases:
+            changes += [
+                Change(unit.name, "script", Path(script).name, "run", reason)
+                for script, reason in plan_script_runs(unit.scripts)
+            ]
+    return Plan(
+        machine=machine_id,
+        platform=str(PLATFORM),
+        created=datetime.now(UTC).isoformat(),
+        phases={name: sorted(phases) for name, phases in changed.items() if phases},
+        digests=digests,
+        changes=changes,
+    )
+
+
+def format_plan(plan: Plan) -> list[str]:
+    """Return the plan as compact diff lines (rich markup), one per change."""
+    marks = {"create": "+", "install": "+", "run": ">", "update": "~", "backup": "~"}
+    lines = []
+    for c in plan.changes:
+        mark = marks.get(c.action, "?")
+        color = {"+": "green", "~": "yellow", ">": "cyan"}.get(mark, "red")
+        lines.append(
+            rf"  [{color}]{mark}[/] [dim]\[{c.unit}][/] {c.kind} {c.item} [dim]({c.action}"
+            + (f": {c.detail}" if c.detail and c.kind != "file" else "")
+            + ")[/]"
+        )
+    return lines
+
+
+def plans_to_json(plans: list[Plan]) -> str:
+    """Serialize *plans* in the format `load_plan` reads."""
+    return json.dumps({"version": _PLAN_VERSION, "plans": [asdict(p) for p in plans]}, indent=2)
+
+
+def load_plan(path: Path, machine_id: str) -> Plan:
+    """Read the plan for *machine_id* from a file written with `plans_to_json`.
+
+    Raises ValueError when the file is unreadable, of another version, or
+    has no plan for the machine.
+    """
+    try:
+        data = json.loads(path.read_text())
+    except (OSError, ValueError) as exc:
+        raise ValueError(f"Cannot read plan {path}: {exc}") from None
+    if not isinstance(data, dict) or data.get("version") != _PLAN_VERSION:
+        raise ValueError(f"Unsupported plan format in {path}")
+    plans = data.get("plans", [])
+    if not isinstance(plans, list):
+        raise ValueError(f"Malformed plan file {path}: plans must be a list")
+    for raw in plans:
+        if isinstance(raw, dict) and raw.get("machine") == machine_id:
+            try:
+                return _parse_plan(raw)
+            except ValueError as exc:
+                raise ValueError(f"Malformed plan for {machine_id} in {path}: {exc}") from None
+    raise ValueError(f"No plan for {machine_id} in {path}")
+
+
+def _parse_plan(raw: dict) -> Plan:
+    """Build a Plan from its JSON form, raising ValueError on missing or mistyped fields."""
+    plan_keys = {f.name for f in fields(Plan)}
+    if raw.keys() != plan_keys:
+        raise ValueError(f"expected the keys {', '.join(sorted(plan_keys))}")
+    if not all(isinstance(raw[key], str) for key in ("machine", "platform", "created")):
+        raise ValueError("machine, platform, and created must be strings")
+    if not _maps_to(raw["phases"], list) or not _maps_to(raw["digests"], dict):
+        raise ValueError("phases and digests must map unit names to their phases")
+
+    change_keys = {f.name for f in fields(Change)}
+    changes = raw["changes"]
+    if not isinstance(changes, list) or not all(
+        isinstance(c, dict)
+        and change_keys - {"detail"} <= c.keys() <= change_keys
+        and all(isinstance(v, str) for v in c.values())
+        for c in changes
+    ):
+        raise ValueError(f"changes must be objects with the keys {', '.join(sorted(change_keys))}")
+    return Plan(**{**raw, "changes": [Change(**c) for c in changes]})
+
+
+def _maps_to(value: object, kind: type[list] | type[dict]) -> bool:
+    """Whether *value* maps strings to *kind* containers (lists or dicts) of strings."""
+    return isinstance(value, dict) and all(
+        isinstance(inner, kind)
+        and all(isinstance(v, str) for v in (inner.values() if isinstance(inner, dict) else inner))
+        for inner in value.values()
+    )
+
+
+def stale_units(plan: Plan, digests: dict[str, dict[str, str]]) -> list[str]:
+    """Return units whose inputs changed, or that were added or removed, since *plan*."""
+    names = plan.digests.keys() | digests.keys()
+    return sorted(name for name in names if plan.digests.get(name) != digests.get(name))
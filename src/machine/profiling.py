@@ -0,0 +1,132 @@
+"""`--profile` support: cProfile for the whole command plus wall-clock spans as a Chrome trace."""
+
+import functools
+import json
+import os
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from machine.core import settings
+
+if TYPE_CHECKING:
+    from cProfile import Profile
+
+_PROFILE_DIR = settings.app_dir / "profiles"
+
+_profile: "Profile | None" = None
+_events: list[dict] | None = None  # Chrome trace events while profiling, else None
+_events_lock = threading.Lock()
+_origin = 0
+
+# # MARK: Spans
+
+
+def traced[**P, R](name: str) -> Callable[[Callable[P, R]], Callable[P, R]]:
+    """Record each call of the decorated function as a span while profiling."""
+
+    def decorator(fn: Callable[P, R]) -> Callable[P, R]:
+        @functools.wraps(fn)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            if _events is None:
+                return fn(*args, **kwargs)
+            with span(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Record a complete (`X`) trace event for the enclosed block while profiling."""
+    if _events is None:
+        yield
+        return
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        end = time.perf_counter_ns()
+        thread = threading.current_thread()
+        event = {
+            "name": name,
+            "ph": "X",
+            "ts": (start - _origin) / 1000,
+            "dur": (end - start) / 1000,
+            "pid": os.getpid(),
+            "tid": thread.ident,
+            "args": {"thread": thread.name},
+        }
+        with _events_lock:
+            if _events is not None:
+                _events.append(event)
+
+
+# # MARK: Session
+
+
+def start() -> None:
+    """Start profiling the interpreter and recording spans."""
+    import cProfile
+
+    global _profile, _events, _origin
+    _origin = time.perf_counter_ns()
+    _events = []
+    _profile = cProfile.Profile()
+    _profile.enable()
+
+
+def stop(command: str, top: int = 20) -> tuple[Path, Path, list[str]]:
+    """Stop profiling and write `<time>-<command>.prof` and `.trace.json` files.
+
+    Returns both paths and summary lines: span totals, then the *top*
+    functions by cumulative time. The trace loads in Perfetto or
+    `chrome://tracing`.
+    """
+    import pstats
+
+    global _profile, _events
+    profile, events = _profile, _events or []
+    _profile, _events = None, None
+    if profile is None:
+        raise RuntimeError("Profiling was not started")
+    profile.disable()
+
+    _PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    stem = f"{datetime.now():%Y%m%dT%H%M%S}-{command}"
+    prof_path = _PROFILE_DIR / f"{stem}.prof"
+    trace_path = _PROFILE_DIR / f"{stem}.trace.json"
+    profile.dump_stats(prof_path)
+
+    threads = {e["tid"]: e["args"]["thread"] for e in events}
+    metadata = [
+        {"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": n}}
+        for tid, n in threads.items()
+    ]
+    trace_path.write_text(json.dumps({"traceEvents": metadata + events}))
+
+    totals: dict[str, list[float]] = {}
+    for e in events:
+        row = totals.setdefault(e["name"], [0, 0.0])
+        row[0] += 1
+        row[1] += e["dur"] / 1e6
+    lines = [
+        f"{seconds:9.3f}s {int(calls):>7}  {name}"
+        for name, (calls, seconds) in sorted(totals.items(), key=lambda t: -t[1][1])
+    ]
+
+    stats = pstats.Stats(profile).stats  # type: ignore[attr-defined]
+    ranked = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:top]
+    root = str(settings.home) + os.sep
+    lines.append("")
+    lines += [
+        f"{ct:9.3f}s {nc:>7}  {func} ({file.removeprefix(root)}:{line})"
+        for (file, line, func), (_, nc, _, ct, _) in ranked
+    ]
+    return prof_path, trace_path, lines
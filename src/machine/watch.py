@@ -0,0 +1,250 @@
+"""`mc watch`: notice deployed links that drift from their sources as it happens."""
+
+import ctypes
+import ctypes.util
+import filecmp
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from pathlib import Path
+
+from machine.manifest import FileMapping
+from machine.ops.files import plan_links, target_path
+
+logger = logging.getLogger(__name__)
+
+_IDLE_WAKE = 1.0  # seconds between checks of the stop event while nothing happens
+
+# inotify(7) event masks: entries created, removed, renamed, or rewritten in a watched directory
+_IN_CLOSE_WRITE = 0x008
+_IN_ATTRIB = 0x004
+_IN_MOVED_FROM = 0x040
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_DELETE_SELF = 0x400
+_IN_MOVE_SELF = 0x800
+_IN_Q_OVERFLOW = 0x4000
+_IN_IGNORED = 0x8000
+_IN_ONLYDIR = 0x01000000
+_WATCH_MASK = (
+    _IN_CLOSE_WRITE
+    | _IN_ATTRIB
+    | _IN_MOVED_FROM
+    | _IN_MOVED_TO
+    | _IN_CREATE
+    | _IN_DELETE
+    | _IN_DELETE_SELF
+    | _IN_MOVE_SELF
+    | _IN_ONLYDIR
+)
+_EVENT = struct.Struct("iIII")  # wd, mask, cookie, name length
+
+# # MARK: Drift
+
+
+@dataclass(frozen=True, slots=True)
+class Drift:
+    """A deployed target that no longer links to its source.
+
+    `kind` is `replaced` (a copy of the source took the link's place),
+    `changed` (a regular file or directory with other contents did, which
+    re-linking moves to a backup), `removed`, `relinked` (links elsewhere),
+    `dangling` (links to nothing), or `source missing`, the only kind
+    re-linking cannot fix.
+    """
+
+    mapping: FileMapping
+    kind: str
+
+    @property
+    def fixable(self) -> bool:
+        return self.kind != "source missing"
+
+
+def find_drift(files: list[FileMapping]) -> list[Drift]:
+    """Return the mappings whose target has drifted, using one `lstat` per target.
+
+    *files* are in unit order. Where several mappings share a target, only
+    the last is checked: it is the link `apply` leaves in place (the machine
+    unit deploys after every module), so the earlier ones are not drift.
+    """
+    latest = {target_path(fm): fm for fm in files}
+    kinds = {"backup": "replaced", "create": "removed", "update": "relinked"}
+    drift = []
+    for fm, action in plan_links(list(latest.values())):
+        if action == "unchanged":
+            continue
+        kind = kinds.get(action, "source missing")
+        if kind == "relinked" and not os.path.exists(target_path(fm)):
+            kind = "dangling"
+        elif kind == "replaced" and not _same_contents(Path(fm.source), target_path(fm)):
+            kind = "changed"
+        drift.append(Drift(fm, kind))
+    return drift
+
+
+def _same_contents(source: Path, target: Path) -> bool:
+    """Whether regular file *target* holds exactly what *source* does."""
+    try:
+        return target.is_file() and source.is_file() and filecmp.cmp(source, target, shallow=False)
+    except OSError:
+        return False
+
+
+# # MARK: Watching
+
+
+def watch_drift(
+    files: list[FileMapping],
+    on_drift: Callable[[list[Drift]], None],
+    stop: threading.Event,
+    debounce: float = 0.5,
+    interval: float = 2.0,
+) -> None:
+    """Call *on_drift* with drifted mappings until *stop* is set, starting with a full check.
+
+    Parent directories of targets are watched with inotify where available;
+    elsewhere the targets are polled with `lstat` every *interval* seconds.
+    Changes are batched until none arrive for *debounce* seconds, so an
+    editor's write-rename-chmod sequence is checked once.
+    """
+    targets = {target_path(fm): fm for fm in files}
+    affected: dict[Path, set[Path]] = {}  # event path → targets at or below it
+    for target in targets:
+        for path in (target, *target.parents):
+            affected.setdefault(path, set()).add(target)
+
+    watcher = _open_watcher(interval)
+    logger.info("Watching %d targets (%s)", len(targets), type(watcher).__name__)
+    try:
+        watcher.watch(targets)
+        dirty, deadline = set(targets), time.monotonic()
+        while not stop.is_set():
+            timeout = max(0.0, deadline - time.monotonic()) if dirty else _IDLE_WAKE
+            events = watcher.wait(min(timeout, _IDLE_WAKE))
+            hits = {t for path in events for t in affected.get(path, ())}
+            if hits:
+                dirty |= hits
+                deadline = time.monotonic() + debounce
+            elif dirty and time.monotonic() >= deadline:
+                drift = find_drift([targets[t] for t in sorted(dirty)])
+                dirty.clear()
+                if drift:
+                    on_drift(drift)
+                watcher.watch(targets)  # parents may have been created or replaced
+    finally:
+        watcher.close()
+
+
+class _PollWatcher:
+    """Report targets whose `lstat` changed, checked every *interval* seconds."""
+
+    def __init__(self, interval: float) -> None:
+        self._interval = interval
+        self._signatures: dict[Path, tuple | None] = {}
+        self._next = 0.0
+
+    def watch(self, targets: Iterable[Path]) -> None:
+        for target in targets:
+            self._signatures.setdefault(target, _signature(target))
+
+    def wait(self, timeout: float) -> set[Path]:
+        if time.monotonic() + timeout < self._next:
+            time.sleep(timeout)
+            return set()
+        time.sleep(max(0.0, self._next - time.monotonic()))
+        self._next = time.monotonic() + self._interval
+        changed = set()
+        for target, previous in self._signatures.items():
+            current = _signature(target)
+            if current != previous:
+                self._signatures[target] = current
+                changed.add(target)
+        return changed
+
+    def close(self) -> None:
+        pass
+
+
+def _signature(path: Path) -> tuple | None:
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return None
+    return st.st_mode, st.st_ino, st.st_size, st.st_mtime_ns
+
+
+class _InotifyWatcher:
+    """Report entries changed in the parent directories of targets, via inotify(7)."""
+
+    def __init__(self, libc: ctypes.CDLL) -> None:
+        self._libc = libc
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs: dict[int, Path] = {}
+
+    def watch(self, targets: Iterable[Path]) -> None:
+        """Watch each target's nearest existing parent; re-adding a watch is a no-op."""
+        for target in targets:
+            parent = next((p for p in target.parents if p.is_dir()), None)
+            if parent is None:
+                continue
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(parent), _WATCH_MASK)
+            if wd < 0:
+                logger.debug("Cannot watch %s: %s", parent, os.strerror(ctypes.get_errno()))
+                continue
+            self._dirs[wd] = parent
+
+    def wait(self, timeout: float) -> set[Path]:
+        if not select.select([self._fd], [], [], timeout)[0]:
+            return set()
+        changed: set[Path] = set()
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, size = _EVENT.unpack_from(data, offset)
+                name = data[offset + _EVENT.size : offset + _EVENT.size + size].rstrip(b"\0")
+                offset += _EVENT.size + size
+                if mask & _IN_Q_OVERFLOW:  # events were lost: recheck every watched directory
+                    changed |= set(self._dirs.values())
+                elif wd in self._dirs:
+                    parent = self._dirs[wd]
+                    changed.add(parent / os.fsdecode(name) if name else parent)
+                    if mask & _IN_IGNORED:  # the directory itself went away
+                        del self._dirs[wd]
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+def _inotify_lib() -> ctypes.CDLL | None:
+    """Return libc when it provides inotify (Linux), else None."""
+    if sys.platform != "linux":
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    except OSError:
+        return None
+    return libc if hasattr(libc, "inotify_init1") else None
+
+
+def _open_watcher(interval: float) -> "_InotifyWatcher | _PollWatcher":
+    libc = _inotify_lib()
+    if libc is not None:
+        try:
+            return _InotifyWatcher(libc)
+        except OSError as exc:  # e.g. the per-user instance limit
+            logger.warning("inotify unavailable (%s), polling every %gs", exc, interval)
+    return _PollWatcher(interval)
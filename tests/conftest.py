@@ -0,0 +1,27 @@
+"""Shared test fixtures."""
+
+from pathlib import Path
+
+import pytest
+
+from machine import completion as machine_completion
+from machine import journal as machine_journal
+from machine import manifest as machine_manifest
+from machine import persistence as machine_persistence
+from machine import plan as machine_plan
+from machine import profiling as machine_profiling
+from machine.ops import packages as machine_packages
+
+
+@pytest.fixture(autouse=True)
+def _isolate_app_dir(monkeypatch, tmp_path: Path) -> None:
+    """Keep caches and state written by the code under test out of the real app dir."""
+    monkeypatch.setattr(machine_packages, "_SNAPSHOT_CACHE", tmp_path / "packages.json")
+    monkeypatch.setattr(machine_plan, "_FINGERPRINT_FILE", tmp_path / "applied.json")
+    monkeypatch.setattr(machine_manifest, "_CACHE_DIR", tmp_path / "manifests")
+    monkeypatch.setattr(machine_journal, "_JOURNAL_FILE", tmp_path / "journal.jsonl")
+    monkeypatch.setattr(machine_profiling, "_PROFILE_DIR", tmp_path / "profiles")
+    monkeypatch.setattr(machine_persistence, "_STATE_DB", tmp_path / "state.db")
+    monkeypatch.setattr(machine_persistence, "_LEGACY_STATE_FILE", tmp_path / "state.json")
+    monkeypatch.setattr(machine_persistence, "_LOCK_FILE", tmp_path / "state.lock")
+    monkeypatch.setattr(machine_completion, "_INDEX_FILE", tmp_path / "names.json")
@@ -0,0 +1,64 @@
+"""Benchmark suite tests."""
+
+from pathlib import Path
+
+from machine import bench as machine_bench
+from machine.core import settings
+
+
+def test_machine_benchmarks_run_offline() -> None:
+    """Machine benchmarks run in dry-run mode with stubbed managers, then restore settings."""
+    from machine import manifest as machine_manifest
+
+    results = machine_bench.run_benchmarks(settings.home, ["macbook"], repeat=1, startup=False)
+
+    assert set(results) == {
+        f"{kind}{variant}:macbook"
+        for kind in ("manifest", "manifest-cached", "env", "apply")
+        for variant in ("", "-warm")
+    }
+    assert all(t.runs == 1 and t.min >= 0 for t in results.values())
+    assert not settings.dry_run
+    assert not settings.stub_managers
+    assert not machine_manifest._CACHE_DIR.exists()
+
+
+def test_cold_runs_clear_caches_before_each_sample() -> None:
+    """Cold samples start without a compiled manifest or script env; warm ones reuse them."""
+    from machine import manifest as machine_manifest
+    from machine.ops import scripts as machine_scripts
+
+    cached: list[tuple[bool, int]] = []
+
+    def _load() -> None:
+        cached.append((machine_manifest._CACHE_DIR.exists(), len(machine_scripts._env_cache)))
+        machine_bench._load_cached("macbook", settings.home)
+        machine_bench._build_env("macbook", settings.home)
+
+    app_cache = machine_manifest._CACHE_DIR
+    with machine_bench._manifest_cache():
+        machine_bench._time(_load, 2, setup=machine_bench._clear_caches)
+        machine_bench._time(_load, 2)
+
+    assert cached == [(False, 0), (False, 0), (True, 1), (True, 1)]
+    assert machine_manifest._CACHE_DIR == app_cache
+    assert not app_cache.exists()
+
+
+def test_results_round_trip_and_flag_regressions(tmp_path: Path) -> None:
+    """Saved results load back, and only medians beyond the threshold regress."""
+    baseline = {
+        "import:warm": machine_bench.Timing(min=90.0, median=100.0, runs=3),
+        "manifest:macbook": machine_bench.Timing(min=9.0, median=10.0, runs=3),
+    }
+    path = machine_bench.save_results(baseline, tmp_path, tmp_path / "base.json")
+    current = {
+        "import:warm": machine_bench.Timing(min=100.0, median=110.0, runs=3),
+        "manifest:macbook": machine_bench.Timing(min=14.0, median=15.0, runs=3),
+        "apply:macbook": machine_bench.Timing(min=1.0, median=1.0, runs=3),
+    }
+
+    loaded = machine_bench.load_results(path)
+
+    assert loaded == baseline
+    assert set(machine_bench.regressions(current, loaded, threshold=0.2)) == {"manifest:macbook"}
@@ -0,0 +1,101 @@
+"""CLI startup tests."""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from machine import completion as machine_completion
+
+_HEAVY_MODULES = ("pydantic", "machine.manifest", "machine.ops", "machine.plan")
+
+
+def test_cli_import_defers_heavy_modules() -> None:
+    """Importing the CLI must not load manifest models, ops, or detect the platform."""
+    code = (
+        "import sys, machine.cli, machine.core as core\n"
+        f"heavy = [m for m in sys.modules if m.startswith({_HEAVY_MODULES!r})]\n"
+        "print(heavy, 'PLATFORM' in vars(core))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "[] False"
+
+
+def test_completion_defers_heavy_modules(tmp_path: Path) -> None:
+    """Completing machine and module names must not load manifest models or modules."""
+    code = (
+        "import sys, machine.cli as cli\n"
+        "names = cli._complete_machines('') + cli._complete_modules('')\n"
+        f"heavy = [m for m in sys.modules if m.startswith({_HEAVY_MODULES!r})]\n"
+        "print(heavy, len(names) > 0)\n"
+    )
+    env = os.environ | {"XDG_CONFIG_HOME": str(tmp_path)}
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env)
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "[] True"
+
+
+def test_name_index_refreshes_when_directories_change(tmp_path: Path, monkeypatch) -> None:
+    """The index is reused until an entry is added, including a marker in an empty dir."""
+    (tmp_path / "machines" / "macbook").mkdir(parents=True)
+    (tmp_path / "machines" / "macbook" / "manifest.py").touch()
+    (tmp_path / "config").mkdir()
+    (tmp_path / "config" / "git.py").touch()
+
+    assert machine_completion.machine_names(tmp_path) == ["macbook"]
+    assert machine_completion.module_names(tmp_path) == ["git"]
+
+    scan = machine_completion.scan_names
+    monkeypatch.setattr(machine_completion, "scan_names", pytest.fail)
+    assert machine_completion.module_names(tmp_path) == ["git"]
+    monkeypatch.setattr(machine_completion, "scan_names", scan)
+
+    (tmp_path / "config" / "zed").mkdir()
+    assert machine_completion.module_names(tmp_path) == ["git"]
+    (tmp_path / "config" / "zed" / "module.py").touch()
+    assert machine_completion.module_names(tmp_path) == ["git", "zed"]
+
+
+def test_platform_constants_resolve_on_first_access() -> None:
+    """Platform constants are still importable from `machine.core`."""
+    from machine.core import PLATFORM, Platform, is_unix, is_windows
+
+    assert isinstance(PLATFORM, Platform)
+    assert is_unix != is_windows
+
+
+def test_status_exits_nonzero_only_on_drift(tmp_path: Path, monkeypatch) -> None:
+    """Status exits 0 on a converged machine, 1 on drift, and 1 without a machine to check."""
+    from machine import cli
+    from machine.ops import packages as machine_packages
+
+    target = tmp_path / "home" / ".zshrc"
+    (tmp_path / "machines" / "box").mkdir(parents=True)
+    (tmp_path / "machines" / "box" / "manifest.py").write_text(
+        "from machine.manifest import MachineManifest\n"
+        "manifest = MachineManifest(modules=['shell'])\n"
+    )
+    (tmp_path / "config" / "shell").mkdir(parents=True)
+    (tmp_path / "config" / "shell" / "zshrc").touch()
+    (tmp_path / "config" / "shell" / "module.py").write_text(
+        "from machine.manifest import FileMapping, Module\n"
+        f"module = Module(files=[FileMapping(source='zshrc', target={str(target)!r})])\n"
+    )
+    target.parent.mkdir()
+    target.symlink_to(tmp_path / "config" / "shell" / "zshrc")
+    monkeypatch.setattr(cli.settings, "home", tmp_path)
+    monkeypatch.setattr(machine_packages, "refresh_path", pytest.fail)
+
+    cli.status("box", quiet=True)
+
+    target.unlink()
+    with pytest.raises(SystemExit) as exc:
+        cli.status("box", quiet=True)
+    assert exc.value.code == 1
+    with pytest.raises(SystemExit):
+        cli.status("", quiet=True)
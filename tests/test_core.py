@@ -0,0 +1,169 @@
+"""Shell execution tests."""
+
+import logging
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from collections.abc import Iterator
+
+import pytest
+
+from machine import core as machine_core
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="pty tee is Unix-only")
+
+
+@pytest.fixture(autouse=True)
+def _devnull_stdin(monkeypatch) -> Iterator[None]:
+    """Commands inherit stdin, which pytest replaces with a pseudo-file."""
+    with open(os.devnull) as stdin:
+        monkeypatch.setattr(sys, "stdin", stdin)
+        yield
+
+
+@pytest.fixture
+def output_log() -> Iterator[list[str]]:
+    """Capture lines the tee writes to the output log, filtered as the file handler does."""
+    lines: list[str] = []
+
+    class _Collect(logging.Handler):
+        def emit(self, record: logging.LogRecord) -> None:
+            lines.append(record.getMessage())
+
+    handler = _Collect()
+    handler.addFilter(machine_core._strip_output_ansi)
+    machine_core._output_logger.addHandler(handler)
+    machine_core._output_logger.setLevel(logging.DEBUG)
+    yield lines
+    machine_core._output_logger.setLevel(logging.NOTSET)
+    machine_core._output_logger.removeHandler(handler)
+
+
+def test_run_collect_logs_lines_as_they_arrive(output_log: list[str], capfd) -> None:
+    """Output is teed to stdout, returned, and logged line by line without ANSI codes."""
+    rc, output = machine_core.run_collect(
+        r"printf 'one\n\033[1mtwo\033[0m\npartial'; exit 3", label="git"
+    )
+
+    assert rc == 3
+    assert output.replace(b"\r\n", b"\n") == b"one\n\x1b[1mtwo\x1b[0m\npartial"
+    assert output_log == ["[git] | one", "[git] | two", "[git] | partial"]
+    assert "partial" in capfd.readouterr().out
+
+
+@pytest.mark.parametrize("pidfd", [True, False], ids=["pidfd", "waiter-thread"])
+def test_run_collect_returns_when_command_exits_despite_background_child(
+    pidfd: bool, monkeypatch
+) -> None:
+    """A daemonized child holding the pty open does not keep the tee waiting."""
+    if not pidfd:
+        monkeypatch.delattr(os, "pidfd_open", raising=False)
+    start = time.monotonic()
+    rc, output = machine_core.run_collect("sleep 5 & echo started")
+
+    assert rc == 0
+    assert b"started" in output
+    assert time.monotonic() - start < 4
+
+
+def test_run_collect_keeps_tail_and_matching_lines(monkeypatch) -> None:
+    """Past the capture limit, only the tail and lines matching *keep* are returned."""
+    monkeypatch.setattr(machine_core.settings, "capture_limit", 64)
+    cmd = "echo 'Found an existing package'; seq 1 2000; echo last"
+
+    rc, output = machine_core.run_collect(cmd, keep=re.compile("existing package", re.I))
+    _, full = machine_core.run_collect(cmd, full=True)
+
+    lines = output.decode().splitlines()
+    assert rc == 0
+    assert lines[0] == "Found an existing package"
+    assert lines[-1].strip() == "last"
+    assert len(output) < 64 + 40
+    assert b"\n1000\r\n" in full
+
+
+def test_output_sink_keeps_lines_still_in_the_tail_once() -> None:
+    """A kept line still in the tail is not prepended again, though its chunk began earlier."""
+    sink = machine_core._OutputSink(
+        machine_core._BufferedWriter(""), "", limit=20, keep=re.compile("keep")
+    )
+    sink.feed(b"x" * 50 + b"\nkeep me\nend\n")
+
+    assert sink.output() == bytearray(b"x" * 7 + b"\nkeep me\nend\n")
+
+
+def test_file_logging_writes_in_order_off_thread(tmp_path, monkeypatch) -> None:
+    """Queued records reach mc.log once each, in order, ANSI-free, after a repeated setup."""
+    monkeypatch.setattr(machine_core.Settings, "app_dir", tmp_path)
+    monkeypatch.setattr(machine_core, "_log_writer", None)
+    monkeypatch.setattr(machine_core, "_queue_handler", None)
+    before = (list(logging.root.handlers), list(machine_core._output_logger.handlers))
+    machine_core._output_logger.setLevel(logging.DEBUG)
+    try:
+        machine_core.setup_file_logging()
+        machine_core.setup_file_logging()
+        queued = [h for h in logging.root.handlers if isinstance(h, machine_core.QueueHandler)]
+        assert queued == [machine_core._queue_handler]
+        for i in range(1000):
+            machine_core._output_logger.debug("[git] | \x1b[1mline %d\x1b[0m", i)
+        machine_core._output_logger.debug("[git] | \x1b[0m")
+        assert machine_core._log_writer is not None
+        machine_core._log_writer.stop()
+    finally:
+        machine_core._output_logger.setLevel(logging.NOTSET)
+        logging.root.handlers, machine_core._output_logger.handlers = before
+
+    lines = [line.split(": ", 1)[1] for line in (tmp_path / "mc.log").read_text().splitlines()]
+    output = [line for line in lines if line.startswith("[git]")]
+    assert output == [f"[git] | line {i}" for i in range(1000)]
+
+
+def test_buffered_output_written_as_one_block_per_command(capfd) -> None:
+    """Concurrent buffered commands print whole, prefixed blocks and get no stdin."""
+    cmd = "for i in 1 2 3; do echo {0}$i; sleep 0.05; done; read -r line || echo no-stdin"
+    threads = [
+        threading.Thread(
+            target=machine_core.run,
+            args=(cmd.format(name),),
+            kwargs={"label": label, "buffered": True},
+        )
+        for name, label in [("a", "vscode"), ("b", "zinit")]
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    lines = capfd.readouterr().out.replace("\r", "").splitlines()
+    blocks = sorted([lines[:4], lines[4:]])
+    assert blocks == [
+        ["[vscode] a1", "[vscode] a2", "[vscode] a3", "[vscode] no-stdin"],
+        ["[zinit] b1", "[zinit] b2", "[zinit] b3", "[zinit] no-stdin"],
+    ]
+
+
+def test_run_collect_kills_command_after_timeout() -> None:
+    """A command outliving its timeout is killed and reported as timed out."""
+    start = time.monotonic()
+    with pytest.raises(subprocess.TimeoutExpired):
+        machine_core.run_collect("echo started; exec sleep 5", timeout=0.3)
+
+    assert time.monotonic() - start < 4
+    assert machine_core.run_collect("true", timeout=5)[0] == 0
+
+
+def test_run_collect_timeout_kills_background_children(tmp_path, monkeypatch) -> None:
+    """A timeout kills the whole process group, including children ignoring SIGTERM."""
+    monkeypatch.setattr(machine_core, "_KILL_GRACE", 0.3)
+    pids = tmp_path / "pids"
+    script = f"sleep 30 & echo $! > {pids}; (trap '' TERM; exec sleep 30) & echo $! >> {pids}; wait"
+
+    with pytest.raises(subprocess.TimeoutExpired):
+        machine_core.run_collect(script, timeout=0.5)
+
+    for pid in pids.read_text().split():
+        ps = subprocess.run(["ps", "-o", "stat=", "-p", pid], capture_output=True, text=True)
+        assert ps.stdout.strip() in ("", "Z"), f"background child {pid} survived the timeout"
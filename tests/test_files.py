@@ -6,6 +6,7 @@ from pathlib import Path
 
 import pytest
 
+from machine.manifest import FileMapping
 from machine.ops import files as machine_files
 
 
@@ -99,3 +100,34 @@ def test_symlink_uses_next_backup_name_when_backup_exists(tmp_path: Path) -> Non
         encoding="utf-8"
     ) == '{"editor.tabSize": 2}'
     assert os.path.samefile(source, target)
+
+
+def test_deploy_files_counts_outcomes_on_parallel_checks(monkeypatch, tmp_path: Path) -> None:
+    """Large sets are checked on a pool; links are counted as created, updated, unchanged."""
+    monkeypatch.setattr(machine_files.settings, "dry_run", False)
+    monkeypatch.setattr(machine_files.settings, "jobs", 4)
+    sources = tmp_path / "config"
+    sources.mkdir()
+    files = []
+    for i in range(40):
+        (sources / f"{i}.conf").write_text(str(i), encoding="utf-8")
+        files.append(
+            FileMapping(source=str(sources / f"{i}.conf"), target=str(tmp_path / "home" / f"{i}"))
+        )
+    linked_dir = tmp_path / "linked-home"
+    linked_dir.symlink_to(tmp_path / "home", target_is_directory=True)
+
+    first, _ = machine_files.deploy_files(files)
+    (tmp_path / "home" / "0").unlink()
+    (tmp_path / "home" / "0").symlink_to(sources / "1.conf")
+    (tmp_path / "home" / "1").unlink()
+    (tmp_path / "home" / "1").write_text("local edits", encoding="utf-8")
+    (tmp_path / "home" / "2").unlink()
+    (tmp_path / "home" / "2").symlink_to(linked_dir / ".." / "config" / "2.conf")
+    second, failures = machine_files.deploy_files(files)
+
+    assert first == machine_files.DeployCounts(created=40)
+    assert second == machine_files.DeployCounts(updated=2, unchanged=38)
+    assert failures == []
+    assert (tmp_path / "home" / "1.backup").read_text(encoding="utf-8") == "local edits"
+    assert all(os.path.samefile(fm.source, fm.target) for fm in files)
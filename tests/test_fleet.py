@@ -0,0 +1,106 @@
+"""Fleet apply tests."""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+from machine import fleet as machine_fleet
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="pty tee is Unix-only")
+
+
+@pytest.fixture(autouse=True)
+def _devnull_stdin(monkeypatch):  # type: ignore[no-untyped-def]
+    """Commands inherit stdin, which pytest replaces with a pseudo-file."""
+    with open(os.devnull) as stdin:
+        monkeypatch.setattr(sys, "stdin", stdin)
+        yield
+
+
+def test_apply_fleet_collects_failures_per_machine(tmp_path: Path, monkeypatch) -> None:
+    """Each machine's failures come from its summary line, or from its exit code."""
+    stand_in = tmp_path / "transport.sh"
+    failed = machine_fleet.summary_line([("docker", "docker.unix.sh", "exit 1")])
+    clean = machine_fleet.summary_line([])
+    stand_in.write_text(
+        "#!/bin/sh\n"
+        'case "$*" in\n'
+        f"  *'-m homelab'*) echo applying; echo '{failed}';;\n"
+        "  *'-m pc'*) echo 'Unknown machine' >&2; exit 2;;\n"
+        f"  *) echo '{clean}';;\n"
+        "esac\n"
+    )
+    stand_in.chmod(0o755)
+    monkeypatch.setattr(machine_fleet.settings, "jobs", 3)
+    target = machine_fleet.parse_target(f"exec:{stand_in}")
+
+    results = machine_fleet.apply_fleet({m: target for m in ["homelab", "pc", "ghcs"]})
+
+    assert [(r.machine, r.exit_code, r.failures) for r in results] == [
+        ("homelab", 0, [("docker", "docker.unix.sh", "exit 1")]),
+        ("pc", 2, [("pc", "mc apply", "exit 2")]),
+        ("ghcs", 0, []),
+    ]
+
+
+def test_parse_target_specs(tmp_path: Path) -> None:
+    """Targets map to a transport prefix or a redirected home; bad specs fail."""
+    assert machine_fleet.parse_target("ssh:pi.lan").transport == ("ssh", "pi.lan")
+    box = machine_fleet.parse_target(f"dir:{tmp_path}")
+    assert box.env["HOME"] == str(tmp_path.resolve())
+    assert box.files_only
+    assert "-m rpi --summary-json" in machine_fleet.apply_command("rpi", box)
+    with pytest.raises(ValueError, match="Invalid target"):
+        machine_fleet.parse_target("docker")
+
+
+def test_fleet_commands_share_jobs_on_this_host(monkeypatch) -> None:
+    """Applies on this host split `-j` between them; remote ones keep it."""
+    monkeypatch.setattr(machine_fleet.settings, "jobs", 8)
+    targets = {
+        "pc": machine_fleet.parse_target("local"),
+        "box": machine_fleet.parse_target("dir:/tmp/box"),
+        "pi": machine_fleet.parse_target("ssh:pi.lan"),
+    }
+
+    commands = machine_fleet.fleet_commands(targets)
+
+    assert "-j 4 apply -m pc" in commands["pc"]
+    assert "-j 4 apply -m box" in commands["box"]
+    assert commands["pi"].startswith("ssh pi.lan mc -j 8 apply -m pi")
+
+
+def test_dir_fleet_never_runs_package_or_script_commands(tmp_path: Path, monkeypatch) -> None:
+    """A `dir:` target is refused for machines with packages or scripts before anything runs."""
+    from machine import cli
+
+    for machine, module in [("box", "Module(packages=[Package(apt='jq')])"), ("dots", "Module()")]:
+        (tmp_path / "machines" / machine).mkdir(parents=True)
+        (tmp_path / "machines" / machine / "manifest.py").write_text(
+            "from machine.manifest import MachineManifest\n"
+            f"manifest = MachineManifest(modules=['{machine}-mod'])\n"
+        )
+        (tmp_path / "config" / f"{machine}-mod").mkdir(parents=True)
+        (tmp_path / "config" / f"{machine}-mod" / "module.py").write_text(
+            f"from machine.manifest import Module, Package\nmodule = {module}\n"
+        )
+    (tmp_path / "config" / "pkgs.py").write_text(
+        "from machine.manifest import Module\nmodule = Module(bootstrap=True)\n"
+    )
+    commands: list[str] = []
+
+    def _run(cmd: str, **_: object) -> tuple[int, bytearray]:
+        commands.append(cmd)
+        return 0, bytearray(machine_fleet.summary_line([]).encode())
+
+    monkeypatch.setattr(machine_fleet.settings, "home", tmp_path)
+    monkeypatch.setattr(machine_fleet, "run_collect", _run)
+
+    with pytest.raises(SystemExit):
+        cli.fleet(["box"], [f"box=dir:{tmp_path / 'home'}"])
+    assert commands == []
+
+    cli.fleet(["dots"], [f"dots=dir:{tmp_path / 'home'}"])
+    assert len(commands) == 1 and "apply -m dots" in commands[0]
@@ -0,0 +1,46 @@
+"""Run journal tests."""
+
+import pytest
+
+from machine import journal as machine_journal
+from machine.core import settings
+
+
+def test_run_records_steps_with_command_results() -> None:
+    """Steps carry owner, timings, and the exit code and output size of their commands."""
+    with machine_journal.run("apply", "box"):
+        with machine_journal.step("package-install", "git", "git") as step:
+            machine_journal.note_command(0, 120)
+            machine_journal.note_command(1, 30)
+            step.status, step.detail = "failed", "brew exit 1"
+        with machine_journal.run("apply", "box"):  # nested runs join the outer one
+            with machine_journal.step("file", "shell", "~/.zshrc"):
+                pass
+
+    runs, steps = machine_journal.load_runs(10)
+
+    assert [(r["command"], r["machine"], r["failures"]) for r in runs] == [("apply", "box", 1)]
+    install, link = steps
+    assert (install["exit_code"], install["output_bytes"], install["detail"]) == (
+        1,
+        150,
+        "brew exit 1",
+    )
+    assert link["exit_code"] is None and link["start"] <= link["end"]
+    assert {m for m, *_ in machine_journal.module_totals(steps)} == {"git", "shell"}
+
+
+def test_failed_run_is_recorded_and_dry_run_is_not(monkeypatch) -> None:
+    """Exceptions mark the run as errored; dry runs leave no journal."""
+    with pytest.raises(RuntimeError), machine_journal.run("update", "box"):
+        with machine_journal.step("script", "git", "up_hooks.sh"):
+            raise RuntimeError("boom")
+
+    monkeypatch.setattr(settings, "dry_run", True)
+    with machine_journal.run("apply", "box"):
+        with machine_journal.step("script", "git", "setup.sh"):
+            pass
+
+    runs, steps = machine_journal.load_runs(10)
+    assert [r["status"] for r in runs] == ["error"]
+    assert [(s["status"], s["detail"]) for s in steps] == [("error", "boom")]
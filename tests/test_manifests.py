@@ -142,3 +142,55 @@ def test_module_dependencies_auto_included() -> None:
             seen.add(mod_name)
             resolved.append(mod_name)
     assert resolved == ["ssh", "ssh-server"]
+
+
+# # MARK: Compiled Cache
+
+
+def _write_machine(root: Path) -> None:
+    (root / "machines" / "box").mkdir(parents=True)
+    (root / "machines" / "box" / "manifest.py").write_text(
+        "from machine.manifest import MachineManifest\n"
+        "manifest = MachineManifest(modules=['git'])\n"
+    )
+    (root / "config" / "git").mkdir(parents=True)
+    (root / "config" / "git" / "module.py").write_text(
+        "from machine.manifest import Module\nmodule = Module()\n"
+    )
+
+
+def test_compiled_cache_skips_config_code(tmp_path: Path, monkeypatch) -> None:
+    """A warm load rebuilds the same models without executing manifest or module code."""
+    from machine import manifest as machine_manifest
+
+    _write_machine(tmp_path)
+    cold = machine_manifest.load_machine("box", tmp_path)
+
+    def _fail(*_: object) -> None:
+        raise AssertionError("config code executed")
+
+    monkeypatch.setattr(machine_manifest, "_import_py", _fail)
+    warm = machine_manifest.load_machine("box", tmp_path)
+
+    assert warm == cold
+    assert [m.name for m in warm[1]] == ["git"]
+
+
+def test_compiled_cache_invalidates_on_module_and_script_changes(tmp_path: Path) -> None:
+    """Editing a module or adding an auto-discovered script reloads the machine."""
+    from machine import manifest as machine_manifest
+
+    _write_machine(tmp_path)
+    machine_manifest.load_machine("box", tmp_path)
+
+    (tmp_path / "config" / "git" / "module.py").write_text(
+        "from machine.manifest import Module\nmodule = Module(scripts=['hooks.sh'])\n"
+    )
+    _, modules = machine_manifest.load_machine("box", tmp_path)
+    assert modules[0].scripts == [str(tmp_path / "config" / "git" / "hooks.sh")]
+
+    scripts = tmp_path / "machines" / "box" / "scripts"
+    scripts.mkdir()
+    (scripts / "setup.sh").write_text("#!/bin/sh\n")
+    manifest, _ = machine_manifest.load_machine("box", tmp_path)
+    assert manifest.scripts == [str(scripts / "setup.sh")]
@@ -296,3 +296,271 @@ def test_install_packages_reads_mas_list_once_and_skips_installed_apps(monkeypat
 
     assert failures == []
     assert calls == 1
+
+
+def test_install_packages_runs_manager_lanes_concurrently(monkeypatch) -> None:
+    """Independent managers get their own lanes; brew and cask share the Homebrew lane."""
+    packages = [
+        Package(name="git", brew="git"),
+        Package(name="Xcode", mas=497799835),
+        Package(name="zed", cask="zed"),
+    ]
+    calls: list[tuple[str, str, bool]] = []
+
+    monkeypatch.setattr(machine_packages, "PLATFORM", machine_packages.Platform.MACOS)
+    monkeypatch.setattr(machine_packages, "refresh_path", lambda: None)
+    monkeypatch.setattr(machine_packages.settings, "jobs", 4)
+    monkeypatch.setattr(
+        machine_packages.shutil,
+        "which",
+        lambda name: f"/usr/bin/{name}" if name in {"brew", "mas"} else None,
+    )
+    monkeypatch.setattr(machine_packages, "_installed_source_snapshots", lambda sources: {})
+    monkeypatch.setattr(machine_packages, "_source_installed", lambda source, value: False)
+
+    def _fake_install(pkg, source, *args, prefixed=False):  # type: ignore[no-untyped-def]
+        module = args[-1]
+        calls.append((pkg.name, machine_packages._MANAGER_CONFIGS[source].lane, prefixed))
+        return (module, pkg.name, f"{source} exit 1") if pkg.name != "git" else None
+
+    monkeypatch.setattr(machine_packages, "_install", _fake_install)
+
+    failures = machine_packages.install_packages(
+        packages, owners={"git": "git", "Xcode": "macbook", "zed": "zed"}
+    )
+
+    assert failures == [("macbook", "Xcode", "mas exit 1"), ("zed", "zed", "cask exit 1")]
+    assert [name for name, lane, _ in calls if lane == "brew"] == ["git", "zed"]
+    assert all(prefixed for _, _, prefixed in calls)
+
+
+def test_install_packages_streams_unprefixed_with_single_job(monkeypatch) -> None:
+    """A single worker keeps the original serial, unprefixed output."""
+    packages = [Package(name="git", brew="git"), Package(name="Xcode", mas=497799835)]
+    prefixes: list[bool] = []
+
+    monkeypatch.setattr(machine_packages, "PLATFORM", machine_packages.Platform.MACOS)
+    monkeypatch.setattr(machine_packages, "refresh_path", lambda: None)
+    monkeypatch.setattr(machine_packages.settings, "jobs", 1)
+    monkeypatch.setattr(
+        machine_packages.shutil,
+        "which",
+        lambda name: f"/usr/bin/{name}" if name in {"brew", "mas"} else None,
+    )
+    monkeypatch.setattr(machine_packages, "_installed_source_snapshots", lambda sources: {})
+    monkeypatch.setattr(machine_packages, "_source_installed", lambda source, value: False)
+
+    def _fake_install(*args, prefixed=False, **kwargs):  # type: ignore[no-untyped-def]
+        prefixes.append(prefixed)
+        return None
+
+    monkeypatch.setattr(machine_packages, "_install", _fake_install)
+
+    failures = machine_packages.install_packages(packages)
+
+    assert failures == []
+    assert prefixes == [False, False]
+
+
+def test_install_packages_batches_packages_per_source(monkeypatch) -> None:
+    """Pending packages for one source should install in a single invocation."""
+    packages = [
+        Package(brew="fzf"),
+        Package(cask="zed"),
+        Package(brew="bat"),
+        Package(cask="iina"),
+        Package(name="powershell", cask="powershell --no-quarantine"),
+    ]
+    commands: list[str] = []
+
+    monkeypatch.setattr(machine_packages, "PLATFORM", machine_packages.Platform.MACOS)
+    monkeypatch.setattr(machine_packages, "refresh_path", lambda: None)
+    monkeypatch.setattr(
+        machine_packages.shutil,
+        "which",
+        lambda name: "/opt/homebrew/bin/brew" if name == "brew" else None,
+    )
+    monkeypatch.setattr(machine_packages, "_installed_source_snapshots", lambda sources: {})
+    monkeypatch.setattr(machine_packages, "_source_installed", lambda source, value: False)
+
+    def _fake_run_collect(cmd, **kwargs):  # type: ignore[no-untyped-def]
+        commands.append(cmd)
+        return 0, bytearray()
+
+    monkeypatch.setattr(machine_packages, "run_collect", _fake_run_collect)
+
+    failures = machine_packages.install_packages(packages)
+
+    assert failures == []
+    assert commands == [
+        "brew install fzf bat",
+        "brew install --cask zed iina",
+        "brew install --cask powershell --no-quarantine",
+    ]
+
+
+def test_install_packages_retries_failed_batch_individually(monkeypatch) -> None:
+    """A failed batch should fall back to per-package installs to pinpoint failures."""
+    packages = [Package(apt="git"), Package(apt="nope"), Package(apt="unzip")]
+    commands: list[str] = []
+
+    monkeypatch.setattr(machine_packages, "PLATFORM", machine_packages.Platform.LINUX)
+    monkeypatch.setattr(machine_packages, "refresh_path", lambda: None)
+    monkeypatch.setattr(
+        machine_packages.shutil, "which", lambda name: "/usr/bin/apt" if name == "apt" else None
+    )
+    monkeypatch.setattr(machine_packages, "_installed_source_snapshots", lambda sources: {})
+    monkeypatch.setattr(machine_packages, "_source_installed", lambda source, value: False)
+
+    def _fake_run_collect(cmd, **kwargs):  # type: ignore[no-untyped-def]
+        commands.append(cmd.removeprefix("sudo apt install -y -o DPkg::Lock::Timeout=300 "))
+        return (1 if "nope" in cmd else 0), bytearray()
+
+    monkeypatch.setattr(machine_packages, "run_collect", _fake_run_collect)
+
+    failures = machine_packages.install_packages(
+        packages, owners={"git": "git", "nope": "shell", "unzip": "shell"}
+    )
+
+    assert failures == [("shell", "nope", "apt exit 1")]
+    assert commands == ["git nope unzip", "git", "nope", "unzip"]
+
+
+def test_install_packages_reads_dpkg_and_snap_snapshots_once(monkeypatch) -> None:
+    """Apt and snap checks should come from one bulk listing per manager."""
+    packages = [
+        Package(apt="git"),
+        Package(apt="unzip"),
+        Package(name="go", snap="go --classic"),
+        Package(name="code", snap="code --classic"),
+    ]
+    listings = {
+        "dpkg-query": "git\tinstall ok installed\nunzip\tdeinstall ok config-files\n",
+        "snap": "Name  Version  Rev  Tracking  Publisher  Notes\ngo  1.22  1  stable  canonical\n",
+    }
+    calls: list[str] = []
+    installed: list[str] = []
+
+    monkeypatch.setattr(machine_packages, "PLATFORM", machine_packages.Platform.LINUX)
+    monkeypatch.setattr(machine_packages, "refresh_path", lambda: None)
+    monkeypatch.setattr(
+        machine_packages.shutil,
+        "which",
+        lambda name: f"/usr/bin/{name}" if name in {"apt", "snap"} else None,
+    )
+
+    def _fake_run(cmd, **kwargs):  # type: ignore[no-untyped-def]
+        calls.append(cmd[0])
+        return type("Proc", (), {"returncode": 0, "stdout": listings[cmd[0]]})()
+
+    def _fake_install(pkg, *args, **kwargs):  # type: ignore[no-untyped-def]
+        installed.append(pkg.name)
+        return None
+
+    monkeypatch.setattr(machine_packages.subprocess, "run", _fake_run)
+    monkeypatch.setattr(machine_packages, "_install", _fake_install)
+
+    failures = machine_packages.install_packages(packages)
+
+    assert failures == []
+    assert sorted(calls) == ["dpkg-query", "snap"]
+    assert installed == ["unzip", "code"]
+
+
+def test_installed_source_snapshots_omits_unreadable_managers(monkeypatch) -> None:
+    """Managers whose listing fails fall back to per-package checks."""
+
+    def _fake_run(cmd, **kwargs):  # type: ignore[no-untyped-def]
+        raise FileNotFoundError(cmd[0])
+
+    monkeypatch.setattr(machine_packages.subprocess, "run", _fake_run)
+
+    assert machine_packages._installed_source_snapshots({"apt", "winget", "scoop"}) == {}
+
+
+def test_installed_source_snapshots_reuses_cache_until_signal_changes(monkeypatch) -> None:
+    """Cached snapshots skip the manager until its database mtime signal changes."""
+    signal = "/var/lib/dpkg/status:1"
+    calls = 0
+
+    def _fake_run(cmd, **kwargs):  # type: ignore[no-untyped-def]
+        nonlocal calls
+        calls += 1
+        return type("Proc", (), {"returncode": 0, "stdout": "git\tinstall ok installed\n"})()
+
+    monkeypatch.setattr(machine_packages.subprocess, "run", _fake_run)
+    monkeypatch.setattr(machine_packages, "_snapshot_signal", lambda source: signal)
+
+    assert machine_packages._installed_source_snapshots({"apt"}) == {"apt": {"git"}}
+    assert machine_packages._installed_source_snapshots({"apt"}) == {"apt": {"git"}}
+    assert calls == 1
+
+    signal = "/var/lib/dpkg/status:2"
+    assert machine_packages._installed_source_snapshots({"apt"}) == {"apt": {"git"}}
+    assert calls == 2
+
+
+def test_installed_source_snapshots_skips_failed_reader(monkeypatch) -> None:
+    """A failing `brew list` is omitted and not cached as "nothing installed"."""
+    returncode = 1
+
+    def _fake_run(cmd, **kwargs):  # type: ignore[no-untyped-def]
+        return type("Proc", (), {"returncode": returncode, "stdout": "git\n"})()
+
+    monkeypatch.setattr(machine_packages.subprocess, "run", _fake_run)
+    monkeypatch.setattr(machine_packages, "_snapshot_signal", lambda source: "Cellar:1")
+
+    assert machine_packages._installed_source_snapshots({"brew"}) == {}
+    returncode = 0
+    assert machine_packages._installed_source_snapshots({"brew"}) == {"brew": {"git"}}
+
+
+def test_installed_source_snapshots_never_caches_without_signal(monkeypatch) -> None:
+    """Managers without a cheap database signal (winget) are always queried."""
+    calls = 0
+
+    def _fake_reader() -> set[str]:
+        nonlocal calls
+        calls += 1
+        return {"valve.steam"}
+
+    monkeypatch.setitem(machine_packages._SNAPSHOT_READERS, "winget", _fake_reader)
+
+    machine_packages._installed_source_snapshots({"winget"})
+    machine_packages._installed_source_snapshots({"winget"})
+
+    assert calls == 2
+
+
+def test_plan_installs_reads_snapshots_only(monkeypatch) -> None:
+    """Status and plan decisions come from snapshots, never per-package queries."""
+    packages = [
+        Package(name="git", brew="git"),
+        Package(name="uv", brew="uv"),
+        Package(name="zed", cask="zed"),
+        Package(name="htop", apt="htop"),
+    ]
+
+    monkeypatch.setattr(machine_packages, "PLATFORM", machine_packages.Platform.MACOS)
+    monkeypatch.setattr(machine_packages, "refresh_path", lambda: None)
+    monkeypatch.setattr(
+        machine_packages.shutil,
+        "which",
+        lambda name: "/opt/homebrew/bin/brew" if name == "brew" else None,
+    )
+    monkeypatch.setattr(
+        machine_packages, "_installed_source_snapshots", lambda sources: {"brew": {"git"}}
+    )
+
+    def _unexpected_query(*args, **kwargs):  # type: ignore[no-untyped-def]
+        raise AssertionError("queried a package")
+
+    monkeypatch.setattr(machine_packages, "_source_installed", _unexpected_query)
+
+    planned = machine_packages.plan_installs(packages)
+
+    assert [(p.name, action, detail) for p, action, detail in planned] == [
+        ("git", "installed", "brew"),
+        ("uv", "install", "brew"),
+        ("zed", "unknown", "cask"),
+    ]
@@ -0,0 +1,73 @@
+"""Script-run state store tests."""
+
+import json
+import sqlite3
+import threading
+from pathlib import Path
+
+import pytest
+
+from machine import persistence as machine_persistence
+
+
+def test_script_runs_import_legacy_state_then_update_per_script() -> None:
+    """`state.json` seeds the database once; later records replace single rows."""
+    legacy = machine_persistence._LEGACY_STATE_FILE
+    legacy.write_text(json.dumps({"once_ssh.sh": {"hash": "a"}, "watch_git.sh": {"hash": "b"}}))
+    assert machine_persistence.load_script_runs()["once_ssh.sh"] == {"hash": "a"}
+
+    machine_persistence.record_script_run("watch_git.sh", {"hash": "c"})
+    legacy.write_text("{}")
+
+    assert machine_persistence.load_script_runs() == {
+        "once_ssh.sh": {"hash": "a"},
+        "watch_git.sh": {"hash": "c"},
+    }
+
+
+def test_concurrent_records_are_all_kept() -> None:
+    """Writers on separate connections never drop each other's rows."""
+    threads = [
+        threading.Thread(
+            target=machine_persistence.record_script_run, args=(f"watch_{i}.sh", {"n": i})
+        )
+        for i in range(16)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert machine_persistence.load_script_runs() == {f"watch_{i}.sh": {"n": i} for i in range(16)}
+
+
+def test_newer_schema_refused_and_corrupt_database_reset(tmp_path: Path) -> None:
+    """A database from a newer mc is left alone; an unreadable one is moved aside."""
+    db_path = machine_persistence._STATE_DB
+    with sqlite3.connect(db_path) as db:
+        db.execute(f"PRAGMA user_version = {machine_persistence._SCHEMA_VERSION + 1}")
+    with pytest.raises(RuntimeError, match="newer than this mc supports"):
+        machine_persistence.load_script_runs()
+
+    db_path.write_bytes(b"not a database" * 100)
+    machine_persistence.record_script_run("once_x.sh", {"hash": "d"})
+
+    assert machine_persistence.load_script_runs() == {"once_x.sh": {"hash": "d"}}
+    assert (tmp_path / "state.db.corrupt").exists()
+
+
+def test_state_lock_serializes_holders() -> None:
+    """A second holder waits until the first releases the lock."""
+    entered = threading.Event()
+
+    def _second() -> None:
+        with machine_persistence.state_lock():
+            entered.set()
+
+    with machine_persistence.state_lock():
+        thread = threading.Thread(target=_second)
+        thread.start()
+        assert not entered.wait(0.3)
+    thread.join(timeout=5)
+
+    assert entered.is_set()
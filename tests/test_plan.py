@@ -0,0 +1,309 @@
+"""Incremental apply fingerprint tests."""
+
+import json
+import re
+import threading
+from pathlib import Path
+
+import pytest
+
+from machine import plan as machine_plan
+from machine.manifest import FileMapping, MachineManifest, Module, Package
+
+
+def test_build_units_adds_trailing_machine_unit() -> None:
+    """Machine-level items form their own unit after every module."""
+    modules = [Module(name="git"), Module(name="shell", depends=["git"])]
+    manifest = MachineManifest(packages=[Package(brew="uv")])
+
+    units = machine_plan.build_units(modules, manifest, "macbook")
+
+    assert [u.name for u in units] == ["git", "shell", "machine:macbook"]
+    assert units[1].depends == ["git"]
+    assert units[2].depends == ["git", "shell"]
+    assert [p.name for p in units[2].packages] == ["uv"]
+
+
+def test_fingerprint_tracks_script_content_and_env(tmp_path: Path) -> None:
+    """Editing a script or its environment invalidates only the scripts phase."""
+    script = tmp_path / "setup.sh"
+    script.write_text("echo one\n", encoding="utf-8")
+    unit = machine_plan.Unit(name="shell", scripts=[str(script)])
+
+    before = machine_plan.fingerprint(unit, {"MC_ID": "macbook"})
+    script.write_text("echo two\n", encoding="utf-8")
+    edited = machine_plan.fingerprint(unit, {"MC_ID": "macbook"})
+    moved = machine_plan.fingerprint(unit, {"MC_ID": "rpi"})
+
+    assert before["files"] == edited["files"] == moved["files"]
+    assert before["scripts"] != edited["scripts"] != moved["scripts"]
+
+
+def test_fingerprint_invalidates_replaced_link_target(tmp_path: Path) -> None:
+    """A deployed link replaced by a regular file must be redeployed."""
+    source = tmp_path / "settings.json"
+    target = tmp_path / "target.json"
+    source.write_text("{}", encoding="utf-8")
+    target.symlink_to(source)
+    unit = machine_plan.Unit(
+        name="zed", files=[FileMapping(source=str(source), target=str(target))]
+    )
+    recorded = {
+        f"zed:{phase}": digest for phase, digest in machine_plan.fingerprint(unit, {}).items()
+    }
+
+    assert machine_plan.changed_phases({"zed": machine_plan.fingerprint(unit, {})}, recorded) == {
+        "zed": set()
+    }
+
+    target.unlink()
+    target.write_text("{}", encoding="utf-8")
+    digests = {"zed": machine_plan.fingerprint(unit, {})}
+
+    assert machine_plan.changed_phases(digests, recorded) == {"zed": {"files"}}
+
+
+def test_fingerprints_round_trip_per_machine(monkeypatch, tmp_path: Path) -> None:
+    """Saved digests are scoped to their machine."""
+    monkeypatch.setattr(machine_plan, "_FINGERPRINT_FILE", tmp_path / "applied.json")
+    monkeypatch.setattr(machine_plan.settings, "dry_run", False)
+
+    machine_plan.save_fingerprints("macbook", {"git:files": "abc"})
+    machine_plan.save_fingerprints("rpi", {"git:files": "def"})
+
+    assert machine_plan.load_fingerprints("macbook") == {"git:files": "abc"}
+    assert machine_plan.load_fingerprints("pc") == {}
+
+
+def test_dependency_graph_waits_on_package_bootstrap() -> None:
+    """Units with packages or scripts depend on bootstrap units; declared depends are kept."""
+    units = [
+        machine_plan.Unit(name="managers", scripts=["init_pkgs.unix.sh"], bootstrap=True),
+        machine_plan.Unit(name="pkgs", scripts=["setup.sh"]),
+        machine_plan.Unit(name="ssh"),
+        machine_plan.Unit(name="ssh-server", scripts=["setup.linux.sh"], depends=["ssh"]),
+        machine_plan.Unit(name="git", packages=[Package(brew="git")], depends=["missing"]),
+    ]
+
+    assert machine_plan.dependency_graph(units) == {
+        "managers": set(),
+        "pkgs": {"managers"},
+        "ssh": set(),
+        "ssh-server": {"ssh", "managers"},
+        "git": {"managers"},
+    }
+
+
+def test_apply_units_runs_dependents_after_prerequisites(monkeypatch) -> None:
+    """Independent units run concurrently; a unit starts only after its prerequisites."""
+    events: list[str] = []
+    lock = threading.Lock()
+    units = [
+        machine_plan.Unit(name="pkgs", scripts=["init_pkgs.sh"], bootstrap=True),
+        machine_plan.Unit(name="git", packages=[Package(brew="git")]),
+        machine_plan.Unit(name="shell", packages=[Package(brew="zsh")]),
+        machine_plan.Unit(name="macbook", files=[], depends=["git", "shell"]),
+    ]
+
+    def _fake_install(packages, **kwargs):  # type: ignore[no-untyped-def]
+        with lock:
+            events.extend(p.name for p in packages)
+        return [("shell", "zsh", "brew exit 1")] if "zsh" in {p.name for p in packages} else []
+
+    def _fake_scripts(scripts, **kwargs):  # type: ignore[no-untyped-def]
+        with lock:
+            events.append(scripts[0])
+        return []
+
+    def _fake_deploy(files, **kwargs):  # type: ignore[no-untyped-def]
+        with lock:
+            events.append("macbook-files")
+        return 0, []
+
+    monkeypatch.setattr(machine_plan, "install_packages", _fake_install)
+    monkeypatch.setattr(machine_plan, "run_scripts", _fake_scripts)
+    monkeypatch.setattr(machine_plan, "deploy_files", _fake_deploy)
+    monkeypatch.setattr(machine_plan.settings, "jobs", 4)
+
+    changed = {
+        "pkgs": {"scripts"},
+        "git": {"packages"},
+        "shell": {"packages"},
+        "macbook": {"files"},
+    }
+    failures = machine_plan.apply_units(units, changed, {}, {})
+
+    assert events[0] == "init_pkgs.sh"
+    assert set(events[1:3]) == {"git", "zsh"}
+    assert events[3] == "macbook-files"
+    assert failures["shell"] == {"packages": [("shell", "zsh", "brew exit 1")]}
+    assert failures["git"] == {"packages": []}
+
+
+def test_apply_units_shares_manager_snapshots_after_bootstrap(monkeypatch) -> None:
+    """Package passes reuse one PATH refresh and snapshot read, renewed after bootstrap."""
+    from machine.ops import packages as machine_packages
+
+    reads: list[str] = []
+    units = [
+        machine_plan.Unit(name="pkgs", packages=[Package(brew="brew")], bootstrap=True),
+        machine_plan.Unit(name="git", packages=[Package(brew="git")]),
+        machine_plan.Unit(name="shell", packages=[Package(brew="zsh")]),
+    ]
+    monkeypatch.setattr(machine_packages, "refresh_path", lambda: reads.append("refresh"))
+    monkeypatch.setattr(
+        machine_packages, "_installed_source_snapshots", lambda sources: reads.append("read") or {}
+    )
+    monkeypatch.setattr(machine_packages, "_run_pending", lambda pending, prefixed: [])
+    monkeypatch.setattr(machine_plan.settings, "jobs", 4)
+
+    changed = {u.name: {"packages"} for u in units}
+    machine_plan.apply_units(units, changed, {}, {})
+
+    assert reads == ["refresh", "read", "refresh", "read"]
+
+
+def test_apply_units_batches_packages_across_units(tmp_path: Path, monkeypatch) -> None:
+    """Units waiting only on bootstrap share one install pass; others install on their own."""
+    from machine.ops import packages as machine_packages
+
+    init_script = tmp_path / "init_repo.sh"
+    init_script.write_text("#!/bin/sh\n")
+    passes: list[list[str]] = []
+    units = [
+        machine_plan.Unit(name="pkgs", packages=[Package(brew="brew")], bootstrap=True),
+        machine_plan.Unit(name="git", packages=[Package(brew="git")]),
+        machine_plan.Unit(name="shell", packages=[Package(brew="zsh")]),
+        machine_plan.Unit(name="docker", packages=[Package(brew="docker")], depends=["git"]),
+        machine_plan.Unit(name="apt", packages=[Package(brew="jq")], scripts=[str(init_script)]),
+    ]
+    monkeypatch.setattr(machine_plan.settings, "stub_managers", True)
+    monkeypatch.setattr(
+        machine_packages,
+        "_run_pending",
+        lambda pending, prefixed: passes.append([i.pkg.brew for i in pending]) or [],
+    )
+    monkeypatch.setattr(machine_plan, "run_scripts", lambda scripts, **_: [])
+
+    changed = {u.name: {"packages"} for u in units}
+    machine_plan.apply_units(units, changed, {}, {})
+
+    assert sorted(passes) == [["brew"], ["docker"], ["git", "zsh"], ["jq"]]
+
+
+def test_parallel_scripts_overlap_across_units_only(monkeypatch) -> None:
+    """Post scripts of different units overlap; `init_` scripts still run one at a time."""
+    events: list[str] = []
+    running: set[str] = set()
+    overlaps: set[frozenset[str]] = set()
+    lock = threading.Lock()
+    both_started = threading.Barrier(2, timeout=5)
+    units = [
+        machine_plan.Unit(name="vscode", scripts=["init_vscode.sh", "setup.sh", "ext.sh"]),
+        machine_plan.Unit(name="zinit", scripts=["init_zinit.sh", "up.sh"]),
+    ]
+
+    def _fake_scripts(scripts, buffered=False, **kwargs):  # type: ignore[no-untyped-def]
+        name = scripts[0]
+        with lock:
+            overlaps.update(frozenset({name, other}) for other in running)
+            running.add(name)
+            events.append(f"{name}:{'buffered' if buffered else 'live'}")
+        if not name.startswith("init_"):
+            both_started.wait()
+        with lock:
+            running.discard(name)
+        return []
+
+    monkeypatch.setattr(machine_plan, "run_scripts", _fake_scripts)
+    monkeypatch.setattr(machine_plan.settings, "jobs", 2)
+    monkeypatch.setattr(machine_plan.settings, "parallel_scripts", True)
+
+    machine_plan.apply_units(units, {"vscode": {"scripts"}, "zinit": {"scripts"}}, {}, {})
+
+    assert frozenset({"setup.sh", "up.sh"}) in overlaps
+    assert frozenset({"init_vscode.sh", "init_zinit.sh"}) not in overlaps
+    assert {"init_vscode.sh:live", "init_zinit.sh:live", "setup.sh:buffered"} <= set(events)
+
+
+def test_dependency_graph_orders_units_by_script_edges(tmp_path: Path) -> None:
+    """A script declaring `after` another unit's script makes its unit wait; cycles fail early."""
+    docker = tmp_path / "docker.unix.sh"
+    tailscale = tmp_path / "tailscale.unix.sh"
+    docker.write_text("#!/bin/sh\n")
+    tailscale.write_text("#!/bin/sh\n# mc-after: docker\n")
+    units = [
+        machine_plan.Unit(name="tailscale", scripts=[str(tailscale)]),
+        machine_plan.Unit(name="docker", scripts=[str(docker)]),
+    ]
+
+    assert machine_plan.dependency_graph(units) == {"tailscale": {"docker"}, "docker": set()}
+    docker.write_text("#!/bin/sh\n# mc-after: tailscale\n")
+    with pytest.raises(ValueError, match="Cyclic unit dependencies"):
+        machine_plan.apply_units(units, {u.name: {"scripts"} for u in units}, {}, {})
+
+
+def test_plan_lists_changes_and_goes_stale(tmp_path: Path) -> None:
+    """A plan lists pending steps of changed phases and round-trips until inputs change."""
+    source = tmp_path / "zshrc"
+    source.write_text("", encoding="utf-8")
+    script = tmp_path / "watch_plugins.sh"
+    script.write_text("echo one\n", encoding="utf-8")
+    unit = machine_plan.Unit(
+        name="shell",
+        files=[FileMapping(source=str(source), target=str(tmp_path / ".zshrc"))],
+        scripts=[str(script)],
+    )
+    digests = {"shell": machine_plan.fingerprint(unit, {})}
+    changed = machine_plan.changed_phases(digests, {})
+    changed["shell"].discard("packages")
+
+    plan = machine_plan.build_plan("macbook", [unit], digests, changed)
+    path = tmp_path / "plan.json"
+    path.write_text(machine_plan.plans_to_json([plan]), encoding="utf-8")
+    loaded = machine_plan.load_plan(path, "macbook")
+
+    assert [(c.kind, c.action, c.detail) for c in plan.changes] == [
+        ("file", "create", str(source)),
+        ("script", "run", "never ran"),
+    ]
+    assert loaded == plan
+    assert machine_plan.stale_units(loaded, digests) == []
+
+    script.write_text("echo two\n", encoding="utf-8")
+
+    assert machine_plan.stale_units(loaded, {"shell": machine_plan.fingerprint(unit, {})}) == [
+        "shell"
+    ]
+
+
+@pytest.mark.parametrize(
+    "plan",
+    [
+        {"machine": "macbook"},
+        {
+            "machine": "macbook",
+            "platform": "darwin",
+            "created": "",
+            "phases": {},
+            "digests": {},
+            "changes": [{"unit": "shell"}],
+        },
+        {
+            "machine": "macbook",
+            "platform": "darwin",
+            "created": "",
+            "phases": ["files"],
+            "digests": {},
+            "changes": [],
+        },
+    ],
+    ids=["missing-keys", "partial-change", "mistyped-phases"],
+)
+def test_load_plan_rejects_malformed_plans(tmp_path: Path, plan: dict) -> None:
+    """A hand-edited or truncated plan fails with a ValueError naming the file."""
+    path = tmp_path / "plan.json"
+    path.write_text(json.dumps({"version": 1, "plans": [plan]}), encoding="utf-8")
+
+    with pytest.raises(ValueError, match=re.escape(f"Malformed plan for macbook in {path}")):
+        machine_plan.load_plan(path, "macbook")
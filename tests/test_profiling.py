@@ -0,0 +1,32 @@
+"""Profiling hook tests."""
+
+import json
+import threading
+
+from machine import profiling as machine_profiling
+
+
+@machine_profiling.traced("work")
+def _work(n: int) -> int:
+    return sum(range(n))
+
+
+def test_spans_and_profile_written_per_thread() -> None:
+    """Spans from every thread land in the trace; the summary lists them first."""
+    assert _work(10) == 45  # not profiling: plain call, nothing recorded
+
+    machine_profiling.start()
+    _work(1000)
+    worker = threading.Thread(target=_work, args=(1000,), name="mc-unit_0")
+    worker.start()
+    worker.join()
+    prof_path, trace_path, lines = machine_profiling.stop("apply", top=5)
+
+    events = json.loads(trace_path.read_text())["traceEvents"]
+    spans = [e for e in events if e["ph"] == "X"]
+    names = {e["args"]["name"] for e in events if e["ph"] == "M"}
+    assert prof_path.stat().st_size > 0
+    assert [e["name"] for e in spans] == ["work", "work"]
+    assert {"MainThread", "mc-unit_0"} <= names
+    assert lines[0].split()[1:] == ["2", "work"]
+    assert machine_profiling._events is None
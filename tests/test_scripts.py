@@ -0,0 +1,136 @@
+"""Script environment, metadata, and tracking tests."""
+
+import os
+import re
+from pathlib import Path
+
+import pytest
+
+from machine.ops import scripts as machine_scripts
+
+
+def test_resolve_env_expands_in_dependency_order(monkeypatch) -> None:
+    """References resolve regardless of declaration order, with braces and defaults."""
+    monkeypatch.setenv("HOME", "/home/me")
+    monkeypatch.setenv("PATH", "/usr/bin")
+    monkeypatch.delenv("UNSET_VAR", raising=False)
+    raw = {
+        "DEV_BIN": "${DEV}/bin",
+        "DEV": "$HOME/Dev",
+        "DEV_HOME": "$DEV_HOMEWORK",
+        "EDITOR": "${UNSET_VAR:-vim}",
+        "CACHE": "${UNSET_VAR-$DEV/.cache}",
+        "PATH": "$DEV_BIN:$PATH",
+        "KEEP": "$UNSET_VAR",
+    }
+
+    env = machine_scripts._resolve_env(raw)
+
+    assert env == {
+        "DEV_BIN": "/home/me/Dev/bin",
+        "DEV": "/home/me/Dev",
+        "DEV_HOME": "$DEV_HOMEWORK",
+        "EDITOR": "vim",
+        "CACHE": "/home/me/Dev/.cache",
+        "PATH": "/home/me/Dev/bin:/usr/bin",
+        "KEEP": "$UNSET_VAR",
+    }
+
+
+def test_resolve_env_reports_cycles() -> None:
+    """Mutually referencing keys fail with the cycle in the message."""
+    with pytest.raises(ValueError, match="Cyclic env references") as exc:
+        machine_scripts._resolve_env({"A": "$B", "B": "${C}", "C": "$A", "D": "ok"})
+
+    assert {"A", "B", "C"} <= set(str(exc.value).split(": ")[1].split(" -> "))
+
+
+def test_build_script_env_cached_until_env_file_changes(tmp_path: Path, monkeypatch) -> None:
+    """Env files are parsed once per machine until they change on disk."""
+    machine_dir = tmp_path / "machines" / "box"
+    machine_dir.mkdir(parents=True)
+    env_file = machine_dir / "machine.env"
+    env_file.write_text(f'MC_PRIVATE="{tmp_path / "private"}"\nDEV="$MC_HOME/dev"\n')
+    parsed: list[Path] = []
+    parse = machine_scripts._parse_env_file
+    monkeypatch.setattr(machine_scripts, "_parse_env_file", lambda p: parsed.append(p) or parse(p))
+
+    first = machine_scripts.build_script_env("box", tmp_path)
+    second = machine_scripts.build_script_env("box", tmp_path)
+    env_file.write_text('DEV="$MC_ID/development"\n')
+    third = machine_scripts.build_script_env("box", tmp_path)
+
+    assert first == second
+    assert first["DEV"] == f"{tmp_path}/dev"
+    assert third["DEV"] == "box/development"
+    assert parsed.count(env_file) == 2
+
+
+def test_script_meta_reads_header_and_defaults_phase(tmp_path: Path) -> None:
+    """Header keys override the prefix; only the leading comment block is read."""
+    script = tmp_path / "init_tools.unix.sh"
+    script.write_text(
+        "#!/bin/sh\n# Install tools\n# mc-phase: post\n# mc-after: docker, ssh.sh\n"
+        "# mc-timeout: 30s\n# mc-parallel: yes\necho hi\n# mc-before: ignored\n"
+    )
+
+    meta = machine_scripts.script_meta(script)
+
+    assert meta == machine_scripts.ScriptMeta(
+        phase="post", after=("docker", "ssh.sh"), timeout=30.0, parallel=True
+    )
+    assert machine_scripts.script_meta(tmp_path / "up_brew.sh").phase == "update"
+    script.write_text("# mc-phase: later\n")
+    with pytest.raises(ValueError, match="phase must be one of"):
+        machine_scripts.script_meta(script)
+    script.write_text("# mc-afer: docker\n")
+    with pytest.raises(ValueError, match=f"^{re.escape(str(script))}: unknown script metadata"):
+        machine_scripts.script_meta(script)
+
+
+def test_order_scripts_follows_edges_and_keeps_listed_order(tmp_path: Path) -> None:
+    """Declared edges reorder scripts; unrelated scripts keep their order; cycles fail."""
+    paths = {}
+    for name, header in [
+        ("a.sh", ""),
+        ("b.sh", "# mc-after: d\n"),
+        ("c.sh", "# mc-before: a.sh\n"),
+        ("d.unix.sh", ""),
+    ]:
+        paths[name] = tmp_path / name
+        paths[name].write_text(f"#!/bin/sh\n{header}")
+
+    order = machine_scripts.order_scripts([str(p) for p in paths.values()])
+
+    assert [Path(s).name for s in order] == ["c.sh", "a.sh", "d.unix.sh", "b.sh"]
+    paths["d.unix.sh"].write_text("# mc-after: b\n")
+    with pytest.raises(ValueError, match="Cyclic script dependencies"):
+        machine_scripts.order_scripts([str(p) for p in paths.values()])
+
+
+def test_watch_scripts_skip_on_stat_and_rerun_for_inputs(tmp_path: Path, monkeypatch) -> None:
+    """Unchanged scripts are skipped without hashing; edited inputs trigger a rerun."""
+    config = tmp_path / "config"
+    config.mkdir()
+    (config / "settings.json").write_text("{}")
+    script = tmp_path / "watch_setup.sh"
+    script.write_text("#!/bin/sh\n# mc-inputs: config\n")
+    ran: list[str] = []
+    hashed: list[Path] = []
+    file_hash = machine_scripts._file_hash
+    monkeypatch.setattr(machine_scripts, "_execute", lambda s, *a: ran.append(s.name))
+    monkeypatch.setattr(machine_scripts, "_file_hash", lambda p: hashed.append(p) or file_hash(p))
+
+    machine_scripts.run_scripts([str(script)])
+    hashed.clear()
+    machine_scripts.run_scripts([str(script)])
+    assert (ran, hashed) == (["watch_setup.sh"], [])
+
+    os.utime(script, ns=(0, 0))  # touched, not edited: hashed once, then fast again
+    machine_scripts.run_scripts([str(script)])
+    machine_scripts.run_scripts([str(script)])
+    assert (ran, hashed) == (["watch_setup.sh"], [script])
+
+    (config / "settings.json").write_text('{"theme": "dark"}')
+    machine_scripts.run_scripts([str(script)])
+    assert ran == ["watch_setup.sh", "watch_setup.sh"]
@@ -0,0 +1,105 @@
+"""Drift watch tests."""
+
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+from machine import watch as machine_watch
+from machine.manifest import FileMapping
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="symlinks need Developer Mode")
+
+
+@pytest.mark.parametrize("inotify", [True, False], ids=["inotify", "poll"])
+def test_watch_reports_replaced_link_once_debounced(
+    inotify: bool, tmp_path: Path, monkeypatch
+) -> None:
+    """Drift found by the initial check, then a link rewritten as a file, are each reported once."""
+    if inotify and machine_watch._inotify_lib() is None:
+        pytest.skip("inotify unavailable")
+    if not inotify:
+        monkeypatch.setattr(machine_watch, "_inotify_lib", lambda: None)
+    source = tmp_path / "settings.json"
+    source.write_text("{}", encoding="utf-8")
+    target = tmp_path / "home" / "settings.json"
+    target.parent.mkdir()
+    target.symlink_to(source)
+    removed = tmp_path / "home" / "keybindings.json"
+    files = [FileMapping(source=str(source), target=str(t)) for t in (target, removed)]
+    reported: list[list[tuple[str, str]]] = []
+    changed = threading.Semaphore(0)
+
+    def _on_drift(drift: list[machine_watch.Drift]) -> None:
+        reported.append([(d.mapping.target, d.kind) for d in drift])
+        changed.release()
+
+    stop = threading.Event()
+    thread = threading.Thread(
+        target=machine_watch.watch_drift,
+        args=(files, _on_drift, stop),
+        kwargs={"debounce": 0.1, "interval": 0.1},
+    )
+    thread.start()
+    try:
+        assert changed.acquire(timeout=5)
+        target.unlink()
+        target.write_text('{"theme": "dark"}', encoding="utf-8")
+        target.chmod(0o600)
+        assert changed.acquire(timeout=5)
+    finally:
+        stop.set()
+        thread.join()
+
+    assert reported == [[(str(removed), "removed")], [(str(target), "changed")]]
+
+
+def test_find_drift_classifies_targets(tmp_path: Path) -> None:
+    """Copied, changed, removed, dangling, and source-less targets are told apart."""
+    source = tmp_path / "zshrc"
+    source.write_text("", encoding="utf-8")
+    (tmp_path / "copied").write_text("", encoding="utf-8")
+    (tmp_path / "changed").write_text("alias g=git\n", encoding="utf-8")
+    (tmp_path / "dangling").symlink_to(tmp_path / "gone")
+    files = [
+        FileMapping(source=str(source), target=str(tmp_path / "copied")),
+        FileMapping(source=str(source), target=str(tmp_path / "changed")),
+        FileMapping(source=str(source), target=str(tmp_path / "removed")),
+        FileMapping(source=str(source), target=str(tmp_path / "dangling")),
+        FileMapping(source=str(tmp_path / "gone"), target=str(tmp_path / "x")),
+    ]
+
+    drift = machine_watch.find_drift(files)
+
+    assert [(d.kind, d.fixable) for d in drift] == [
+        ("replaced", True),
+        ("changed", True),
+        ("removed", True),
+        ("dangling", True),
+        ("source missing", False),
+    ]
+
+
+def test_find_drift_checks_the_last_mapping_per_target(tmp_path: Path) -> None:
+    """A machine mapping overriding a module's target is not drift, and fixing keeps it."""
+    from machine.ops.files import deploy_files
+
+    module_source, machine_source = tmp_path / "module.json", tmp_path / "machine.json"
+    module_source.write_text("{}", encoding="utf-8")
+    machine_source.write_text("{}", encoding="utf-8")
+    target = tmp_path / "settings.json"
+    files = [
+        FileMapping(source=str(module_source), target=str(target)),
+        FileMapping(source=str(machine_source), target=str(target)),
+    ]
+    target.symlink_to(machine_source)
+
+    assert machine_watch.find_drift(files) == []
+
+    target.unlink()
+    drift = machine_watch.find_drift(files)
+    deploy_files([d.mapping for d in drift if d.fixable])
+
+    assert [d.mapping.source for d in drift] == [str(machine_source)]
+    assert target.readlink() == machine_source